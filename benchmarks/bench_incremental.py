@@ -0,0 +1,113 @@
+"""
+Compares describing a plot again after a grammar-only edit, such as a new
+bookmark, filter or sort, with rebuilding everything for the new state.
+
+For each export, each kind of update alternates between two grammars and is
+timed as:
+- rebuild: parsing the export and generating the text, as for a new upload
+- tokenmap: generating the text from the parsed data with a new TokenMap,
+  after deriving the visible subsets again for filter and sort updates
+- update: TokenMap.update with the new grammar, then rendering the text,
+  which recomputes only the tokens whose inputs changed
+The default level is rendered. Without files, a bundled export with bookmarks
+and a large synthetic export (see alttxt.synthetic) are measured.
+
+Usage: python benchmarks/bench_incremental.py [--repeat N] [data files...]
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from alttxt.dependencies import VIEW_FIELDS, dependency_graph
+from alttxt.enums import Level, SortBy
+from alttxt.models import GrammarModel
+from alttxt.pipeline import generate, parse, render
+from alttxt.synthetic import synthetic_export
+from alttxt.tokenmap import TokenMap
+from alttxt.view import apply_grammar
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+BOOKMARK_FILE = DATA_DIR / "movies_with_bookmarks_selection.json"
+SYNTHETIC = {"sets": 16, "items": 50000, "intersections": 3000, "bookmarks": 5, "selection": True}
+
+
+def variants(grammar: GrammarModel) -> "Dict[str, GrammarModel]":
+    """
+    Returns a grammar differing from the given one in each kind of update.
+    """
+    bookmarks = grammar.bookmarked_intersections
+    return {
+        "bookmark": grammar.model_copy(update={"bookmarked_intersections": bookmarks[:-1] if bookmarks else []}),
+        "selection": grammar.model_copy(update={"selected_intersection": None, "selection_type": None}),
+        "filter": grammar.model_copy(
+            update={"filters": grammar.filters.model_copy(update={"min_visible": grammar.filters.min_visible + 1})}
+        ),
+        "sort": grammar.model_copy(update={"sort_by": SortBy.DEGREE if grammar.sort_by != SortBy.DEGREE else SortBy.SIZE}),
+    }
+
+
+def median_ms(fn: Callable[[int], None], repeat: int) -> float:
+    """
+    Returns the median wall time of fn in milliseconds; fn gets the number of the run.
+    """
+    times: "List[float]" = []
+    for run in range(repeat):
+        start = time.perf_counter()
+        fn(run)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def bench(path: Path, repeat: int) -> None:
+    grammar, data = parse(path)
+    tokens = dependency_graph(Level.DEFAULT).tokens
+    rebuild = median_ms(lambda run: generate(*parse(path), Level.DEFAULT), repeat)
+
+    for kind, variant in variants(grammar).items():
+        grammars = (variant, grammar)
+        tokenmap = TokenMap(data, grammar, tokens=tokens)
+        render(tokenmap, Level.DEFAULT)
+
+        def update(run: int) -> None:
+            stale.append(len(tokenmap.update(grammars[run % 2])))
+            render(tokenmap, Level.DEFAULT)
+
+        def fresh_map(run: int) -> None:
+            new_grammar = grammars[run % 2]
+            generate(new_grammar, apply_grammar(new_grammar, data) if view_changed else data, Level.DEFAULT)
+
+        view_changed = any(getattr(variant, field) != getattr(grammar, field) for field in VIEW_FIELDS)
+        stale: "List[int]" = []
+        fresh = median_ms(fresh_map, repeat)
+        updated = median_ms(update, repeat)
+        print(
+            f"{path.name[:32]:<32} {kind:<10} {rebuild:>10.2f} {fresh:>10.2f} {updated:>10.2f}"
+            f" {rebuild / updated:>9.1f}x {max(stale):>6}/{len(tokens)}"
+        )
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("files", nargs="*", type=Path)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    print("Times in ms, medians; stale is the number of tokens recomputed by the update")
+    print(f"{'file':<32} {'update':<10} {'rebuild':>10} {'tokenmap':>10} {'update':>10} {'speedup':>10} {'stale':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        files = args.files
+        if not files:
+            synthetic = Path(directory) / "synthetic.json"
+            synthetic.write_text(json.dumps(synthetic_export(**SYNTHETIC)))
+            files = [BOOKMARK_FILE, synthetic]
+        for path in files:
+            bench(path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
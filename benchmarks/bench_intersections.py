@@ -0,0 +1,71 @@
+"""
+Measures the intersection engine (alttxt.intersections) on synthetic data:
+building the per-set bitmaps, and computing every intersection of the sets
+with its size, degree, expected size, deviation and attribute statistics.
+
+The bitmaps are built both from a boolean array (from_columns), which is
+how fast the engine itself is, and from the items of an export's rawData
+(from_raw_data), which adds reading the 0/1 set columns of every item.
+The rawData of large item counts takes a lot of memory, so it is only
+generated up to --raw-items items.
+
+Usage: python benchmarks/bench_intersections.py [--items N] [--sets N] [--raw-items N] [--repeat N]
+"""
+import argparse
+import time
+
+from typing import Callable, TypeVar
+
+import numpy as np
+
+from alttxt.intersections import SetBitmaps
+from alttxt.synthetic import synthetic_export
+
+T = TypeVar("T")
+
+
+def timed(function: "Callable[[], T]", repeat: int) -> "tuple[T, float]":
+    """
+    Returns the result of function and the best time of repeat calls.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--items", type=int, default=1_000_000, help="Items. Defaults to %(default)s.")
+    arg_parser.add_argument("--sets", type=int, default=40, help="Sets. Defaults to %(default)s.")
+    arg_parser.add_argument(
+        "--raw-items", type=int, default=100_000, help="Items of the rawData measured. Defaults to %(default)s."
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Runs of each step; the best is reported.")
+    args = arg_parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    set_ids = [f"Set_{index}" for index in range(args.sets)]
+    columns = rng.random((args.items, args.sets)) < rng.uniform(0.01, 0.3, args.sets)
+    attributes = {"Attr1": rng.normal(size=args.items)}
+
+    print(f"{'source':<12} {'items':>9} {'sets':>5} {'step':<14} {'seconds':>8} {'intersections':>14}")
+    bitmaps, pack_time = timed(lambda: SetBitmaps.from_columns(set_ids, columns, attributes), args.repeat)
+    intersections, time_taken = timed(bitmaps.intersections, args.repeat)
+    print(f"{'columns':<12} {args.items:>9} {args.sets:>5} {'bitmaps':<14} {pack_time:>8.3f}")
+    print(f"{'':<12} {'':>9} {'':>5} {'intersections':<14} {time_taken:>8.3f} {len(intersections):>14}")
+    print(f"{'':<12} {'':>9} {'':>5} {'bitmap bytes':<14} {bitmaps.bitmaps.nbytes:>8}")
+
+    raw_data = synthetic_export(
+        sets=args.sets, items=args.raw_items, intersections=args.raw_items // 10, attributes=1
+    )["rawData"]
+    bitmaps, raw_time = timed(lambda: SetBitmaps.from_raw_data(raw_data), args.repeat)
+    intersections, time_taken = timed(bitmaps.intersections, args.repeat)
+    print(f"{'rawData':<12} {args.raw_items:>9} {args.sets:>5} {'bitmaps':<14} {raw_time:>8.3f}")
+    print(f"{'':<12} {'':>9} {'':>5} {'intersections':<14} {time_taken:>8.3f} {len(intersections):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures the peak and retained memory of each stage of the pipeline
+(load_data, parse_grammar, parse_data, tokenmap, render) for each export
+and level, with tracemalloc (see alttxt.profiling).
+
+Each export is generated once before it is measured, so that one-off
+allocations such as compiled render plans are not counted.
+Exports that cannot be parsed are skipped.
+
+Usage: python benchmarks/bench_memory.py [--json FILE] [--top N] [data files...]
+"""
+import argparse
+import json
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+from alttxt import profiling
+from alttxt.enums import Level
+from alttxt.pipeline import generate, parse
+from alttxt.profiling import Profile
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def measure(path: Path, level: Level) -> "Dict[str, Any]":
+    """
+    Returns the memory of each stage of generating the alt text of an export.
+    """
+    generate(*parse(path), level)
+    profile = Profile(memory=True)
+    try:
+        grammar, data = parse(path, profile=profile)
+        generate(grammar, data, level, profile=profile)
+    finally:
+        profile.close()
+    return profile.as_dict()["memory"]
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("files", nargs="*", type=Path, default=sorted(DATA_DIR.glob("*.json")))
+    arg_parser.add_argument("--json", type=Path, default=None, help="File to write the results to as JSON.")
+    arg_parser.add_argument("--top", type=int, default=0, help="Print the top N allocation sites of each stage.")
+    args = arg_parser.parse_args()
+    profiling.TOP_SITES = max(args.top, profiling.TOP_SITES)
+
+    results: "List[Dict[str, Any]]" = []
+    print(f"{'file':<40} {'level':<8} {'stage':<14} {'peak KiB':>10} {'retained KiB':>13} {'current KiB':>12}")
+    for path in args.files:
+        for level in Level:
+            try:
+                memory = measure(path, level)
+            except Exception as e:
+                print(f"{path.name:<40} skipped: {type(e).__name__}: {e}")
+                break
+            results.append({"file": path.name, "level": level.value, "memory": memory})
+            for stage, usage in memory.items():
+                print(
+                    f"{path.name:<40} {level.value:<8} {stage:<14} {usage['peak'] / 1024:>10.1f} "
+                    f"{usage['retained'] / 1024:>13.1f} {usage['current'] / 1024:>12.1f}"
+                )
+                for site in usage["top"][:args.top]:
+                    print(f"{'':<64} {site['size'] / 1024:>8.1f} KiB {site['count']:>6} blocks  {site['site']}")
+
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares the default json.load parser against the streaming parser,
+which skips "rawData", other unused keys and the per-subset "items"
+arrays at the byte level.
+
+Usage: python benchmarks/bench_parser.py [--repeat N] [data files...]
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from pathlib import Path
+from typing import Callable
+
+from alttxt.parser import Parser
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_FILES = [
+    DATA_DIR / "movie.json",
+    DATA_DIR / "movies_with_bookmarks_selection.json",
+]
+
+
+def parse(path: Path, streaming: bool) -> None:
+    upset_parser = Parser(path, streaming=streaming)
+    upset_parser.get_grammar()
+    upset_parser.get_data()
+
+
+def measure(fn: Callable[[], None], repeat: int) -> "tuple[float, int]":
+    """
+    Returns the median wall time in seconds and the peak traced memory in bytes.
+    """
+    times: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(times), peak
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("files", nargs="*", type=Path, default=DEFAULT_FILES)
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    print(f"{'file':<40} {'mode':<10} {'median ms':>10} {'peak MiB':>10}")
+    for path in args.files:
+        results = {}
+        for mode, streaming in (("json.load", False), ("streaming", True)):
+            seconds, peak = measure(lambda: parse(path, streaming), args.repeat)
+            results[mode] = (seconds, peak)
+            print(f"{path.name:<40} {mode:<10} {seconds * 1000:>10.2f} {peak / 2**20:>10.2f}")
+
+        (base_time, base_peak), (new_time, new_peak) = results["json.load"], results["streaming"]
+        print(
+            f"{'':<40} {'change':<10} {(new_time / base_time - 1) * 100:>9.1f}% "
+            f"{(new_peak / base_peak - 1) * 100:>9.1f}%"
+        )
+        print(f"{'':<40} {Parser(path, streaming=True).skip_stats}")
+
+
+if __name__ == "__main__":
+    main()
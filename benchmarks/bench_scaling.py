@@ -0,0 +1,128 @@
+"""
+Measures how the pipeline scales with the size of an export, on synthetic
+exports (see alttxt.synthetic). One dimension is varied at a time - the
+number of sets, items or intersections - while the others stay at their
+base values, and for each size the export is written to a file, parsed and
+generated at the default level.
+
+For each dimension, the median time of each stage (see alttxt.profiling)
+and of the slowest tokens is printed against the size, followed by the
+slope of log(time) against log(size): about 1 for linear scaling, and
+noticeably more for super-linear scaling, which is flagged.
+The results can be written as JSON or CSV to plot elsewhere.
+
+Usage: python benchmarks/bench_scaling.py [--dimension sets|items|intersections] [--repeat N] [--json FILE] [--csv FILE]
+"""
+import argparse
+import csv
+import json
+import math
+import statistics
+import tempfile
+
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from alttxt.enums import Level
+from alttxt.pipeline import generate, parse
+from alttxt.profiling import Profile
+from alttxt.synthetic import synthetic_export
+
+BASE = {"sets": 16, "items": 20000, "intersections": 1000}
+SIZES = {
+    "sets": [4, 8, 16, 32, 63],
+    "items": [2000, 5000, 20000, 50000, 200000],
+    "intersections": [100, 300, 1000, 3000, 10000],
+}
+# Slopes over this are flagged as super-linear
+SLOPE_THRESHOLD = 1.3
+# The number of slowest tokens reported for each dimension
+TOP_TOKENS = 3
+
+
+def slope(sizes: "Sequence[float]", times: "Sequence[float]") -> float:
+    """
+    Returns the least-squares slope of log(time) against log(size).
+    """
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(time, 1e-9)) for time in times]
+    x_mean, y_mean = statistics.fmean(xs), statistics.fmean(ys)
+    spread = sum((x - x_mean) ** 2 for x in xs)
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / spread if spread else 0.0
+
+
+def measure(path: Path, repeat: int) -> "Dict[str, float]":
+    """
+    Returns the median time of each stage and token of generating the alt text of an export.
+    """
+    generate(*parse(path), Level.DEFAULT)
+    samples: "Dict[str, List[float]]" = {}
+    for _ in range(repeat):
+        profile = Profile()
+        grammar, data = parse(path, profile=profile)
+        generate(grammar, data, Level.DEFAULT, profile=profile)
+        samples.setdefault("total", []).append(sum(timing["wall"] for timing in profile.stages.values()))
+        for stage, timing in profile.stages.items():
+            samples.setdefault(stage, []).append(timing["wall"])
+        for token, timing in profile.tokens.items():
+            samples.setdefault(f"token:{token}", []).append(timing["wall"])
+    return {name: statistics.median(times) for name, times in samples.items()}
+
+
+def run_dimension(dimension: str, repeat: int, directory: Path) -> "List[Dict[str, Any]]":
+    results = []
+    for size in SIZES[dimension]:
+        params = dict(BASE, **{dimension: size})
+        path = directory / f"{dimension}-{size}.json"
+        path.write_text(json.dumps(synthetic_export(**params)))
+        results.append({"dimension": dimension, "size": size, **params, "bytes": path.stat().st_size,
+                        "times": measure(path, repeat)})
+        path.unlink()
+    return results
+
+
+def report(dimension: str, results: "List[Dict[str, Any]]") -> None:
+    sizes = [result["size"] for result in results]
+    tokens = sorted(
+        (name for name in results[-1]["times"] if name.startswith("token:")),
+        key=lambda name: -results[-1]["times"][name],
+    )
+    names = ["total", "load_data", "parse_grammar", "parse_data", "tokenmap", "render"] + tokens[:TOP_TOKENS]
+    print(f"\n{dimension} (others at {', '.join(f'{k}={v}' for k, v in BASE.items() if k != dimension)})")
+    print(f"{'stage':<36}" + "".join(f"{size:>10}" for size in sizes) + f"{'slope':>8}")
+    for name in names:
+        times = [result["times"].get(name, 0.0) for result in results]
+        fitted = slope(sizes, times)
+        flag = "  super-linear" if fitted > SLOPE_THRESHOLD else ""
+        print(f"{name:<36}" + "".join(f"{time * 1000:>10.2f}" for time in times) + f"{fitted:>8.2f}{flag}")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--dimension", choices=list(SIZES), action="append", help="Dimension to vary. Defaults to all.")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timed runs of each size. Defaults to %(default)s.")
+    arg_parser.add_argument("--json", type=Path, default=None, help="File to write the results to as JSON.")
+    arg_parser.add_argument("--csv", type=Path, default=None, help="File to write one row per size and stage to.")
+    args = arg_parser.parse_args()
+
+    results: "List[Dict[str, Any]]" = []
+    print("Times in ms, medians of each size")
+    with tempfile.TemporaryDirectory() as directory:
+        for dimension in args.dimension or list(SIZES):
+            dimension_results = run_dimension(dimension, args.repeat, Path(directory))
+            report(dimension, dimension_results)
+            results.extend(dimension_results)
+
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.csv is not None:
+        with open(args.csv, "w", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["dimension", "size", "bytes", "stage", "seconds"])
+            for result in results:
+                for name, time in result["times"].items():
+                    writer.writerow([result["dimension"], result["size"], result["bytes"], name, time])
+
+
+if __name__ == "__main__":
+    main()
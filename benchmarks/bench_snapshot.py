@@ -0,0 +1,67 @@
+"""
+Compares parsing an export with the streaming parser (cold) against
+loading the snapshot of the parsed export (warm), which skips the JSON.
+
+Usage: python benchmarks/bench_snapshot.py [--repeat N] [data files...]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Callable, Optional
+
+from alttxt.parser import Parser
+from alttxt.snapshot import SnapshotStore, file_digest
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def parse(path: Path, snapshot_dir: Optional[Path] = None) -> Parser:
+    upset_parser = Parser(path, streaming=True, snapshot_dir=snapshot_dir)
+    upset_parser.get_grammar()
+    upset_parser.get_data()
+    return upset_parser
+
+
+def median_time(fn: Callable[[], object], repeat: int) -> float:
+    """
+    Returns the median wall time of fn in seconds.
+    """
+    times: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("files", nargs="*", type=Path, default=sorted(DATA_DIR.glob("*.json")))
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    print(f"{'file':<40} {'cold ms':>10} {'snapshot ms':>12} {'speedup':>8} {'snapshot KiB':>13}")
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        for path in args.files:
+            try:
+                # Writes the snapshot
+                parse(path, Path(snapshot_dir))
+            except Exception as e:
+                print(f"{path.name:<40} skipped: {e}")
+                continue
+            assert parse(path, Path(snapshot_dir)).from_snapshot
+
+            cold = median_time(lambda: parse(path), args.repeat)
+            warm = median_time(lambda: parse(path, Path(snapshot_dir)), args.repeat)
+            size = SnapshotStore(Path(snapshot_dir)).path(file_digest(path)).stat().st_size
+            print(
+                f"{path.name:<40} {cold * 1000:>10.2f} {warm * 1000:>12.2f} "
+                f"{cold / warm:>7.1f}x {size / 1024:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
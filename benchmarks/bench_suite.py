@@ -0,0 +1,193 @@
+"""
+Runs every export in data/ through every Level and through the structured
+output of the default level, and reports for each run:
+- throughput: complete runs (parse and generate) per second
+- p50 and p99 latency of each stage (see alttxt.profiling) and of the whole run
+- peak traced memory of each stage, from one extra run under tracemalloc
+
+Results can be written as JSON and compared against the results of
+another commit, flagging the stages that got slower or use more memory.
+Exports that cannot be parsed are skipped.
+
+Usage: python benchmarks/bench_suite.py [--repeat N] [--json FILE] [--compare BASELINE] [data files...]
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from alttxt.enums import Level
+from alttxt.pipeline import generate, parse
+from alttxt.profiling import Profile
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+# Every Level, and the structured output, which only the default level has
+MODES: "List[Tuple[Level, bool]]" = [(level, False) for level in Level] + [(Level.DEFAULT, True)]
+# Changes within this fraction of the baseline are not flagged
+DEFAULT_THRESHOLD = 0.10
+
+
+def percentile(samples: "Sequence[float]", q: int) -> float:
+    """
+    Returns the q-th percentile of the samples, interpolating between them.
+    """
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+def run(path: Path, level: Level, structured: bool, profile: Profile) -> None:
+    grammar, data = parse(path, profile=profile)
+    generate(grammar, data, level, structured, profile=profile)
+
+
+def bench(path: Path, level: Level, structured: bool, repeat: int) -> "Dict[str, Any]":
+    """
+    Returns the throughput, latencies and peak memory of one export in one mode.
+    """
+    # Warm up: compile the render plans and fill other one-off caches
+    run(path, level, structured, Profile())
+
+    stage_samples: "Dict[str, List[float]]" = {}
+    totals: "List[float]" = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        profile = Profile()
+        run(path, level, structured, profile)
+        for stage, timing in profile.stages.items():
+            stage_samples.setdefault(stage, []).append(timing["wall"])
+        totals.append(sum(timing["wall"] for timing in profile.stages.values()))
+    elapsed = time.perf_counter() - start
+
+    traced = Profile(memory=True)
+    try:
+        run(path, level, structured, traced)
+    finally:
+        traced.close()
+
+    return {
+        "file": path.name,
+        "level": level.value,
+        "structured": structured,
+        "runs": repeat,
+        "throughput": repeat / elapsed,
+        "total": {"p50": percentile(totals, 50), "p99": percentile(totals, 99)},
+        "stages": {
+            stage: {
+                "p50": percentile(samples, 50),
+                "p99": percentile(samples, 99),
+                "peak": traced.memory[stage]["peak"],
+            }
+            for stage, samples in stage_samples.items()
+        },
+    }
+
+
+def environment() -> "Dict[str, Any]":
+    """
+    Describes where the results were measured, so that only comparable results are compared.
+    """
+    try:
+        commit: Optional[str] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=DATA_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def mode_name(result: "Dict[str, Any]") -> str:
+    return f"{result['level']}{'+st' if result['structured'] else ''}"
+
+
+def compare(baseline: "Dict[str, Any]", current: "Dict[str, Any]", threshold: float) -> int:
+    """
+    Prints the change of each stage's p50 latency and peak memory against a baseline.
+    Returns the number of stages that got slower or use more memory by more than threshold.
+    """
+    if baseline["environment"]["machine"] != current["environment"]["machine"]:
+        print("Warning: the baseline was measured on another kind of machine")
+    before = {(r["file"], r["level"], r["structured"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\n{'file':<40} {'mode':<10} {'stage':<14} {'p50':>9} {'peak':>9}")
+    for result in current["results"]:
+        old = before.get((result["file"], result["level"], result["structured"]))
+        if old is None:
+            continue
+        rows = [("total", result["total"]["p50"], old["total"]["p50"], None, None)]
+        for stage, stats in result["stages"].items():
+            if stage in old["stages"]:
+                previous = old["stages"][stage]
+                rows.append((stage, stats["p50"], previous["p50"], stats["peak"], previous["peak"]))
+        for stage, p50, old_p50, peak, old_peak in rows:
+            time_change = p50 / old_p50 - 1 if old_p50 else 0.0
+            memory_change = peak / old_peak - 1 if peak is not None and old_peak else 0.0
+            flag = ""
+            if time_change > threshold or memory_change > threshold:
+                flag = "  regression"
+                regressions += 1
+            memory = f"{memory_change * 100:>+8.1f}%" if peak is not None else f"{'':>9}"
+            print(f"{result['file']:<40} {mode_name(result):<10} {stage:<14} {time_change * 100:>+8.1f}% {memory}{flag}")
+    print(f"\n{regressions} regressions over {threshold * 100:.0f}%")
+    return regressions
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("files", nargs="*", type=Path, default=sorted(DATA_DIR.glob("*.json")))
+    arg_parser.add_argument("--repeat", type=int, default=30, help="Timed runs of each export and mode.")
+    arg_parser.add_argument("--json", type=Path, default=None, help="File to write the results to.")
+    arg_parser.add_argument("--compare", type=Path, default=None, help="Results of a baseline run to compare against.")
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative change over which a stage is flagged. Defaults to %(default)s.",
+    )
+    args = arg_parser.parse_args()
+
+    results: "List[Dict[str, Any]]" = []
+    print(
+        f"{'file':<40} {'mode':<10} {'stage':<14} {'p50 ms':>8} {'p99 ms':>8} {'peak KiB':>9} {'runs/s':>8}"
+    )
+    for path in args.files:
+        try:
+            parse(path)
+        except Exception as e:
+            print(f"{path.name:<40} skipped: {type(e).__name__}: {e}")
+            continue
+        for level, structured in MODES:
+            result = bench(path, level, structured, args.repeat)
+            results.append(result)
+            mode = mode_name(result)
+            total = result["total"]
+            print(
+                f"{path.name:<40} {mode:<10} {'total':<14} {total['p50'] * 1000:>8.2f} "
+                f"{total['p99'] * 1000:>8.2f} {'':>9} {result['throughput']:>8.1f}"
+            )
+            for stage, stats in result["stages"].items():
+                print(
+                    f"{'':<40} {'':<10} {stage:<14} {stats['p50'] * 1000:>8.2f} "
+                    f"{stats['p99'] * 1000:>8.2f} {stats['peak'] / 1024:>9.1f}"
+                )
+
+    output = {"environment": environment(), "repeat": args.repeat, "results": results}
+    if args.json is not None:
+        args.json.write_text(json.dumps(output, indent=2))
+    if args.compare is not None:
+        return 1 if compare(json.loads(args.compare.read_text()), output, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
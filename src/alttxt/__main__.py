@@ -1,17 +1,18 @@
 import argparse
+import json
 import os
 import sys
 
-from alttxt.generator import AltTxtGen
-from alttxt.models import DataModel, GrammarModel
-from alttxt.parser import Parser
-from alttxt.tokenmap import TokenMap
-
-from alttxt.enums import Explanation, Verbosity
 from alttxt.enums import Level
 
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+# numpy and pydantic take most of the start-up time, so the modules that use them
+# are imported once the arguments are parsed, and only by the code paths that need them:
+# --help, --version and usage errors exit without loading them.
+if TYPE_CHECKING:
+    from alttxt.cache import ResultCache
 
 
 # Entry point for the program
@@ -36,9 +37,30 @@ def main(argv: Optional["list[str]"] = None) -> int:
     parser.add_argument(
         "-D",
         "--data",
-        required=True,
         type=Path,
-        help="Relative path to data file.",
+        help="Relative path to data file. Required unless --dependencies or --batch is given.",
+    )
+    parser.add_argument(
+        "-B",
+        "--batch",
+        nargs="+",
+        metavar="INPUT",
+        help="Generate alt text for many data files: files, directories (searched recursively "
+        "for .json files) or glob patterns. Writes one JSON line per file.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes in batch mode. Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="File to write the JSON lines of batch mode to. Defaults to standard output.",
     )
     parser.add_argument(
         "-l",
@@ -61,22 +83,109 @@ def main(argv: Optional["list[str]"] = None) -> int:
         action="store_true",
         help="Alt-text structured text with appropriate headers. Returns JSON file with structured text.",
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Directory to cache generated alt text in. Exports that were already "
+        "generated with the same options are not parsed again.",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        type=Path,
+        default=None,
+        help="Directory of snapshots of parsed data files. Unchanged files are loaded "
+        "from their snapshot instead of being parsed again.",
+    )
+    parser.add_argument(
+        "--recompute",
+        action="store_true",
+        help="Recompute the sets and intersections from the items in the data file's rawData "
+        "instead of using the precomputed ones, which may be stale. --cache-dir is not used.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the wall and CPU time of each stage of the run and of each token "
+        "as JSON to standard error. In batch mode, the timings are added to each JSON line. "
+        "Outside batch mode, --cache-dir is not used, so that the generation is measured.",
+    )
+    parser.add_argument(
+        "--profile-stats",
+        type=Path,
+        default=None,
+        help="File to write cProfile statistics of the run to, readable with pstats. Implies --profile.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also trace the peak and retained memory of each stage and its top allocation sites "
+        "with tracemalloc. Slows the run down. Implies --profile.",
+    )
+    parser.add_argument(
+        "--dependencies",
+        action="store_true",
+        help="Print the symbols and tokens the level depends on, with the estimated cost "
+        "of each token, and exit. If --data is given, the measured cost is printed as well.",
+    )
 
     args: argparse.Namespace = parser.parse_args(argv)
 
-    try:
-        upset_parser: Parser = Parser(Path(args.data))
-        grammar: GrammarModel = upset_parser.get_grammar()
-        data: DataModel = upset_parser.get_data()
-    except Exception as e:
-        print(f"Exception while parsing: {str(e)}")
-        return 1
+    if args.data is None and not args.dependencies and not args.batch:
+        parser.error("the following arguments are required: -D/--data")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.profile_stats is not None and args.batch:
+        parser.error("--profile-stats cannot be used with --batch")
+    if args.profile_memory and args.batch:
+        parser.error("--profile-memory cannot be used with --batch")
+    if args.recompute and args.batch:
+        parser.error("--recompute cannot be used with --batch")
+
+    if args.batch:
+        return run_batch(args)
+
+    from alttxt import pipeline
+
+    if args.dependencies:
+        from alttxt.dependencies import dependency_graph, measure_token_costs
+        from alttxt.tokenmap import TokenMap
+
+        graph = dependency_graph(args.level, args.structured)
+        costs = None
+        if args.data is not None:
+            try:
+                grammar, data = pipeline.parse(Path(args.data), args.snapshot_dir, recompute=args.recompute)
+            except Exception as e:
+                print(f"Exception while parsing: {str(e)}")
+                return 1
+            costs = measure_token_costs(TokenMap(data, grammar, args.title, graph.tokens), graph.tokens)
+        print(graph.format(costs))
+        return 0
 
     title: str = args.title
+    profile = None
+    if args.profile or args.profile_stats is not None or args.profile_memory:
+        from alttxt.profiling import Profile
+
+        profile = Profile(cprofile=args.profile_stats is not None, memory=args.profile_memory)
 
-    tokenMap = TokenMap(data, grammar, title)
+    result_cache = cache(args) if profile is None and not args.recompute else None
+    if result_cache is not None:
+        try:
+            text, _ = result_cache.generate(Path(args.data).read_bytes(), args.level, args.structured, title)
+        except (OSError, pipeline.ExportError) as e:
+            print(f"Exception while parsing: {str(e)}")
+            return 1
+    else:
+        try:
+            grammar, data = pipeline.parse(Path(args.data), args.snapshot_dir, profile, args.recompute)
+        except Exception as e:
+            print(f"Exception while parsing: {str(e)}")
+            return 1
 
-    alttext = AltTxtGen(args.level, args.structured, tokenMap, grammar)
+        # Only the tokens the level can reach are mapped
+        text = pipeline.generate(grammar, data, args.level, args.structured, title, profile)
 
     print(90 * "-")
     print(
@@ -84,10 +193,72 @@ def main(argv: Optional["list[str]"] = None) -> int:
         "VERBOSITY={args.verbosity.value}\tEXPLAIN_UPSET={args.explain_upset.value}\tTITLE={title}"
     )
     print(90 * "-")
-    print(alttext.text)
+    print(text)
+
+    if profile is not None:
+        profile.close()
+        print(json.dumps(profile.as_dict(), indent=2), file=sys.stderr)
+        if args.profile_stats is not None:
+            profile.dump_stats(args.profile_stats)
 
     return 0
 
 
+def cache(args: argparse.Namespace) -> "Optional[ResultCache]":
+    """
+    Returns the on-disk result cache given by --cache-dir, if any.
+    The in-memory tier is disabled, since each run of the program is short-lived.
+    """
+    if args.cache_dir is None:
+        return None
+    from alttxt.cache import ResultCache
+
+    return ResultCache(max_memory_bytes=0, directory=args.cache_dir)
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """
+    Runs batch mode: writes one JSON line per data file and prints the
+    throughput of the run to standard error.
+    Returns 1 if any file failed, 0 otherwise.
+    """
+    from alttxt import batch
+
+    try:
+        paths = batch.expand_inputs(args.batch)
+    except FileNotFoundError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    if args.output is not None:
+        with open(args.output, "w") as out:
+            stats = batch.write_jsonl(
+                paths,
+                out,
+                args.level,
+                args.structured,
+                args.title,
+                args.workers,
+                cache(args),
+                args.snapshot_dir,
+                args.profile,
+            )
+    else:
+        stats = batch.write_jsonl(
+            paths,
+            sys.stdout,
+            args.level,
+            args.structured,
+            args.title,
+            args.workers,
+            cache(args),
+            args.snapshot_dir,
+            args.profile,
+        )
+
+    print(stats, file=sys.stderr)
+    return 1 if stats.failed else 0
+
+
 if __name__ == "__main__":
-    SystemExit(main())
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+"""
+Aggregates the intersections of an UpSet plot as the plot does when
+firstAggregateBy (and optionally secondAggregateBy) is set:
+- Degree: one aggregate per degree
+- Sets: one aggregate per set, of the intersections that include it
+- Deviations: the intersections with positive and with negative deviation;
+  intersections without deviation are in neither
+- Overlaps: one aggregate per combination of overlap_degree sets,
+  of the intersections that include all of them
+An intersection is in several aggregates when grouping by sets or overlaps.
+
+Each grouping is a boolean matrix with one row per intersection and one
+column per aggregate, so sizes, deviations and counts of all aggregates
+are computed as grouped sums over its True cells. The second-level aggregates within each
+first-level one are found one first-level aggregate at a time, and only
+those with subsets get a column.
+"""
+from itertools import combinations
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from alttxt.enums import AggregateBy
+from alttxt.subsettable import SubsetTable
+
+# The most aggregates an overlap grouping may create
+MAX_OVERLAP_GROUPS = 1 << 16
+# The most second-level aggregates, within all first-level aggregates together
+MAX_SECOND_LEVEL_GROUPS = 1 << 14
+
+
+def membership_matrix(table: SubsetTable) -> "npt.NDArray[np.bool_]":
+    """
+    Returns a boolean matrix that is True where the subset in a row belongs to the set of a column.
+    """
+    if table.mask.dtype == object:
+        return np.array(
+            [[int(mask) >> bit & 1 for bit in range(len(table.set_names))] for mask in table.mask], dtype=bool
+        ).reshape(len(table), len(table.set_names))
+    bits = np.arange(len(table.set_names), dtype=np.uint64)
+    members: "npt.NDArray[np.bool_]" = (table.mask[:, None] >> bits) & np.uint64(1) == 1
+    return members
+
+
+def grouping(
+    table: SubsetTable, aggregate_by: AggregateBy, overlap_degree: int = 2
+) -> "Tuple[List[str], npt.NDArray[np.bool_]]":
+    """
+    Returns the names of the aggregates of the subsets in a table, and a boolean
+    matrix with one row per subset and one column per aggregate that is True
+    where the subset is in the aggregate. Aggregates without subsets are left out.
+    Params:
+    - table: The subsets to aggregate
+    - aggregate_by: How to aggregate them. Must not be AggregateBy.NONE.
+    - overlap_degree: The number of sets of each aggregate of AggregateBy.OVERLAP
+    Raises ValueError if there would be more than MAX_OVERLAP_GROUPS overlap aggregates.
+    """
+    if aggregate_by == AggregateBy.DEGREE:
+        degrees = np.unique(table.degree)
+        return [f"degree {degree}" for degree in degrees.tolist()], table.degree[:, None] == degrees
+    if aggregate_by == AggregateBy.DEVIATION:
+        groups = np.stack((table.dev > 0, table.dev < 0), axis=1)
+        keep = groups.any(axis=0)
+        names = ["positive deviation", "negative deviation"]
+        return [name for name, kept in zip(names, keep.tolist()) if kept], groups[:, keep]
+
+    members = membership_matrix(table)
+    present = np.flatnonzero(members.any(axis=0))
+    if aggregate_by == AggregateBy.SETS:
+        return [table.set_names[bit] for bit in present.tolist()], members[:, present]
+    if aggregate_by == AggregateBy.OVERLAP:
+        if overlap_degree < 1:
+            raise ValueError("The overlap degree must be at least 1")
+        combos = np.array(list(combinations(present.tolist(), overlap_degree)), dtype=np.int64)
+        if len(combos) > MAX_OVERLAP_GROUPS:
+            raise ValueError(f"Aggregating by overlaps of {overlap_degree} sets creates too many aggregates")
+        combos = combos.reshape(-1, overlap_degree)
+        groups = members[:, combos].all(axis=2) if len(combos) else np.zeros((len(table), 0), dtype=bool)
+        keep = groups.any(axis=0)
+        names = [" and ".join(table.set_names[bit] for bit in combo) for combo in combos[keep].tolist()]
+        return names, groups[:, keep]
+    raise ValueError(f"Cannot aggregate by {aggregate_by.value}")
+
+
+class AggregateTable:
+    """
+    The aggregates of an UpSet plot, one row each. First-level aggregates
+    come first; the second-level aggregates of each follow all of them, in
+    the order of their parents. Each row has:
+    - name: The name of the aggregate, e.g. "degree 2", "Action", "Action and Drama"
+    - level: 1 for first-level aggregates, 2 for second-level ones
+    - parent: The row of the first-level aggregate a second-level aggregate
+      is part of, or -1
+    - size: The total size of the aggregated subsets
+    - dev: The total deviation of the aggregated subsets
+    - count: The number of aggregated subsets
+    - members: A boolean matrix with one row per subset and one column per
+      aggregate that is True where the subset is in the aggregate
+    """
+
+    def __init__(
+        self,
+        first: AggregateBy,
+        second: AggregateBy,
+        names: "Sequence[str]",
+        level: "npt.NDArray[np.int8]",
+        parent: "npt.NDArray[np.int64]",
+        members: "npt.NDArray[np.bool_]",
+        size: "npt.NDArray[np.int64]",
+        dev: "npt.NDArray[np.float64]",
+    ) -> None:
+        """
+        Params:
+        - first, second: How the first and second levels are aggregated
+        - names, level, parent, members: As described in the class docstring
+        - size, dev: The size and deviation of each subset
+        """
+        self.first: AggregateBy = first
+        self.second: AggregateBy = second
+        self.name: "List[str]" = list(names)
+        self.level = level
+        self.parent = parent
+        self.members = members
+        # Grouped reductions over the (subset, aggregate) pairs, which avoids
+        # casting the whole membership matrix to the dtype of size and dev
+        subsets, columns = np.nonzero(members)
+        self.size: "npt.NDArray[np.int64]" = np.bincount(columns, np.asarray(size, dtype=np.float64)[subsets], len(self.name)).astype(np.int64)
+        self.dev: "npt.NDArray[np.float64]" = np.bincount(columns, np.asarray(dev, dtype=np.float64)[subsets], len(self.name)).astype(np.float64, copy=False)
+        self.count: "npt.NDArray[np.int64]" = np.bincount(columns, minlength=len(self.name)).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    def rows(self, level: int, parent: Optional[int] = None) -> "npt.NDArray[np.intp]":
+        """
+        Returns the rows of the aggregates of a level, optionally only those within one parent.
+        """
+        selected = self.level == level
+        if parent is not None:
+            selected &= self.parent == parent
+        return np.flatnonzero(selected)
+
+    def largest(self, rows: "npt.NDArray[np.intp]", n: int) -> "npt.NDArray[np.intp]":
+        """
+        Returns up to n of the given rows, largest first. Ties keep their table order.
+        """
+        return rows[np.argsort(-self.size[rows], kind="stable")][:n]
+
+
+def aggregate(
+    table: SubsetTable,
+    first: AggregateBy,
+    first_overlap_degree: int = 2,
+    second: AggregateBy = AggregateBy.NONE,
+    second_overlap_degree: int = 2,
+) -> AggregateTable:
+    """
+    Aggregates the subsets in a table by one or two levels.
+    Params:
+    - table: The subsets to aggregate, usually the visible ones
+    - first: How to aggregate the subsets. Must not be AggregateBy.NONE.
+    - first_overlap_degree: The number of sets of each first-level overlap aggregate
+    - second: How to aggregate the subsets of each first-level aggregate, if at all
+    - second_overlap_degree: The number of sets of each second-level overlap aggregate
+    Raises ValueError if either level would have more than MAX_OVERLAP_GROUPS overlap aggregates,
+    or there would be more than MAX_SECOND_LEVEL_GROUPS second-level aggregates.
+    """
+    names, members = grouping(table, first, first_overlap_degree)
+    level = np.ones(len(names), dtype=np.int8)
+    parent = np.full(len(names), -1, dtype=np.int64)
+
+    if second != AggregateBy.NONE and names:
+        second_names, second_members = grouping(table, second, second_overlap_degree)
+        # The second-level aggregates with subsets in each first-level aggregate
+        children = [np.flatnonzero((members[:, [row]] & second_members).any(axis=0)) for row in range(len(names))]
+        kept_parents = np.repeat(np.arange(len(names), dtype=np.int64), [len(kept) for kept in children])
+        kept_children = np.concatenate(children)
+        if len(kept_children) > MAX_SECOND_LEVEL_GROUPS:
+            raise ValueError(f"Aggregating by {first.value} and then {second.value} creates too many aggregates")
+        names = names + [second_names[child] for child in kept_children.tolist()]
+        level = np.concatenate((level, np.full(len(kept_parents), 2, dtype=np.int8)))
+        parent = np.concatenate((parent, kept_parents))
+        columns = [members[:, [row]] & second_members[:, kept] for row, kept in enumerate(children)]
+        members = np.concatenate([members, *columns], axis=1)
+
+    return AggregateTable(first, second, names, level, parent, members, table.size, table.dev)
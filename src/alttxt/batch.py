@@ -0,0 +1,150 @@
+"""
+Batch mode: generates alt text for many exports in one run,
+fanning the files out across a pool of worker processes.
+Each export produces one JSON line (see pipeline.describe), in input order.
+"""
+import functools
+import glob
+import json
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from alttxt.cache import ResultCache
+from alttxt.enums import Level
+from alttxt.pipeline import describe
+
+# Extension of the exports collected from directories
+EXPORT_SUFFIX = ".json"
+
+
+def expand_inputs(inputs: "Iterable[str]") -> "List[Path]":
+    """
+    Returns the export files named by a list of inputs, without duplicates.
+    Params:
+    - inputs: Files, directories (searched recursively for .json files)
+              or glob patterns (** matches any number of directories)
+    Raises FileNotFoundError if an input matches no file.
+    """
+    files: "Dict[Path, None]" = {}
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = sorted(p for p in path.rglob("*" + EXPORT_SUFFIX) if p.is_file())
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+        if not matches:
+            raise FileNotFoundError(f"No exports found for {item!r}")
+        files.update(dict.fromkeys(matches))
+    return list(files)
+
+
+class BatchStats:
+    """
+    Aggregate counts of a batch run.
+    - files: The number of exports processed
+    - failed: The number of exports whose generation raised an exception
+    - cached: The number of exports whose result came from the cache
+    - seconds: The wall time of the whole run
+    - busy: The sum of the time spent on each export, across all workers
+    """
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.failed = 0
+        self.cached = 0
+        self.seconds = 0.0
+        self.busy = 0.0
+
+    def add(self, record: "Dict[str, Any]") -> None:
+        self.files += 1
+        self.failed += record["error"] is not None
+        self.cached += record.get("cached", False)
+        self.busy += record["timings"]["total"]
+
+    @property
+    def throughput(self) -> float:
+        """
+        Exports per second of wall time.
+        """
+        return self.files / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} files ({self.failed} failed, {self.cached} cached) in {self.seconds:.2f} s: "
+            f"{self.throughput:.1f} files/s, {self.busy / max(self.files, 1) * 1000:.1f} ms per file"
+        )
+
+
+def run(
+    paths: "List[Path]",
+    level: Level,
+    structured: bool = False,
+    title: Optional[str] = None,
+    workers: Optional[int] = None,
+    cache: Optional[ResultCache] = None,
+    snapshot_dir: Optional[Path] = None,
+    profile: bool = False,
+) -> "Iterator[Dict[str, Any]]":
+    """
+    Yields the record of each export, in the order of paths.
+    Params:
+    - paths: The exports to process
+    - level, structured, title: Passed to pipeline.describe
+    - workers: The number of worker processes. Defaults to the number of CPUs.
+               With 1 worker (or a single file) the exports are processed
+               in this process, without starting a pool.
+    - cache: If given, results are looked up in and added to this cache.
+             Each worker gets a copy, so only its disk tier is shared.
+    - snapshot_dir: If given, a directory of snapshots of parsed exports (see Parser)
+    - profile: Whether each record gets the timings of each stage and token
+    """
+    workers = workers or os.cpu_count() or 1
+    task = functools.partial(
+        describe,
+        level=level,
+        structured=structured,
+        title=title,
+        cache=cache,
+        snapshot_dir=snapshot_dir,
+        profile=profile,
+    )
+
+    if workers == 1 or len(paths) <= 1:
+        yield from map(task, paths)
+        return
+
+    # Send several files to a worker at once to amortize the cost of the
+    # round trip, while keeping enough chunks to balance the load
+    chunksize = max(1, min(16, len(paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        yield from executor.map(task, paths, chunksize=chunksize)
+
+
+def write_jsonl(
+    paths: "List[Path]",
+    out: TextIO,
+    level: Level,
+    structured: bool = False,
+    title: Optional[str] = None,
+    workers: Optional[int] = None,
+    cache: Optional[ResultCache] = None,
+    snapshot_dir: Optional[Path] = None,
+    profile: bool = False,
+) -> BatchStats:
+    """
+    Processes the exports and writes one JSON line per export to out.
+    Returns the aggregate counts of the run.
+    """
+    stats = BatchStats()
+    start = time.perf_counter()
+    for record in run(paths, level, structured, title, workers, cache, snapshot_dir, profile):
+        out.write(json.dumps(record) + "\n")
+        stats.add(record)
+    stats.seconds = time.perf_counter() - start
+    return stats
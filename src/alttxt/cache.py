@@ -0,0 +1,373 @@
+"""
+A content-addressed cache of generated alt text.
+
+Results are keyed by a hash of the parts of the export the parser reads
+(see export_digest) together with the options the text was generated
+with and the source of the modules that generate it, so a repeated
+request is answered without parsing the export, building a TokenMap or
+rendering anything, and results of other versions are never returned.
+
+There are two tiers: an in-memory LRU bounded by the total size of the
+cached results, and an optional directory on disk, bounded by size and
+with a time to live, which can be shared between processes.
+"""
+import functools
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from alttxt import jsonstream
+from alttxt.enums import Level
+from alttxt.parser import PARSED_KEYS, RAW_KEYS, RAW_SKIPPED_PATHS, SKIPPED_PATHS, needs_raw_data
+from alttxt.pipeline import Output, generate_bytes
+
+# Part of every key. Bump it whenever the format of the cached results changes;
+# changes to the generator are covered by generator_fingerprint.
+CACHE_VERSION = 2
+# The modules of the package that generating alt text from an export imports,
+# directly or not. The hash of their source is part of every key.
+GENERATOR_MODULES = (
+    "pipeline", "parser", "models", "subsettable", "jsonstream", "enums", "view", "setquery", "intersections",
+    "generator", "tokenmap", "phrases", "glossary", "renderplan", "dependencies", "regionclass", "trend",
+    "aggregation", "profiling", "snapshot", "cache",
+)
+
+# Number of export digests remembered by the hash of the raw export
+DIGEST_MEMO_SIZE = 1024
+
+# Default bounds of the tiers
+MEMORY_BYTES = 64 * 1024 * 1024
+DISK_BYTES = 1024 * 1024 * 1024
+DISK_TTL = 7 * 24 * 60 * 60.0
+
+
+def export_digest(raw: "Union[bytes, mmap.mmap]") -> str:
+    """
+    Returns a hash of the canonical content of an export: the values of the
+    keys in PARSED_KEYS, in sorted key order, and of the keys in RAW_KEYS
+    (without RAW_SKIPPED_PATHS) if the subsets are recomputed from them
+    (see parser.needs_raw_data). Other keys and the order of the keys
+    do not affect the hash.
+    Raises ValueError if the export is not a JSON object.
+    """
+    data = jsonstream.load_keys(raw, ["allSets", "processedData"], SKIPPED_PATHS)
+    try:
+        recomputed = needs_raw_data(data)
+    except (AttributeError, KeyError, TypeError):
+        # Malformed exports cannot be parsed either way, so hash everything they could depend on
+        recomputed = True
+    keys: "list[str]" = PARSED_KEYS
+    skip_paths: "list[Tuple[str, ...]]" = []
+    if recomputed:
+        keys, skip_paths = PARSED_KEYS + RAW_KEYS, RAW_SKIPPED_PATHS
+    return jsonstream.digest_keys(raw, keys, skip_paths).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def generator_fingerprint() -> str:
+    """
+    Returns a hash of the source of GENERATOR_MODULES, read once per process.
+    """
+    digest = hashlib.sha256()
+    package = Path(__file__).resolve().parent
+    for module in GENERATOR_MODULES:
+        digest.update((package / f"{module}.py").read_bytes())
+    return digest.hexdigest()
+
+
+def cache_key(digest: str, level: Level, structured: bool = False, title: Optional[str] = None) -> str:
+    """
+    Returns the key of the result of generating alt text from an export with some options.
+    Params:
+    - digest: The export_digest of the export
+    - level, structured, title: The options passed to pipeline.generate
+    """
+    options = json.dumps([CACHE_VERSION, generator_fingerprint(), digest, level.value, structured, title])
+    return hashlib.sha256(options.encode()).hexdigest()
+
+
+class CacheStats:
+    """
+    Counters of a cache tier.
+    - hits, misses: Lookups that did and did not find a result
+    - evictions: Results removed to stay within the size bound
+    - expirations: Results removed because they outlived the time to live
+    - entries, bytes: The number and total size of the cached results
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.entries = 0
+        self.bytes = 0
+
+    def as_dict(self) -> "Dict[str, int]":
+        return dict(vars(self))
+
+    def __repr__(self) -> str:
+        return "CacheStats(" + ", ".join(f"{name}={value}" for name, value in vars(self).items()) + ")"
+
+
+class MemoryCache:
+    """
+    A least recently used cache of encoded results, bounded by their total size.
+    Params:
+    - max_bytes: The most bytes of results to hold. Results larger than
+      this are never cached.
+    """
+
+    def __init__(self, max_bytes: int = MEMORY_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.stats.bytes -= len(previous)
+        self._entries[key] = value
+        self.stats.bytes += len(value)
+        while self.stats.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.stats.bytes -= len(evicted)
+            self.stats.evictions += 1
+        self.stats.entries = len(self._entries)
+
+
+class DiskCache:
+    """
+    A directory of encoded results, one file per key, bounded by total size
+    and by the age of each result. Files are written atomically, so several
+    processes can share a directory.
+    When the directory grows past max_bytes, the oldest results are removed.
+    Params:
+    - directory: Where results are stored. Created if it does not exist.
+    - max_bytes: The most bytes of results to hold
+    - ttl: Seconds after which a result is removed, counted from when it was written
+    """
+
+    SUFFIX = ".json"
+
+    def __init__(self, directory: Path, max_bytes: int = DISK_BYTES, ttl: float = DISK_TTL) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / (key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.ttl:
+                if self._remove(path):
+                    self.stats.bytes -= stat.st_size
+                    self.stats.entries -= 1
+                    self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            value = path.read_bytes()
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Written to a unique file first, so readers never see a partial result
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        temporary.write_bytes(value)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = None
+        os.replace(temporary, path)
+        if replaced is not None:
+            self.stats.bytes -= replaced
+        else:
+            self.stats.entries += 1
+        self.stats.bytes += len(value)
+        if self.stats.bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes expired results, then the oldest results until the directory
+        fits in max_bytes.
+        """
+        now = time.time()
+        files = self._scan()
+        for mtime, size, path in sorted(files):
+            expired = now - mtime > self.ttl
+            if not expired and self.stats.bytes <= self.max_bytes:
+                break
+            if self._remove(path):
+                self.stats.bytes -= size
+                self.stats.entries -= 1
+                if expired:
+                    self.stats.expirations += 1
+                else:
+                    self.stats.evictions += 1
+
+    def _scan(self) -> "list[Tuple[float, int, Path]]":
+        """
+        Lists the cached results and recounts their number and total size,
+        which other processes sharing the directory may have changed.
+        """
+        files = []
+        for path in self.directory.glob("*/*" + self.SUFFIX):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        self.stats.entries = len(files)
+        self.stats.bytes = sum(size for _, size, _ in files)
+        return files
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            # Already removed by another process
+            return False
+
+
+class ResultCache:
+    """
+    The two cache tiers, in front of pipeline.generate_bytes.
+    Results found on disk are copied to memory. Safe to use from several threads.
+    Params:
+    - max_memory_bytes: The bound of the in-memory tier. 0 disables it.
+    - directory: If given, where the on-disk tier is stored
+    - max_disk_bytes, ttl: The bounds of the on-disk tier (see DiskCache)
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = MEMORY_BYTES,
+        directory: Optional[Path] = None,
+        max_disk_bytes: int = DISK_BYTES,
+        ttl: float = DISK_TTL,
+    ) -> None:
+        self.memory: Optional[MemoryCache] = MemoryCache(max_memory_bytes) if max_memory_bytes > 0 else None
+        self.disk: Optional[DiskCache] = DiskCache(directory, max_disk_bytes, ttl) if directory is not None else None
+        self._lock = threading.Lock()
+        # Hashing the raw bytes is much cheaper than finding the parsed keys,
+        # so the digest of an export that was seen before is looked up instead
+        self._digests: "OrderedDict[str, str]" = OrderedDict()
+
+    def __getstate__(self) -> "Dict[str, Any]":
+        # Locks cannot be sent to worker processes
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: "Dict[str, Any]") -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Output]:
+        """
+        Returns the cached result of a key, or None.
+        """
+        with self._lock:
+            value = self.memory.get(key) if self.memory is not None else None
+            if value is None and self.disk is not None:
+                value = self.disk.get(key)
+                if value is not None and self.memory is not None:
+                    self.memory.put(key, value)
+        return json.loads(value) if value is not None else None
+
+    def put(self, key: str, output: Output) -> None:
+        value = json.dumps(output).encode()
+        with self._lock:
+            if self.memory is not None:
+                self.memory.put(key, value)
+            if self.disk is not None:
+                self.disk.put(key, value)
+
+    def generate(
+        self,
+        raw: "Union[bytes, mmap.mmap]",
+        level: Level,
+        structured: bool = False,
+        title: Optional[str] = None,
+    ) -> "Tuple[Output, bool]":
+        """
+        Returns the alt text of an export held in memory and whether it came from the cache.
+        On a miss, the text is generated and cached.
+        Raises pipeline.ExportError if the export cannot be parsed.
+        """
+        key = self.key(raw, level, structured, title)
+        output = self.get(key)
+        if output is not None:
+            return output, True
+        output = generate_bytes(raw, level, structured, title)
+        self.put(key, output)
+        return output, False
+
+    def key(
+        self, raw: "Union[bytes, mmap.mmap]", level: Level, structured: bool = False, title: Optional[str] = None
+    ) -> str:
+        """
+        Returns the key of an export held in memory and the options.
+        Exports that are not JSON objects get a key from their raw bytes,
+        so the error is raised (and not cached) when generating.
+        """
+        raw_digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            digest = self._digests.get(raw_digest)
+            if digest is not None:
+                self._digests.move_to_end(raw_digest)
+        if digest is None:
+            try:
+                digest = export_digest(raw)
+            except ValueError:
+                digest = "raw:" + raw_digest
+            with self._lock:
+                self._digests[raw_digest] = digest
+                if len(self._digests) > DIGEST_MEMO_SIZE:
+                    self._digests.popitem(last=False)
+        return cache_key(digest, level, structured, title)
+
+    def stats(self) -> "Dict[str, Dict[str, int]]":
+        """
+        Returns the counters of each enabled tier.
+        """
+        with self._lock:
+            result = {}
+            if self.memory is not None:
+                result["memory"] = self.memory.stats.as_dict()
+            if self.disk is not None:
+                result["disk"] = self.disk.stats.as_dict()
+            return result
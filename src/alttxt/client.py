@@ -0,0 +1,74 @@
+"""
+A thin client of alttxt.daemon. It takes the same arguments as the
+command line (python -m alttxt), sends them to the daemon and prints the
+result, so a call does not pay for importing numpy and pydantic.
+If no daemon is listening, or the platform cannot run one (Windows has
+neither Unix domain sockets nor fork), the call runs in this process instead.
+
+Only the standard library is imported until a fallback is needed.
+
+Usage: python -m alttxt.client [alttxt arguments]
+"""
+import json
+import os
+import socket
+import sys
+
+from typing import Any, Dict, List, Optional
+
+# Kept in sync with alttxt.daemon, which cannot be imported here without its dependencies
+SOCKET_ENV = "ALTTXT_SOCKET"
+# Whether this platform can run alttxt.daemon, as alttxt.daemon.SUPPORTED
+DAEMON_SUPPORTED = hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def default_socket_path() -> str:
+    """
+    Returns ALTTXT_SOCKET if set, otherwise a socket in the user's runtime directory.
+    """
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    directory = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(directory, f"alttxt-{os.getuid()}.sock")
+
+
+def request(message: "Dict[str, Any]", socket_path: Optional[str] = None) -> "Dict[str, Any]":
+    """
+    Sends a message to the daemon and returns its response.
+    Raises OSError if no daemon is listening on the socket or the platform cannot run one.
+    """
+    if not DAEMON_SUPPORTED:
+        raise OSError("Unix domain sockets are not available on this platform")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(json.dumps(message).encode())
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    if not chunks:
+        raise ConnectionError("The daemon closed the connection without a response")
+    response = json.loads(b"".join(chunks))
+    if not isinstance(response, dict):
+        raise ConnectionError("The daemon's response is not a JSON object")
+    return response
+
+
+def main(argv: "Optional[List[str]]" = None, socket_path: Optional[str] = None) -> int:
+    argv = argv if argv is not None else sys.argv[1:]
+    try:
+        response = request({"argv": argv, "cwd": os.getcwd()}, socket_path)
+    except OSError:
+        from alttxt.__main__ import main as run
+
+        return run(argv)
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return int(response["exit"])
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+"""
+A long-lived process that answers command line calls over a Unix domain socket.
+
+Starting the daemon imports numpy, pydantic and the rest of the package and
+compiles the render plans of every level once. The daemon reads each request
+itself and handles each call in a forked child, which inherits all of that, runs
+alttxt.__main__.main with the caller's arguments and working directory,
+and sends back what it printed and its exit status. alttxt.client sends the calls.
+Windows has neither Unix domain sockets nor fork, so the daemon does not run there.
+
+Protocol: the client sends one JSON object, {"argv": [...], "cwd": "..."},
+and closes its side of the connection. The daemon answers with one JSON
+object, {"exit": <status>, "stdout": "...", "stderr": "..."}.
+{"command": "ping"} and {"command": "shutdown"} check on and stop the daemon.
+
+Usage: python -m alttxt.daemon [--socket PATH]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from typing import Any, Dict, List, Optional, Union
+
+# The socket used when neither --socket nor ALTTXT_SOCKET is given
+SOCKET_ENV = "ALTTXT_SOCKET"
+# Largest request accepted, in bytes. Requests only carry arguments.
+MAX_REQUEST_BYTES = 1024 * 1024
+# Seconds a client has to send its request, during which the daemon accepts no other calls
+REQUEST_TIMEOUT = 5.0
+# Whether this platform has the Unix domain sockets and fork the daemon needs
+SUPPORTED = hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def default_socket_path() -> str:
+    """
+    Returns ALTTXT_SOCKET if set, otherwise a socket in the user's runtime directory.
+    """
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    directory = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(directory, f"alttxt-{os.getuid()}.sock")
+
+
+def preload() -> None:
+    """
+    Imports everything a call needs and compiles the render plan of every level,
+    so that forked children start warm.
+    """
+    from alttxt import __main__  # noqa: F401
+    from alttxt.dependencies import dependency_graph
+    from alttxt.enums import Level
+    from alttxt.generator import level_template
+    from alttxt.renderplan import render_plan
+
+    for level in Level:
+        render_plan(level_template(level))
+        dependency_graph(level, False)
+        # The structured graph also covers the phrases rendered one by one
+        graph = dependency_graph(level, True)
+        for path in graph.phrases:
+            render_plan(graph.phrase(path))
+
+
+def run_call(argv: "List[str]", cwd: str) -> "Dict[str, Any]":
+    """
+    Runs the command line with argv in cwd and returns its exit status and output.
+    """
+    from alttxt.__main__ import main
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            os.chdir(cwd)
+            status = main(argv)
+        except SystemExit as e:
+            # Raised by argparse for --help, --version and usage errors
+            status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if isinstance(e.code, str):
+                print(e.code, file=sys.stderr)
+        except Exception as e:
+            print(f"{type(e).__name__}: {e}", file=sys.stderr)
+            status = 1
+    return {"exit": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "Daemon"
+
+    def handle(self) -> None:
+        try:
+            request = self.server.pending
+            if isinstance(request, Exception):
+                raise request
+            command = request.get("command", "run")
+            if command == "run":
+                response = run_call([str(arg) for arg in request["argv"]], str(request["cwd"]))
+            elif command == "ping":
+                response = {"exit": 0, "stdout": "", "stderr": "", "pid": os.getpid()}
+            elif command == "shutdown":
+                response = {"exit": 0, "stdout": "", "stderr": ""}
+                self.server.request_shutdown()
+            else:
+                raise ValueError(f"unknown command {command!r}")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response = {"exit": 2, "stdout": "", "stderr": f"Invalid daemon request: {e}\n"}
+        self.wfile.write(json.dumps(response).encode())
+
+
+if SUPPORTED:
+
+    class Daemon(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+        """
+        Serves command line calls on a Unix domain socket, one forked child per call.
+        Params:
+        - socket_path: Where to listen. A stale socket left by a daemon that
+          is no longer running is replaced.
+        """
+
+        # Children are reaped without blocking the accept loop
+        block_on_close = False
+
+        def __init__(self, socket_path: str) -> None:
+            self.socket_path = socket_path
+            if os.path.exists(socket_path):
+                if is_running(socket_path):
+                    raise RuntimeError(f"A daemon is already listening on {socket_path}")
+                os.unlink(socket_path)
+            # Only the user who started the daemon can connect
+            previous_umask = os.umask(0o177)
+            try:
+                super().__init__(socket_path, _Handler)
+            finally:
+                os.umask(previous_umask)
+            # The request being handled, or why it could not be read
+            self.pending: "Union[Dict[str, Any], ValueError]" = {}
+
+        def process_request(self, request: Any, client_address: Any) -> None:
+            # The request is read before forking, and only calls are run in a child:
+            # they change the working directory and output of their process,
+            # while a shutdown has to stop the daemon itself
+            try:
+                self.pending = read_request(request)
+            except ValueError as e:
+                self.pending = e
+            if isinstance(self.pending, dict) and self.pending.get("command", "run") == "run":
+                super().process_request(request, client_address)
+                return
+            try:
+                self.finish_request(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def request_shutdown(self) -> None:
+            # shutdown() waits for serve_forever to return, so it cannot be called from its thread
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+        def server_close(self) -> None:
+            super().server_close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.socket_path)
+
+
+def read_request(sock: Any) -> "Dict[str, Any]":
+    """
+    Reads a request until the client closes its side of the connection and decodes it.
+    Raises ValueError if the request is too large, too slow or not a JSON object.
+    """
+    sock.settimeout(REQUEST_TIMEOUT)
+    chunks: "List[bytes]" = []
+    size = 0
+    try:
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_REQUEST_BYTES:
+                raise ValueError("request too large")
+            chunks.append(chunk)
+    except OSError as e:
+        raise ValueError(f"request could not be read: {e}") from e
+    finally:
+        sock.settimeout(None)
+    request = json.loads(b"".join(chunks))
+    if not isinstance(request, dict):
+        raise ValueError("request is not a JSON object")
+    return request
+
+
+def is_running(socket_path: str) -> bool:
+    """
+    Returns whether a daemon answers on the socket.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def main(argv: "Optional[List[str]]" = None) -> int:
+    parser = argparse.ArgumentParser(prog="alttxt.daemon", description="Serves alttxt command line calls.")
+    parser.add_argument("--socket", default=None, help="Socket path. Defaults to $ALTTXT_SOCKET or a per-user path.")
+    args = parser.parse_args(argv)
+
+    if not SUPPORTED:
+        print("The alttxt daemon needs Unix domain sockets and fork, which this platform does not have", file=sys.stderr)
+        return 1
+    socket_path = args.socket or default_socket_path()
+    preload()
+    try:
+        daemon = Daemon(socket_path)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(f"alttxt daemon listening on {socket_path}", file=sys.stderr)
+    with daemon:
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
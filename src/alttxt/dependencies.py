@@ -0,0 +1,402 @@
+"""
+Static analysis of the grammar in phrases.DESCRIPTIONS.
+
+The phrases a Level renders are fixed, so the non-terminal [[symbols]] and
+{{tokens}} they can reach are known before any data is loaded. TokenMap
+uses the reachable tokens to leave every other token out of its map,
+and the --dependencies command line option prints the graph.
+"""
+import functools
+import re
+import time
+
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from alttxt import phrases
+from alttxt.enums import Level
+
+# Non-terminal and terminal references in a phrase
+SYMBOL_PATTERN = re.compile(r"\[\[(.*?)\]\]")
+TOKEN_PATTERN = re.compile(r"{{(.*?)}}")
+
+# Paths in DESCRIPTIONS of the phrases rendered for each level, in order
+LEVEL_PHRASES: "Dict[Level, Tuple[Tuple[str, ...], ...]]" = {
+    Level.ONE: (
+        ("level_1", "upset_introduction"),
+        ("level_1", "dataset_properties"),
+    ),
+    Level.TWO: (
+        ("level_2", "set_description"),
+        ("level_2", "intersection_description"),
+        ("level_2", "statistical_information"),
+    ),
+    Level.DEFAULT: (
+        ("level_1", "upset_introduction"),
+        ("level_1", "dataset_properties"),
+        ("level_2", "set_description"),
+        ("level_2", "queries_and_filters"),
+        ("level_2", "selection_description"),
+        ("level_2", "intersection_description"),
+        ("level_2", "statistical_information"),
+        ("level_3", "trend_analysis"),
+    ),
+}
+# Extra phrases rendered by the structured output of the default level
+STRUCTURED_PHRASES: "Tuple[Tuple[str, ...], ...]" = (
+    ("level_1", "technical_description"),
+    ("AltText",),
+)
+
+# Estimated cost of computing each token, where n is the number of
+# visible intersections, s the number of sets and g the number of aggregates.
+# Tokens that share a memoized helper only pay for it once.
+TOKEN_COSTS: "Dict[str, str]" = {
+    "title": "O(1)",
+    "dataset_description": "O(1)",
+    "set_description": "O(1)",
+    "largest_factor": "O(n log n)",
+    "empty_set_presence": "O(n log n)",
+    "all_set_presence": "O(n)",
+    "intersection_trend_analysis": "O(n) fit",
+    "individual_set_presence": "O(n log n)",
+    "low_set_presence": "O(n log n)",
+    "high_set_presence": "O(n log n)",
+    "medium_set_presence": "O(n log n)",
+    "universal_set_size": "O(s)",
+    "set_count": "O(1)",
+    "visible_set_count": "O(1)",
+    "list_set_names": "O(s)",
+    "list_visible_set_names": "O(s)",
+    "sort_visible_sets": "O(s log s)",
+    "list_sorted_visible_sets": "O(s log s)",
+    "max_set_name": "O(s log s)",
+    "max_set_size": "O(s log s)",
+    "max_set_percentage": "O(n)",
+    "min_set_name": "O(s log s)",
+    "min_set_size": "O(s log s)",
+    "min_set_percentage": "O(n)",
+    "set_divergence": "O(s log s)",
+    "max_intersection_name": "O(n)",
+    "max_intersection_size": "O(n)",
+    "largest_intersections": "O(n log n)",
+    "two_set_intersection": "O(n log n)",
+    "other_large_intersections": "O(n log n)",
+    "min_size": "O(n)",
+    "max_size": "O(n)",
+    "avg_size": "O(n)",
+    "median_size": "O(n log n)",
+    "25perc_size": "O(n log n)",
+    "75perc_size": "O(n log n)",
+    "pop_intersect_count": "O(1)",
+    "non_empty_visible_intersect_count": "O(n)",
+    "non_empty_intersect_count": "O(n)",
+    "visible_non_empty_intersect_count": "O(n)",
+    "total_non_empty_intersect_count": "O(n)",
+    "pop_non-empty_intersections": "O(n)",
+    "sort_type": "O(1)",
+    "sort_order": "O(1)",
+    "list_degree_count": "O(n)",
+    "list_degree_info": "O(n)",
+    "list_degree_info_verbose": "O(n)",
+    "subset_size": "O(1)",
+    "list_max_10int": "O(n log n)",
+    "list_max_5int": "O(n log n)",
+    "list_all_int": "O(n log n)",
+    "max_int_size": "O(n log n)",
+    "max_int_name": "O(n log n)",
+    "min_int_size": "O(n log n)",
+    "min_int_name": "O(n log n)",
+    "90perc_size": "O(n log n)",
+    "10perc_size": "O(n log n)",
+    "var_count": "O(1)",
+    "list_var_names": "O(1)",
+    "pos_dev_count": "O(n)",
+    "neg_dev_count": "O(n)",
+    "pos_dev_size": "O(n)",
+    "neg_dev_size": "O(n)",
+    "avg_pos_dev": "O(n)",
+    "avg_neg_dev": "O(n)",
+    "list_set_sizes": "O(s)",
+    "list10_dev_outliers": "O(n log n)",
+    "list5_dev_outliers": "O(n log n)",
+    "category_of_subsets": "O(n log n)",
+    "highest_dominant_set": "O(n s)",
+    "large_sets": "O(n log n)",
+    "all_set_index": "O(n log n)",
+    "set_query": "O(s)",
+    "degree_filters": "O(1)",
+    "hide_settings": "O(1)",
+    "selected_intersection": "O(1)",
+    "bookmark_list": "O(bookmarks)",
+    "aggregation": "O(n g)",
+}
+
+# What each token reads, so that TokenMap.update only recomputes the tokens
+# whose inputs changed:
+# - "subsets": the visible subsets (DataModel.subset_table), which change
+#   with the grammar's filters, set query and sort (see alttxt.view)
+# - "data": the rest of the DataModel, which only changes with the export
+# - the names of the GrammarModel fields the token reads
+# The title is fixed for a TokenMap, so it is no input.
+SUBSETS = "subsets"
+DATA = "data"
+# The GrammarModel fields that the visible subsets are derived from (see alttxt.view)
+VIEW_FIELDS: "FrozenSet[str]" = frozenset(("filters", "set_query", "sort_by", "sort_order"))
+TOKEN_INPUTS: "Dict[str, FrozenSet[str]]" = {
+    token: frozenset(inputs)
+    for token, inputs in {
+        "title": (),
+        "dataset_description": ("metaData",),
+        "set_description": ("metaData",),
+        "largest_factor": (SUBSETS,),
+        "empty_set_presence": (SUBSETS,),
+        "all_set_presence": (SUBSETS, DATA),
+        "intersection_trend_analysis": (SUBSETS,),
+        "individual_set_presence": (SUBSETS,),
+        "low_set_presence": (SUBSETS,),
+        "high_set_presence": (SUBSETS,),
+        "medium_set_presence": (SUBSETS,),
+        "universal_set_size": (DATA,),
+        "set_count": (DATA,),
+        "visible_set_count": ("visible_sets",),
+        "list_set_names": (DATA,),
+        "list_visible_set_names": ("visible_sets",),
+        "sort_visible_sets": ("visible_set_sizes", "set_query"),
+        "list_sorted_visible_sets": ("visible_set_sizes",),
+        "max_set_name": ("visible_set_sizes", "set_query"),
+        "max_set_size": ("visible_set_sizes", "set_query"),
+        "max_set_percentage": (SUBSETS, "visible_set_sizes", "set_query"),
+        "min_set_name": ("visible_set_sizes", "set_query"),
+        "min_set_size": ("visible_set_sizes", "set_query"),
+        "min_set_percentage": (SUBSETS, "visible_set_sizes", "set_query"),
+        "set_divergence": ("visible_set_sizes", "set_query"),
+        "max_intersection_name": (SUBSETS,),
+        "max_intersection_size": (SUBSETS,),
+        "largest_intersections": (SUBSETS,),
+        "two_set_intersection": (SUBSETS, "metaData"),
+        "other_large_intersections": (SUBSETS, "visible_sets"),
+        "min_size": (DATA,),
+        "max_size": (DATA,),
+        "avg_size": (SUBSETS,),
+        "median_size": (SUBSETS,),
+        "25perc_size": (SUBSETS,),
+        "75perc_size": (SUBSETS,),
+        "pop_intersect_count": (SUBSETS,),
+        "non_empty_visible_intersect_count": (SUBSETS,),
+        "non_empty_intersect_count": (DATA,),
+        "visible_non_empty_intersect_count": (SUBSETS,),
+        "total_non_empty_intersect_count": (DATA,),
+        "pop_non-empty_intersections": (SUBSETS, DATA),
+        "sort_type": ("sort_by",),
+        "sort_order": ("sort_order",),
+        "list_degree_count": (SUBSETS,),
+        "list_degree_info": (SUBSETS,),
+        "list_degree_info_verbose": (SUBSETS,),
+        "subset_size": (SUBSETS,),
+        "list_max_10int": (SUBSETS,),
+        "list_max_5int": (SUBSETS,),
+        "list_all_int": (SUBSETS,),
+        "max_int_size": (SUBSETS,),
+        "max_int_name": (SUBSETS,),
+        "min_int_size": (SUBSETS,),
+        "min_int_name": (SUBSETS,),
+        "90perc_size": (SUBSETS,),
+        "10perc_size": (SUBSETS,),
+        "var_count": ("visible_atts",),
+        "list_var_names": ("visible_atts",),
+        "pos_dev_count": (SUBSETS,),
+        "neg_dev_count": (SUBSETS,),
+        "pos_dev_size": (SUBSETS,),
+        "neg_dev_size": (SUBSETS,),
+        "avg_pos_dev": (SUBSETS,),
+        "avg_neg_dev": (SUBSETS,),
+        "list_set_sizes": (DATA, "visible_sets"),
+        "list10_dev_outliers": (SUBSETS,),
+        "list5_dev_outliers": (SUBSETS,),
+        "category_of_subsets": (SUBSETS,),
+        "highest_dominant_set": (SUBSETS, "visible_sets"),
+        "large_sets": (SUBSETS,),
+        "all_set_index": (SUBSETS, "visible_sets"),
+        "set_query": ("set_query",),
+        "degree_filters": ("filters",),
+        "hide_settings": ("filters",),
+        "selected_intersection": ("selected_intersection", "selection_type", "visible_atts"),
+        "bookmark_list": ("bookmarked_intersections", "selected_intersection", "selection_type"),
+        "aggregation": (
+            SUBSETS, "metaData", "first_aggregate_by", "first_overlap_degree",
+            "second_aggregate_by", "second_overlap_degree",
+        ),
+    }.items()
+}
+# The inputs of the memoized TokenMap helpers, which tokens share
+HELPER_INPUTS: "Dict[str, FrozenSet[str]]" = {
+    "dev_info": frozenset((SUBSETS,)),
+    "sort_visible_sets": frozenset(("visible_set_sizes", "set_query")),
+    "calculate_max_intersection": frozenset((SUBSETS,)),
+    "calculate_change_trend": frozenset((SUBSETS,)),
+    "calculate_largest_factor": frozenset((SUBSETS,)),
+    "largest_factor": frozenset((SUBSETS,)),
+    "empty_set_presence": frozenset((SUBSETS,)),
+    "all_set_presence": frozenset((SUBSETS, DATA)),
+    "region_classification": frozenset((SUBSETS,)),
+    "aggregate_table": frozenset(
+        (SUBSETS, "first_aggregate_by", "first_overlap_degree", "second_aggregate_by", "second_overlap_degree")
+    ),
+}
+# Tokens computed from the data alone, which a new grammar never changes,
+# and tokens that read the grammar, directly or through the visible subsets
+DATA_TOKENS: "FrozenSet[str]" = frozenset(token for token, inputs in TOKEN_INPUTS.items() if inputs <= {DATA})
+GRAMMAR_TOKENS: "FrozenSet[str]" = frozenset(TOKEN_INPUTS) - DATA_TOKENS
+
+
+def stale_tokens(changed: "Iterable[str]", tokens: "Optional[Iterable[str]]" = None) -> "frozenset[str]":
+    """
+    Returns the tokens whose inputs include any of the changed inputs (see TOKEN_INPUTS).
+    Params:
+    - changed: The changed inputs: SUBSETS, DATA or GrammarModel field names
+    - tokens: The tokens to consider. Defaults to all tokens.
+    """
+    changed = frozenset(changed)
+    candidates = TOKEN_INPUTS if tokens is None else tokens
+    return frozenset(token for token in candidates if TOKEN_INPUTS.get(token, changed) & changed)
+
+
+def references(phrase: str) -> "Tuple[Tuple[str, ...], Tuple[str, ...]]":
+    """
+    Returns the non-terminal symbols and the tokens referenced by a phrase,
+    each in order of first appearance.
+    """
+    symbols = tuple(dict.fromkeys(SYMBOL_PATTERN.findall(phrase)))
+    tokens = tuple(dict.fromkeys(TOKEN_PATTERN.findall(phrase)))
+    return symbols, tokens
+
+
+class DependencyGraph:
+    """
+    The phrases, non-terminal symbols and tokens reachable from a Level.
+    - phrases: The paths in DESCRIPTIONS of the rendered phrases
+    - symbols: For each reachable non-terminal symbol, the symbols and tokens it references
+    - roots: For each phrase, the symbols and tokens it references directly
+    - tokens: Every reachable token, in order of first appearance
+    """
+
+    def __init__(
+        self, level: Level, structured: bool = False, descriptions: "Optional[Dict[str, Any]]" = None
+    ) -> None:
+        """
+        Params:
+        - level: The level to analyze
+        - structured: Whether the structured output is rendered.
+          Only affects the default level.
+        - descriptions: The grammar to analyze. Defaults to phrases.DESCRIPTIONS.
+        """
+        self.level: Level = level
+        self.structured: bool = structured
+        self.descriptions: "Dict[str, Any]" = descriptions if descriptions is not None else phrases.DESCRIPTIONS
+
+        self.phrases: "Tuple[Tuple[str, ...], ...]" = LEVEL_PHRASES[level]
+        if structured and level == Level.DEFAULT:
+            self.phrases += STRUCTURED_PHRASES
+
+        self.roots: "Dict[Tuple[str, ...], Tuple[Tuple[str, ...], Tuple[str, ...]]]" = {}
+        self.symbols: "Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]]" = {}
+        tokens: "Dict[str, None]" = {}
+
+        def visit(symbols: "Tuple[str, ...]", direct_tokens: "Tuple[str, ...]") -> None:
+            tokens.update(dict.fromkeys(direct_tokens))
+            for symbol in symbols:
+                if symbol in self.symbols:
+                    continue
+                # Undefined symbols have no dependencies; rendering them raises a GrammarError
+                self.symbols[symbol] = references(self.descriptions["symbols"].get(symbol, ""))
+                visit(*self.symbols[symbol])
+
+        for path in self.phrases:
+            self.roots[path] = references(self.phrase(path))
+            visit(*self.roots[path])
+
+        self.tokens: "Tuple[str, ...]" = tuple(tokens)
+
+    def phrase(self, path: "Tuple[str, ...]") -> str:
+        """
+        Returns the phrase at a path in the grammar.
+        """
+        value: Any = self.descriptions
+        for key in path:
+            value = value[key]
+        return str(value)
+
+    def format(self, costs: "Optional[Dict[str, float]]" = None) -> str:
+        """
+        Returns the graph as an indented tree, with the estimated cost of each token.
+        Symbols and tokens are expanded where they first appear.
+        Params:
+        - costs: If given, the measured seconds of each token, to print as well
+        """
+        lines = [f"level={self.level.value} structured={self.structured} tokens={len(self.tokens)}"]
+        seen: "set[str]" = set()
+
+        def add_token(token: str, depth: int) -> None:
+            reference = "{{" + token + "}}"
+            line = f"{'  ' * depth}{reference}  {TOKEN_COSTS.get(token, 'unknown')}"
+            if reference in seen:
+                line += "  (see above)"
+            elif costs is not None and token in costs:
+                line += f"  {costs[token] * 1000:.3f} ms"
+            seen.add(reference)
+            lines.append(line)
+
+        def add_symbol(symbol: str, depth: int) -> None:
+            reference = "[[" + symbol + "]]"
+            if reference in seen:
+                lines.append(f"{'  ' * depth}{reference}  (see above)")
+                return
+            seen.add(reference)
+            lines.append(f"{'  ' * depth}{reference}")
+            add_references(self.symbols[symbol], depth + 1)
+
+        def add_references(refs: "Tuple[Tuple[str, ...], Tuple[str, ...]]", depth: int) -> None:
+            symbols, tokens = refs
+            for symbol in symbols:
+                add_symbol(symbol, depth)
+            for token in tokens:
+                add_token(token, depth)
+
+        for path in self.phrases:
+            lines.append("/".join(path))
+            add_references(self.roots[path], 1)
+        return "\n".join(lines)
+
+
+@functools.lru_cache(maxsize=None)
+def dependency_graph(level: Level, structured: bool = False) -> DependencyGraph:
+    """
+    Returns the dependency graph of a level of phrases.DESCRIPTIONS.
+    The grammar is static, so graphs are built once per process.
+    """
+    return DependencyGraph(level, structured)
+
+
+def reachable_tokens(level: Level, structured: bool = False) -> "frozenset[str]":
+    """
+    Returns the tokens that can be referenced when rendering a level.
+    """
+    return frozenset(dependency_graph(level, structured).tokens)
+
+
+def measure_token_costs(tokenmap: Any, tokens: "Iterable[str]") -> "Dict[str, float]":
+    """
+    Computes each token on a fresh TokenMap and returns the seconds each took.
+    Helpers shared between tokens are memoized, so their cost is counted
+    for the first token that needs them.
+    """
+    costs: "Dict[str, float]" = {}
+    for token in tokens:
+        start = time.perf_counter()
+        try:
+            tokenmap.get_token(token)
+        except Exception:
+            # The failure is reported when the text is rendered
+            pass
+        costs[token] = time.perf_counter() - start
+    return costs
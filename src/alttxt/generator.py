@@ -1,16 +1,34 @@
 import re
-from typing import Pattern
 
 from alttxt import phrases
+from alttxt.dependencies import LEVEL_PHRASES
 from alttxt.models import GrammarModel
+from alttxt.renderplan import RenderPlan, compile_phrase, render_plan
 
 from alttxt.enums import Explanation, Verbosity, Level
 from alttxt.tokenmap import TokenMap
 from alttxt.glossary import Glossary
 
-from typing import Any
+from typing import Any, Tuple
 
-import json
+# The first word of the text and of each sentence
+SENTENCE_START = re.compile(r"((?<=[\.\?!]\s)(\w+)|(^\w+))")
+
+
+def level_template(level: Level, descriptions: "dict[str, Any]" = phrases.DESCRIPTIONS) -> str:
+    """
+    Returns the unexpanded text of a level: its phrases, in order.
+    The phrases of the default level are each followed by a space.
+    """
+    level_phrases = []
+    for path in LEVEL_PHRASES[level]:
+        value: Any = descriptions
+        for key in path:
+            value = value[key]
+        level_phrases.append(value)
+    if level == Level.DEFAULT:
+        return "".join(phrase + " " for phrase in level_phrases)
+    return "".join(level_phrases)
 
 
 class AltTxtGen:
@@ -44,16 +62,12 @@ class AltTxtGen:
         # Get the description template for the level, verbosity, and sort
         # L0 and L1 don't care about sort/aggregation
 
-        if self.level == Level.ONE:
-            text_desc += self.descriptions["level_1"]["upset_introduction"]
-            text_desc += self.descriptions["level_1"]["dataset_properties"]
+        if self.level not in LEVEL_PHRASES:
+            raise TypeError(f"Expected {Level.list()}. Got {self.level}.")
 
-        elif self.level == Level.TWO:
-            text_desc += self.descriptions["level_2"]["set_description"]
-            text_desc += self.descriptions["level_2"]["intersection_description"]
-            text_desc += self.descriptions["level_2"]["statistical_information"]
+        text_desc += level_template(self.level, self.descriptions)
 
-        elif self.level == Level.DEFAULT:
+        if self.level == Level.DEFAULT:
             # Default level is combination of L1 and L2
 
             # A short alternative text description
@@ -63,41 +77,16 @@ class AltTxtGen:
             technique = self.descriptions["level_1"]["technical_description"]
 
             # Structured text starts here
-            introduction = self.descriptions["level_1"]["upset_introduction"]
-            text_desc += introduction
-            text_desc += " "
-
-            dataset_properties = self.descriptions["level_1"]["dataset_properties"]
-            text_desc += dataset_properties
-            text_desc += " "
-
-            set_description = self.descriptions["level_2"]["set_description"]
-            text_desc += set_description
-            text_desc += " "
-
-            query_and_filters = self.descriptions["level_2"]["queries_and_filters"]
-            text_desc += query_and_filters
-            text_desc += " "
-
-            selection_description = self.descriptions["level_2"]["selection_description"]
-            text_desc += selection_description
-            text_desc += " "
-
-            intersection_description = self.descriptions["level_2"][
-                "intersection_description"
-            ]
-            text_desc += intersection_description
-            text_desc += " "
-
-            statistical_information = self.descriptions["level_2"][
-                "statistical_information"
-            ]
-            text_desc += statistical_information
-            text_desc += " "
-
-            trend_analysis = self.descriptions["level_3"]["trend_analysis"]
-            text_desc += trend_analysis
-            text_desc += " "
+            (
+                introduction,
+                dataset_properties,
+                set_description,
+                query_and_filters,
+                selection_description,
+                intersection_description,
+                statistical_information,
+                trend_analysis,
+            ) = (self.phrase(path) for path in LEVEL_PHRASES[Level.DEFAULT])
 
             if self.structured:
                 # Helper function to replace periods with newlines and bullet points
@@ -147,58 +136,37 @@ class AltTxtGen:
                 # return the structured final output as a json content
                 return final_output
 
-        else:
-            raise TypeError(f"Expected {Level.list()}. Got {self.level}.")
-
         return self.replaceTokens(text_desc)
 
+    def phrase(self, path: "Tuple[str, ...]") -> str:
+        """
+        Returns the phrase at a path in the descriptions, e.g. ("level_1", "upset_introduction").
+        """
+        value: Any = self.descriptions
+        for key in path:
+            value = value[key]
+        return str(value)
+
+    def plan(self, text: str) -> RenderPlan:
+        """
+        Returns the render plan of a phrase: its non-terminals expanded,
+        leaving literal fragments and token slots.
+        Plans for the default descriptions are compiled once per process.
+        Raises GrammarError if the phrase references undefined or cyclic symbols.
+        """
+        if self.descriptions is phrases.DESCRIPTIONS:
+            return render_plan(text)
+        return compile_phrase(text, self.descriptions["symbols"])
+
     def replaceTokens(self, text: str) -> str:
         """
         Replace tokens in the text with their corresponding values,
         as defined in self.map.
-        Non-terminals, evaluated by the phrases mapping, are replaced first.
+        Non-terminals, evaluated by the phrases mapping, are replaced first,
+        by compiling the text into a render plan.
         Next, terminals are evaluated by the token map.
         """
-        text = text.strip()
-
-        # First, loop until all non-terminals are replaced.
-        while "[[" in text:
-            tokens: list[str] = re.split(r"\[\[|\]\]", text)
-            isToken: bool = text.startswith("[[")
-            result = list()
-
-            # Bugfix for empty first token throwing off count
-            if tokens[0] == "":
-                tokens = tokens[1:]
-
-            for token in tokens:
-                if isToken:
-                    result.append(self.descriptions["symbols"].get(token, ""))
-                else:
-                    result.append(token)
-                isToken = not isToken
-
-            text = "".join(result)
-
-        # Now, loop and replace all terminals.
-        while "{{" in text:
-            tokens: list[str] = re.split(r"{{|}}", text)
-            isToken: bool = text.lstrip().startswith("{{")
-            result: list[str] = list()
-
-            # Bugfix for empty first token throwing off count
-            if tokens[0] == "":
-                tokens = tokens[1:]
-
-            for token in tokens:
-                if isToken:
-                    result.append(str(self.map.get_token(token)))
-                else:
-                    result.append(token)
-
-                isToken = not isToken
-
-            text = "".join(result)
+        text = self.plan(text).render(self.map.get_token)
 
         # Capitalize the first letter of each sentence, and add a period to the end
         return self.cap_sentences(text)
@@ -209,9 +177,8 @@ class AltTxtGen:
         Not the most robust implementation; may produce incorrect capitalizations
         after abbreviations, etc.
         """
-        match: Pattern[str] = re.compile(r"((?<=[\.\?!]\s)(\w+)|(^\w+))")
 
         def cap(match) -> str:
             return match.group().capitalize()
 
-        return match.sub(cap, text)
+        return SENTENCE_START.sub(cap, text)
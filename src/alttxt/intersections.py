@@ -0,0 +1,345 @@
+"""
+Computes the intersections of an UpSet plot from the items in the export's
+rawData, rather than trusting the processedData the frontend computed.
+
+Each set is stored as a bitmap of its items, packed 8 items to a byte
+(SetBitmaps), so 10^6 items in 40 sets take 5 MB. The intersections are
+found by combining the bitmaps into one membership mask per item and
+counting the distinct masks; sizes, degrees, expected sizes, deviations
+and attribute statistics are then computed for all intersections at once
+(Intersections). Intersections.export_values converts them back into
+the processedData format, so that the Parser can read them as usual.
+"""
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from alttxt.enums import SortBy, SortOrder
+from alttxt.subsettable import BYTE_POPCOUNT
+
+# Items decoded from rawData at a time, to bound the memory of the unpacked columns
+CHUNK_ITEMS = 1 << 16
+# Intersections are computed over at most this many sets, since masks are 64-bit
+MAX_SETS = 64
+# Empty intersections are only enumerated up to this many sets (2^16 combinations)
+MAX_EMPTY_SETS = 16
+# Statistics UpSet reports for each attribute, with the quantile of each
+QUANTILES = (("first", 0.25), ("median", 0.5), ("third", 0.75))
+
+
+def attribute_stats(
+    groups: "npt.NDArray[np.intp]", values: "npt.NDArray[np.float64]", group_count: int
+) -> "Dict[str, npt.NDArray[np.float64]]":
+    """
+    Returns the min, max, median, mean and first and third quartiles of values
+    in each group, as one array per statistic, computed without a loop over
+    the groups. Every group must have at least one value.
+    Params:
+    - groups: The group of each value
+    - values: The values
+    - group_count: The number of groups
+    """
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    quantiles = {}
+    for name, q in QUANTILES:
+        # Linear interpolation between the closest ranks, as numpy.quantile does
+        position = (counts - 1) * q
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts - 1)
+        fraction = position - lower
+        quantiles[name] = sorted_values[starts + lower] * (1 - fraction) + sorted_values[starts + upper] * fraction
+    return {
+        "min": sorted_values[starts],
+        "max": sorted_values[starts + counts - 1],
+        "median": quantiles["median"],
+        "mean": np.add.reduceat(sorted_values, starts) / counts,
+        "first": quantiles["first"],
+        "third": quantiles["third"],
+    }
+
+
+def popcount(masks: "npt.NDArray[np.uint64]") -> "npt.NDArray[np.int64]":
+    """
+    Returns the number of bits set in each of an array of uint64 masks.
+    """
+    counts: "npt.NDArray[np.int64]" = BYTE_POPCOUNT[masks.view(np.uint8)].reshape(len(masks), 8).sum(axis=1, dtype=np.int64)
+    return counts
+
+
+def element_name(names: "Sequence[str]") -> str:
+    """
+    Returns the name UpSet gives the intersection of the given sets, e.g. "A, B, and C".
+    """
+    if not names:
+        return "Unincluded"
+    if len(names) == 1:
+        return f"Just {names[0]}"
+    return ", ".join(names[:-1]) + ", and " + names[-1]
+
+
+class Intersections:
+    """
+    The intersections of some sets, as the columns of a table with one row
+    per intersection:
+    - masks: The sets the intersection belongs to, where bit i stands for set_ids[i]
+    - sizes: The number of items in the intersection and in no other of the sets
+    - degrees: The number of sets in the intersection
+    - expected: The fraction of the items expected in the intersection
+      if the sets were independent
+    - deviations: The difference between the actual and expected fractions,
+      in percent, as UpSet computes it
+    - stats: The statistics of each attribute, by attribute and statistic
+      (see attribute_stats). Rows without items have NaN statistics.
+    """
+
+    def __init__(
+        self,
+        set_ids: "Sequence[str]",
+        labels: "Sequence[str]",
+        item_count: int,
+        set_sizes: "npt.NDArray[np.int64]",
+        masks: "npt.NDArray[np.uint64]",
+        sizes: "npt.NDArray[np.int64]",
+        stats: "Optional[Dict[str, Dict[str, npt.NDArray[np.float64]]]]" = None,
+    ) -> None:
+        """
+        Params:
+        - set_ids: The IDs of the sets, as in allSets, one for each mask bit
+        - labels: The names of the sets, as in the export's setColumns
+        - item_count: The number of items, including those in none of the sets
+        - set_sizes: The number of items in each set
+        - masks, sizes: One entry per intersection, as described in the class docstring
+        - stats: The statistics of each attribute, if any
+        """
+        self.set_ids: "List[str]" = list(set_ids)
+        self.labels: "List[str]" = list(labels)
+        self.item_count = item_count
+        self.set_sizes = set_sizes
+        self.masks = masks
+        self.sizes = sizes
+        self.stats: "Dict[str, Dict[str, npt.NDArray[np.float64]]]" = stats or {}
+        self.degrees = popcount(masks)
+
+        rates = set_sizes / item_count if item_count else np.zeros(len(set_ids))
+        self.expected = np.ones(len(masks))
+        for bit, rate in enumerate(rates.tolist()):
+            member = (masks >> np.uint64(bit)) & np.uint64(1) == 1
+            self.expected *= np.where(member, rate, 1 - rate)
+        observed = sizes / item_count if item_count else np.zeros(len(masks))
+        self.deviations = (observed - self.expected) * 100
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def members(self, row: int) -> "List[int]":
+        """
+        Returns the indices of the sets the intersection in the given row belongs to.
+        """
+        mask = int(self.masks[row])
+        return [bit for bit in range(len(self.set_ids)) if mask >> bit & 1]
+
+    def order(self, sort_by: SortBy, sort_order: SortOrder) -> "npt.NDArray[np.intp]":
+        """
+        Returns the rows in the order of the given sort.
+        Ties are broken by degree and then by mask, which keeps single sets in set order.
+        """
+        keys = {SortBy.SIZE: self.sizes, SortBy.DEGREE: self.degrees, SortBy.DEVIATION: self.deviations}[sort_by]
+        primary = keys if sort_order == SortOrder.ASCENDING else -keys
+        order: "npt.NDArray[np.intp]" = np.lexsort((self.masks, self.degrees, primary))
+        return order
+
+    def export_values(self, rows: "Optional[npt.NDArray[Any]]" = None) -> "Dict[str, Dict[str, Any]]":
+        """
+        Returns the given rows (by default all of them, in table order)
+        in the format of the values of processedData in an export,
+        including the degree that accessibleProcessedData adds.
+        Params:
+        - rows: The rows to convert, in the order to convert them
+        """
+        rows = np.arange(len(self)) if rows is None else rows
+        trimmed = [set_id[4:] if set_id.startswith("Set_") else set_id for set_id in self.set_ids]
+        # Only the converted rows are taken out of the numpy columns
+        columns = {
+            name: {stat: column[rows].tolist() for stat, column in stats.items()} for name, stats in self.stats.items()
+        }
+        deviations = self.deviations[rows].tolist()
+        values: "Dict[str, Dict[str, Any]]" = {}
+        for index, row in enumerate(rows.tolist()):
+            members = self.members(row)
+            key = "Subset_" + ("~&~".join(trimmed[bit] for bit in members) if members else "Unincluded")
+            attributes: "Dict[str, Any]" = {}
+            if self.sizes[row]:
+                for name, stats in columns.items():
+                    attributes[name] = {stat: column[index] for stat, column in stats.items()}
+            attributes["deviation"] = deviations[index]
+            values[key] = {
+                "id": key,
+                "elementName": element_name([self.labels[bit] for bit in members]),
+                "size": int(self.sizes[row]),
+                "type": "Subset",
+                "degree": int(self.degrees[row]),
+                "setMembership": {
+                    set_id: "Yes" if bit in members else "No" for bit, set_id in enumerate(self.set_ids)
+                },
+                "attributes": attributes,
+            }
+        return values
+
+
+class SetBitmaps:
+    """
+    The items of each set, as bitmaps packed 8 items to a byte: bit j of
+    row i (in numpy.packbits order) is set if item j belongs to set_ids[i].
+    Params:
+    - set_ids: The ID of each set, as in allSets
+    - bitmaps: The packed bitmaps, one row per set
+    - item_count: The number of items
+    - attributes: The values of numeric attributes, by attribute name, one per item
+    - labels: The name of each set, as in setColumns. Defaults to the IDs without 'Set_'.
+    """
+
+    def __init__(
+        self,
+        set_ids: "Sequence[str]",
+        bitmaps: "npt.NDArray[np.uint8]",
+        item_count: int,
+        attributes: "Optional[Dict[str, npt.NDArray[np.float64]]]" = None,
+        labels: "Optional[Sequence[str]]" = None,
+    ) -> None:
+        self.set_ids: "List[str]" = list(set_ids)
+        self.bitmaps = bitmaps
+        self.item_count = item_count
+        self.attributes: "Dict[str, npt.NDArray[np.float64]]" = attributes or {}
+        self.labels: "List[str]" = (
+            list(labels) if labels is not None
+            else [set_id[4:] if set_id.startswith("Set_") else set_id for set_id in self.set_ids]
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        set_ids: "Sequence[str]",
+        columns: "npt.NDArray[Any]",
+        attributes: "Optional[Dict[str, npt.NDArray[np.float64]]]" = None,
+    ) -> "SetBitmaps":
+        """
+        Builds the bitmaps from a boolean array with one row per item and one column per set.
+        """
+        return cls(set_ids, np.packbits(columns.T.astype(bool), axis=1), len(columns), attributes)
+
+    @classmethod
+    def from_raw_data(cls, raw_data: "Dict[str, Any]", attributes: bool = True) -> "SetBitmaps":
+        """
+        Builds the bitmaps from the rawData of an export, where each item has
+        a 0/1 column for each set, named as in setColumns.
+        The IDs of the sets are the keys of rawData's sets, whose elementName
+        is the column, or else the columns with a 'Set_' prefix.
+        Params:
+        - raw_data: The rawData of the export
+        - attributes: Whether to read the attribute columns of type "number" too
+        """
+        labels: "List[str]" = list(raw_data["setColumns"])
+        ids = {label: "Set_" + label for label in labels}
+        for set_id, set_ in raw_data.get("sets", {}).items():
+            if set_.get("elementName") in ids:
+                ids[set_["elementName"]] = set_id
+
+        items = list(raw_data["items"].values())
+        count = len(items)
+        bitmaps = np.zeros((len(labels), (count + 7) // 8), dtype=np.uint8)
+        if labels:
+            getter = itemgetter(*labels)
+            row_type = np.dtype((np.uint8, len(labels)))
+            # CHUNK_ITEMS is a multiple of 8, so that each chunk fills whole bytes
+            for start in range(0, count, CHUNK_ITEMS):
+                chunk = items[start:start + CHUNK_ITEMS]
+                rows = map(getter, chunk) if len(labels) > 1 else ((getter(item),) for item in chunk)
+                columns = np.fromiter(rows, dtype=row_type, count=len(chunk)).reshape(len(chunk), len(labels))
+                packed = np.packbits(columns.T.astype(bool), axis=1)
+                bitmaps[:, start // 8:start // 8 + packed.shape[1]] = packed
+
+        values: "Dict[str, npt.NDArray[np.float64]]" = {}
+        if attributes:
+            column_types = raw_data.get("columnTypes", {})
+            for name in raw_data.get("attributeColumns", []):
+                if column_types.get(name, "number") == "number":
+                    values[name] = np.array([item.get(name) for item in items], dtype=np.float64)
+        return cls([ids[label] for label in labels], bitmaps, count, values, labels)
+
+    def set_sizes(self) -> "npt.NDArray[np.int64]":
+        """
+        Returns the number of items in each set.
+        """
+        sizes: "npt.NDArray[np.int64]" = BYTE_POPCOUNT[self.bitmaps].sum(axis=1, dtype=np.int64)
+        return sizes
+
+    def rows(self, set_ids: "Optional[Sequence[str]]") -> "List[int]":
+        """
+        Returns the bitmap row of each of the given sets (by default all of them).
+        Raises ValueError if a set is unknown.
+        """
+        if set_ids is None:
+            return list(range(len(self.set_ids)))
+        rows = []
+        for set_id in set_ids:
+            if set_id not in self.set_ids:
+                raise ValueError(f"Set {set_id} is not in rawData")
+            rows.append(self.set_ids.index(set_id))
+        return rows
+
+    def item_masks(self, set_ids: "Optional[Sequence[str]]" = None) -> "npt.NDArray[np.uint64]":
+        """
+        Returns the sets each item belongs to, as a mask where bit i stands for set_ids[i].
+        Params:
+        - set_ids: The sets to include, by default all of them
+        """
+        rows = self.rows(set_ids)
+        if len(rows) > MAX_SETS:
+            raise ValueError(f"Intersections can be computed over at most {MAX_SETS} sets")
+        masks = np.zeros(self.item_count, dtype=np.uint64)
+        for bit, row in enumerate(rows):
+            member = np.unpackbits(self.bitmaps[row], count=self.item_count)
+            masks |= member.astype(np.uint64) << np.uint64(bit)
+        return masks
+
+    def intersections(self, set_ids: "Optional[Sequence[str]]" = None, include_empty: bool = False) -> Intersections:
+        """
+        Returns the intersections of the given sets (by default all of them):
+        for each combination of the sets, the items that belong to exactly
+        those sets, in order of their masks.
+        Params:
+        - set_ids: The sets to intersect
+        - include_empty: Whether to include the combinations without items,
+          as long as there are at most MAX_EMPTY_SETS sets
+        """
+        rows = self.rows(set_ids)
+        masks = self.item_masks(set_ids)
+        unique_masks, groups, counts = np.unique(masks, return_inverse=True, return_counts=True)
+        stats = {
+            name: attribute_stats(groups, values, len(unique_masks)) for name, values in self.attributes.items()
+        }
+        if include_empty and len(rows) <= MAX_EMPTY_SETS:
+            # Every combination, with the statistics of those that have items
+            all_masks = np.arange(2 ** len(rows), dtype=np.uint64)
+            sizes = np.zeros(len(all_masks), dtype=np.int64)
+            sizes[unique_masks.astype(np.int64)] = counts
+            for columns in stats.values():
+                for stat, column in columns.items():
+                    expanded = np.full(len(all_masks), np.nan)
+                    expanded[unique_masks.astype(np.int64)] = column
+                    columns[stat] = expanded
+            unique_masks, counts = all_masks, sizes
+        return Intersections(
+            [self.set_ids[row] for row in rows],
+            [self.labels[row] for row in rows],
+            self.item_count,
+            self.set_sizes()[rows],
+            unique_masks,
+            counts.astype(np.int64),
+            stats,
+        )
@@ -0,0 +1,397 @@
+"""
+Byte-level helpers for decoding only part of an UpSet JSON export.
+
+The exports from the UpSet Multinet implementation carry a large "rawData"
+block (every item, column and column type) that the parser never reads.
+Instead of decoding the whole document with json.load, the functions here
+walk the top-level object directly over the raw bytes, decode the values
+of the requested keys with json.loads, and skip every other value by
+finding its closing bracket (with a vectorized scan for large values),
+without building any Python objects.
+"""
+import hashlib
+import json
+import mmap
+import re
+
+import numpy as np
+
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Tuple, Union
+
+# Whitespace allowed between JSON tokens
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+# A complete JSON string, including escaped characters
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# A number, true, false or null
+_SCALAR = re.compile(rb"[^,:\[\]{}\s]+")
+# An array holding only strings, such as the "items" lists of subsets
+_STRING_ARRAY = re.compile(
+    rb'\[\s*(?:"[^"\\]*(?:\\.[^"\\]*)*"\s*,\s*)*(?:"[^"\\]*(?:\\.[^"\\]*)*"\s*)?\]', re.DOTALL
+)
+# Everything up to the next bracket that is not inside a string
+_NON_BRACKET = re.compile(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*', re.DOTALL)
+# A quote preceded by an odd number of backslashes
+_ESCAPED_QUOTE = re.compile(rb'(?<!\\)(?:\\\\)*\\"')
+
+# Number of bytes scanned at once when skipping large objects and arrays
+_CHUNK_SIZE = 1 << 16
+# Dropping nested fields while copying a value walks it member by member in Python,
+# which only pays off when the dropped fields are at least this fraction of the value.
+# Otherwise the value is decoded whole and the fields are removed from the result.
+SPLICE_MIN_FRACTION = 0.3
+_QUOTE, _BACKSLASH = ord('"'), ord("\\")
+_OPEN_BRACE, _CLOSE_BRACE = ord("{"), ord("}")
+_OPEN_BRACKET, _CLOSE_BRACKET = ord("["), ord("]")
+
+
+def _skip_whitespace(buf: "Union[bytes, mmap.mmap]", pos: int) -> int:
+    return _WHITESPACE.match(buf, pos).end()  # type: ignore[union-attr]
+
+
+def _expect(buf: "Union[bytes, mmap.mmap]", pos: int, char: bytes) -> int:
+    """
+    Checks that the byte at pos is char and returns the position after it.
+    """
+    if buf[pos:pos + 1] != char:
+        raise ValueError(
+            f"Invalid JSON: expected {char.decode()!r} at byte {pos}"
+        )
+    return pos + 1
+
+
+def _scan_container_end(buf: "Union[bytes, mmap.mmap]", pos: int, depth: int) -> int:
+    """
+    Returns the position just past the bracket that brings the nesting depth
+    back to 0, scanning from pos (which must be outside of a string),
+    or -1 if it is never found.
+    The buffer is scanned in fixed-size chunks with NumPy: quote parity
+    marks which bytes are inside strings, and a running sum over the
+    remaining brackets gives the nesting depth.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    in_string = 0
+
+    for start in range(pos, len(data), _CHUNK_SIZE):
+        chunk = data[start:start + _CHUNK_SIZE]
+        quotes = chunk == _QUOTE
+
+        # A quote preceded by an odd number of backslashes is escaped.
+        # Backslashes are rare in exports, so these are handled one by one.
+        backslashes = chunk == _BACKSLASH
+        after_backslash = np.empty_like(backslashes)
+        after_backslash[0] = start > pos and data[start - 1] == _BACKSLASH
+        after_backslash[1:] = backslashes[:-1]
+        if after_backslash.any():
+            for i in np.flatnonzero(quotes & after_backslash):
+                j = start + i - 1
+                while j >= pos and data[j] == _BACKSLASH:
+                    j -= 1
+                if (start + i - 1 - j) % 2 == 1:
+                    quotes[i] = False
+
+        # 1 for every byte inside a string, including the opening quote
+        parity = np.bitwise_xor.accumulate(quotes.view(np.uint8)) ^ in_string
+        in_string = int(parity[-1])
+
+        outside = parity == 0
+        opens = ((chunk == _OPEN_BRACE) | (chunk == _OPEN_BRACKET)) & outside
+        closes = ((chunk == _CLOSE_BRACE) | (chunk == _CLOSE_BRACKET)) & outside
+        brackets = np.flatnonzero(opens | closes)
+        if brackets.size == 0:
+            continue
+
+        depths = depth + np.cumsum(np.where(opens[brackets], 1, -1))
+        closed = np.flatnonzero(depths == 0)
+        if closed.size:
+            return start + int(brackets[closed[0]]) + 1
+        depth = int(depths[-1])
+
+    return -1
+
+
+def _find_container_end(buf: "Union[bytes, mmap.mmap]", pos: int) -> int:
+    """
+    Returns the position just past the object or array starting at pos,
+    or -1 if its closing bracket is never found.
+    Small containers are walked bracket by bracket with a regex.
+    Once more than _CHUNK_SIZE bytes have been walked, the rest
+    is handed to the vectorized _scan_container_end.
+    """
+    limit = min(pos + _CHUNK_SIZE, len(buf))
+    depth = 0
+
+    while pos < limit:
+        bracket = buf[pos:pos + 1]
+        if bracket in (b"{", b"["):
+            depth += 1
+        elif bracket in (b"}", b"]"):
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        else:
+            # Stopped at a string that runs past the limit
+            break
+        # Jump to the next bracket outside of a string
+        pos = _NON_BRACKET.match(buf, pos + 1, limit).end()  # type: ignore[union-attr]
+
+    return _scan_container_end(buf, pos, depth)
+
+
+def skip_value(buf: "Union[bytes, mmap.mmap]", pos: int) -> int:
+    """
+    Returns the position just past the JSON value starting at pos
+    (after any leading whitespace), without decoding it.
+    Params:
+    - buf: The raw bytes of the JSON document
+    - pos: The offset to start scanning from
+    """
+    pos = _skip_whitespace(buf, pos)
+    first = buf[pos:pos + 1]
+
+    if first == b'"':
+        match = _STRING.match(buf, pos)
+        if match is None:
+            raise ValueError(f"Invalid JSON: unterminated string at byte {pos}")
+        return match.end()
+
+    if first == b"[":
+        # Short arrays of strings are common and cheaper to match directly
+        match = _STRING_ARRAY.match(buf, pos)
+        if match is not None:
+            return match.end()
+
+    if first in (b"{", b"["):
+        end = _find_container_end(buf, pos)
+        if end < 0:
+            raise ValueError(f"Invalid JSON: unbalanced brackets at byte {pos}")
+        return end
+
+    match = _SCALAR.match(buf, pos)
+    if match is None:
+        raise ValueError(f"Invalid JSON: expected a value at byte {pos}")
+    return match.end()
+
+
+class SkipStats:
+    """
+    Counts what was dropped by the skip_paths option of load_keys.
+    - fields: The number of key/value pairs that were dropped
+    - bytes: The number of bytes of JSON in the dropped values
+    - strings: The number of JSON strings in the dropped values
+    Dropped values are only decoded if they are a small part of the value
+    they are dropped from (see SPLICE_MIN_FRACTION).
+    """
+
+    def __init__(self) -> None:
+        self.fields = 0
+        self.bytes = 0
+        self.strings = 0
+
+    def add(self, raw: bytes) -> None:
+        self.fields += 1
+        self.bytes += len(raw)
+        quotes = raw.count(b'"')
+        if b"\\" in raw:
+            quotes -= len(_ESCAPED_QUOTE.findall(raw))
+        self.strings += quotes // 2
+
+    def __repr__(self) -> str:
+        return f"SkipStats(fields={self.fields}, bytes={self.bytes}, strings={self.strings})"
+
+
+def _iter_object(
+    buf: "Union[bytes, mmap.mmap]", pos: int
+) -> "Iterator[Tuple[str, int, int, int]]":
+    """
+    Yields the key, key start, value start and value end of every member
+    of the JSON object starting at pos, without decoding the values.
+    """
+    pos = _skip_whitespace(buf, _expect(buf, _skip_whitespace(buf, pos), b"{"))
+    if buf[pos:pos + 1] == b"}":
+        return
+
+    while True:
+        key_match = _STRING.match(buf, pos)
+        if key_match is None:
+            raise ValueError(f"Invalid JSON: expected a key at byte {pos}")
+        raw_key = key_match.group()
+        # Keys are almost never escaped, so skip json.loads when possible
+        key = json.loads(raw_key) if b"\\" in raw_key else raw_key[1:-1].decode()
+
+        key_start = pos
+        pos = _expect(buf, _skip_whitespace(buf, key_match.end()), b":")
+        value_start = _skip_whitespace(buf, pos)
+        value_end = skip_value(buf, value_start)
+        yield key, key_start, value_start, value_end
+
+        pos = _skip_whitespace(buf, value_end)
+        if buf[pos:pos + 1] == b"}":
+            return
+        pos = _skip_whitespace(buf, _expect(buf, pos, b","))
+
+
+def _splice(
+    buf: "Union[bytes, mmap.mmap]",
+    start: int,
+    end: int,
+    skip_paths: "list[Tuple[str, ...]]",
+    stats: SkipStats,
+    out: "list[bytes]",
+) -> None:
+    """
+    Appends the JSON value between start and end to out, leaving out any member
+    of a nested object matched by skip_paths (relative to this value,
+    "*" matches any key). Values with no matching paths are copied in one piece.
+    """
+    if not skip_paths or buf[start:start + 1] != b"{":
+        out.append(buf[start:end])
+        return
+
+    # If every path ends at this object, walking can stop once all of them
+    # have been dropped, and the remaining members are copied in one piece
+    pending: "Optional[set[str]]" = {path[0] for path in skip_paths}
+    if any(len(path) > 1 or path[0] == "*" for path in skip_paths):
+        pending = None
+
+    out.append(b"{")
+    separator = b""
+    for key, key_start, value_start, value_end in _iter_object(buf, start):
+        child_paths = [path[1:] for path in skip_paths if path[0] in (key, "*")]
+        if () in child_paths:
+            stats.add(buf[value_start:value_end])
+            if pending is not None:
+                pending.discard(key)
+                if not pending:
+                    rest = buf[value_end:end].lstrip()
+                    out.append(rest[1:] if separator == b"" and rest.startswith(b",") else rest)
+                    return
+            continue
+        out.append(separator)
+        out.append(buf[key_start:value_start])
+        _splice(buf, value_start, value_end, child_paths, stats, out)
+        separator = b","
+    out.append(b"}")
+
+
+def _dropped_size(buf: "Union[bytes, mmap.mmap]", start: int, end: int, skip_paths: "list[Tuple[str, ...]]") -> int:
+    """
+    Returns about how many bytes skip_paths drop from the value between start and end:
+    the size of the string arrays under the last key of any path, at any depth.
+    """
+    names = {path[-1] for path in skip_paths if path}
+    if not names or "*" in names:
+        return end - start
+    keys = b"|".join(re.escape(json.dumps(name).encode()) for name in sorted(names))
+    pattern = re.compile(rb"(?:" + keys + rb")\s*:\s*" + _STRING_ARRAY.pattern, re.DOTALL)
+    return sum(len(match.group()) for match in pattern.finditer(buf, start, end))
+
+
+def _drop(value: Any, skip_paths: "list[Tuple[str, ...]]", stats: SkipStats) -> None:
+    """
+    Removes the members matched by skip_paths from a decoded value, as _splice leaves them out.
+    """
+    if not isinstance(value, dict):
+        return
+    for key in list(value):
+        child_paths = [path[1:] for path in skip_paths if path[0] in (key, "*")]
+        if () in child_paths:
+            stats.add(json.dumps(value.pop(key)).encode())
+        elif child_paths:
+            _drop(value[key], child_paths, stats)
+
+
+def load_keys(
+    buf: "Union[bytes, mmap.mmap]",
+    keys: "Iterable[str]",
+    skip_paths: "Iterable[Tuple[str, ...]]" = (),
+    stats: "Optional[SkipStats]" = None,
+) -> "dict[str, Any]":
+    """
+    Decodes only the given keys of the top-level JSON object in buf.
+    The values of all other keys are skipped at the byte level.
+    Params:
+    - buf: The raw bytes of the JSON document
+    - keys: The top-level keys whose values should be decoded
+    - skip_paths: Paths of nested fields to drop while decoding, starting with
+            a top-level key, e.g. ("processedData", "values", "*", "items").
+            "*" matches any key. Dropped fields are skipped at the byte level.
+    - stats: If given, counts what was dropped by skip_paths
+    """
+    wanted = set(keys)
+    paths = list(skip_paths)
+    stats = stats if stats is not None else SkipStats()
+
+    result: "dict[str, Any]" = {}
+    for key, _, value_start, value_end in _iter_object(buf, 0):
+        if key not in wanted:
+            continue
+        child_paths = [path[1:] for path in paths if path[0] == key]
+        dropped = _dropped_size(buf, value_start, value_end, child_paths) if child_paths else 0
+        if dropped >= (value_end - value_start) * SPLICE_MIN_FRACTION:
+            # Copy the value without the dropped fields, then decode it in one go
+            out: "list[bytes]" = []
+            _splice(buf, value_start, value_end, child_paths, stats, out)
+            result[key] = json.loads(b"".join(out))
+        else:
+            result[key] = json.loads(buf[value_start:value_end])
+            _drop(result[key], child_paths, stats)
+    return result
+
+
+def load_file_keys(
+    file_path: Path,
+    keys: "Iterable[str]",
+    skip_paths: "Iterable[Tuple[str, ...]]" = (),
+    stats: "Optional[SkipStats]" = None,
+) -> "dict[str, Any]":
+    """
+    Memory-maps a JSON file and decodes only the given top-level keys.
+    See load_keys for details.
+    """
+    with open(file_path, "rb") as f:
+        # Empty files cannot be memory-mapped
+        if f.seek(0, 2) == 0:
+            raise ValueError("Invalid JSON: empty file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return load_keys(buf, keys, skip_paths, stats)
+
+
+def digest_keys(
+    buf: "Union[bytes, mmap.mmap]",
+    keys: "Iterable[str]",
+    skip_paths: "Iterable[Tuple[str, ...]]" = (),
+    digest: Optional["hashlib._Hash"] = None,
+) -> "hashlib._Hash":
+    """
+    Hashes the values of the given top-level keys of the JSON object in buf,
+    in sorted key order, without decoding them.
+    The digest does not depend on the order of the keys or on the values of
+    any other key, so it identifies the parts of a document that are read.
+    Params:
+    - buf: The raw bytes of the JSON document
+    - keys: The top-level keys whose values are hashed
+    - skip_paths: Paths of nested fields left out of the hash, as in load_keys
+    - digest: The hash to update. Defaults to a new SHA-256.
+    """
+    wanted = set(keys)
+    paths = list(skip_paths)
+    digest = digest if digest is not None else hashlib.sha256()
+    values = sorted(
+        (key, value_start, value_end)
+        for key, _, value_start, value_end in _iter_object(buf, 0)
+        if key in wanted
+    )
+    for key, value_start, value_end in values:
+        child_paths = [path[1:] for path in paths if path[0] == key]
+        if child_paths:
+            out: "list[bytes]" = []
+            _splice(buf, value_start, value_end, child_paths, SkipStats(), out)
+            value = b"".join(out)
+        else:
+            value = buf[value_start:value_end]
+        # Lengths are included so that no two documents hash the same bytes
+        raw_key = key.encode()
+        digest.update(b"%d:%s%d:" % (len(raw_key), raw_key, len(value)))
+        digest.update(value)
+    return digest
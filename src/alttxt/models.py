@@ -1,7 +1,8 @@
 from enum import Enum
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 from alttxt.enums import AggregateBy, SortBy, SortVisibleBy, SortOrder, IntersectionType
-from pydantic import BaseModel
+from alttxt.subsettable import SubsetTable, SubsetView
+from pydantic import BaseModel, ConfigDict, model_validator
 
 
 class Subset(BaseModel):
@@ -23,15 +24,43 @@ class DataModel(BaseModel):
     """
     For holding data from the "rawData" and "processedData" fields
     of the JSON data file.
+    The visible and all subsets are stored as columnar SubsetTables.
+    For compatibility, lists of Subsets can still be passed as `subsets`
+    and `all_subsets`, and both are available as sequences of Subsets.
     """
 
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     count: list # of int
     sets: list # of str
     sizes: dict # str -> int
-    subsets: list # of Subset
-    all_subsets: list # of All Subsets
+    subset_table: SubsetTable # visible subsets
+    all_subset_table: SubsetTable # all subsets
     all_sets_length: int
 
+    @model_validator(mode="before")
+    @classmethod
+    def build_tables(cls, values: Any) -> Any:
+        """
+        Converts Subset lists passed as `subsets`/`all_subsets` into SubsetTables.
+        """
+        if isinstance(values, dict):
+            values = dict(values)
+            for field, table_field in (("subsets", "subset_table"), ("all_subsets", "all_subset_table")):
+                if field in values:
+                    values[table_field] = SubsetTable.from_subsets(values.pop(field))
+        return values
+
+    @property
+    def subsets(self) -> SubsetView:
+        """The visible subsets, as Subset objects"""
+        return self.subset_table.subsets
+
+    @property
+    def all_subsets(self) -> SubsetView:
+        """All subsets, as Subset objects"""
+        return self.all_subset_table.subsets
+
 class FilterModel(BaseModel):
     max_visible: int
     min_visible: int
@@ -1,10 +1,11 @@
 import json
 
 
+from alttxt import jsonstream
 from alttxt.enums import AggregateBy, SortBy, SortVisibleBy, SortOrder, IntersectionType
+from alttxt.subsettable import CLASSIFICATION_CODES, SubsetTable
 from alttxt.models import (
     BookmarkedIntersectionModel,
-    Subset,
     DataModel,
     FilterModel,
     GrammarModel,
@@ -15,7 +16,92 @@ from alttxt.models import (
 from pathlib import Path
 from collections import Counter
 from typing import Any
-from typing import Union
+from typing import Optional, Tuple, Union
+
+# Top-level keys of the export that are read by parse_data_no_agg and parse_grammar.
+# Any other key (most notably the large "rawData" block) is skipped when streaming.
+PARSED_KEYS: "list[str]" = [
+    "firstAggregateBy",
+    "secondAggregateBy",
+    "firstOverlapDegree",
+    "secondOverlapDegree",
+    "sortVisibleBy",
+    "sortBy",
+    "sortByOrder",
+    "filters",
+    "plots",
+    "plotInformation",
+    "collapsed",
+    "visibleSets",
+    "visibleAttributes",
+    "bookmarks",
+    "bookmarkedIntersections",
+    "rowSelection",
+    "selectionType",
+    "setQuery",
+    "allSets",
+    "processedData",
+    "accessibleProcessedData",
+]
+
+# Nested fields that are never read by the parser and are dropped when streaming.
+# Every subset in processedData carries the IDs of its items, which for the
+# empty intersection alone can be thousands of strings.
+# (accessibleProcessedData is not listed since its subsets carry no items.)
+SKIPPED_PATHS: "list[Tuple[str, ...]]" = [
+    ("processedData", "values", "*", "items"),
+    ("rowSelection", "items"),
+]
+
+# Keys that are only read when the intersections are recomputed from the items
+# (see Parser.recompute_subsets). Each set in rawData lists its items too,
+# which the 0/1 set columns of the items already give.
+RAW_KEYS: "list[str]" = ["rawData"]
+RAW_SKIPPED_PATHS: "list[Tuple[str, ...]]" = [("rawData", "sets", "*", "items")]
+
+
+def needs_raw_data(data: "dict[str, Any]") -> bool:
+    """
+    Returns whether the subsets of an export can only be read by recomputing them
+    from its rawData (see Parser.recompute_subsets): the export has no processedData,
+    names its sets in allSets without their sizes (as older exports do), or
+    lists aggregates rather than subsets in processedData.
+    """
+    if "processedData" not in data:
+        return True
+    if any(isinstance(set_, str) for set_ in data.get("allSets", [])):
+        return True
+    return any(item.get("type") == "Aggregate" for item in data["processedData"]["values"].values())
+
+
+class SubsetColumns:
+    """
+    Accumulates subset fields column by column while parsing,
+    so that a SubsetTable can be built without creating Subset objects.
+    """
+
+    def __init__(self) -> None:
+        self.names: list[str] = []
+        self.sizes: list[int] = []
+        self.devs: list[float] = []
+        self.degrees: list[int] = []
+        self.classifications: list[int] = []
+        self.masks: list[int] = []
+
+    def append(
+        self, name: str, size: int, dev: float, degree: int, classification: IntersectionType, mask: int
+    ) -> None:
+        self.names.append(name)
+        self.sizes.append(size)
+        self.devs.append(dev)
+        self.degrees.append(degree)
+        self.classifications.append(CLASSIFICATION_CODES[classification])
+        self.masks.append(mask)
+
+    def to_table(self, set_names: "list[str]") -> SubsetTable:
+        return SubsetTable(
+            self.names, self.sizes, self.devs, self.degrees, self.classifications, self.masks, set_names
+        )
 
 
 class Parser:
@@ -24,15 +110,61 @@ class Parser:
     Params:
     - data: Path to the data file to be parsed,
             or a dictionary containing the data parsed from JSON.
+    - streaming: If data is a Path, decode only the keys in PARSED_KEYS
+            and skip the rest of the file at the byte level. The fields in
+            SKIPPED_PATHS are dropped as well; what was dropped is counted
+            in self.skip_stats.
+    - snapshot_dir: If data is a Path, a directory of snapshots of parsed
+            exports (see alttxt.snapshot). If the directory holds a snapshot
+            of the file's contents, it is loaded instead of parsing the file;
+            otherwise the file is parsed right away and a snapshot is written.
+            Not used if the intersections are recomputed.
+    - recompute: Recompute the sets and intersections from the items in
+            "rawData" (see recompute_subsets) instead of reading them from
+            "allSets", "processedData" and "accessibleProcessedData", which may
+            be stale. Exports without "processedData" are always recomputed.
+            Exports without "accessibleProcessedData" have their visible subsets
+            derived from "processedData" (see alttxt.view).
     """
 
-    def __init__(self, data: "Union[Path, dict[str, dict[str, Any]]]") -> None:
+    def __init__(
+        self,
+        data: "Union[Path, dict[str, dict[str, Any]]]",
+        streaming: bool = False,
+        snapshot_dir: Optional[Path] = None,
+        recompute: bool = False,
+    ) -> None:
         # Default message for when a field cannot be found by the parser
         self.default_field = "(field not available)"
+        # Counts of the fields dropped while streaming, if streaming
+        self.skip_stats: Optional[jsonstream.SkipStats] = None
+        # The parsed export, if it was loaded from or written to a snapshot
+        self.snapshot: Optional[Tuple[GrammarModel, DataModel]] = None
+        # Whether the parsed export was loaded from a snapshot
+        self.from_snapshot: bool = False
+        # The decoded export, or empty if it was loaded from a snapshot
+        self.data: "dict[str, Any]"
+
+        store: "Optional[SnapshotStore]" = None
+        if isinstance(data, Path) and snapshot_dir is not None and not recompute:
+            from alttxt.snapshot import SnapshotStore, file_digest
+
+            store = SnapshotStore(snapshot_dir)
+            digest = file_digest(data)
+            self.snapshot = store.load(digest)
+            if self.snapshot is not None:
+                self.from_snapshot = True
+                self.data = {}
+                return
 
         # Now load the file and parse the data
         if isinstance(data, Path):
-            self.data: dict[str, dict[str, Any]] = self.load_data(data)
+            if streaming:
+                self.data = self.load_data_streaming(data, recompute)
+                if not recompute and needs_raw_data(self.data):
+                    self.data = self.load_data_streaming(data, True)
+            else:
+                self.data = self.load_data(data)
         elif isinstance(data, dict):
             self.data = data
         else:
@@ -41,13 +173,16 @@ class Parser:
                 "should be Path or dict[str, dict[str, Any]]"
             )
 
-        # Currently aggregated data is unsupported.
-        # When support is added, this should change to a match statement
-        # which feeds the data to different functions based on the aggregation type
-        if AggregateBy(self.data["firstAggregateBy"]) != AggregateBy.NONE:
-            raise Exception(
-                f"Cannot parse aggregated data, please provide non-aggregated data."
-            )
+        # Copied, since the fields below are rewritten and data may be the caller's
+        self.data = self.upgrade_legacy(self.data)
+        # Aggregated exports are parsed like any other: their aggregates are
+        # computed from the subsets when the text is generated (see alttxt.aggregation)
+        if recompute or needs_raw_data(self.data):
+            self.recompute_subsets(self.data)
+
+        if store is not None:
+            self.snapshot = (self.parse_grammar(self.data), self.parse_data_no_agg(self.data))
+            store.save(digest, *self.snapshot)
 
     def trim_set_name(self, set_name: str) -> str:
         """
@@ -60,6 +195,8 @@ class Parser:
         Parses the grammar data from the JSON export from the UpSet Multinet implementation
         into a GrammarModel.
         """
+        if self.snapshot is not None:
+            return self.snapshot[0]
         return self.parse_grammar(self.data)
 
     def get_data(self) -> DataModel:
@@ -67,17 +204,73 @@ class Parser:
         Parses the data from the JSON export from the UpSet Multinet implementation
         into a DataModel.
         """
+        if self.snapshot is not None:
+            return self.snapshot[1]
         return self.parse_data_no_agg(self.data)
 
     def load_data(self, file_path: Path) -> "dict[str, dict[str, Any]]":
         """
         Loads a data file into JSON to be parsed.
-        Raises an exception if the file is aggregated.
         """
         with open(file_path) as f:
             return json.load(f)
-        
-    def classify_subset(self, degree: int, num_individual_sets: int) -> IntersectionType:
+
+    def load_data_streaming(self, file_path: Path, raw: bool = False) -> "dict[str, dict[str, Any]]":
+        """
+        Loads only the parts of a data file that are parsed (see PARSED_KEYS).
+        Unlike load_data, the remaining values, such as "rawData", and the
+        fields in SKIPPED_PATHS are skipped without being decoded into Python objects.
+        If raw is True, the keys needed to recompute the intersections are loaded too
+        (see RAW_KEYS).
+        """
+        self.skip_stats = jsonstream.SkipStats()
+        if raw:
+            return jsonstream.load_file_keys(
+                file_path, PARSED_KEYS + RAW_KEYS, SKIPPED_PATHS + RAW_SKIPPED_PATHS, self.skip_stats
+            )
+        return jsonstream.load_file_keys(file_path, PARSED_KEYS, SKIPPED_PATHS, self.skip_stats)
+
+    def upgrade_legacy(self, data: "dict[str, Any]") -> "dict[str, Any]":
+        """
+        Returns a copy of an export with the grammar fields that older exports lack
+        filled in with UpSet's defaults: descending sort order and the no-set
+        intersection shown. The export passed in is not changed.
+        """
+        data = dict(data)
+        data.setdefault("sortByOrder", "Descending")
+        if "filters" in data:
+            data["filters"] = {**data["filters"]}
+            data["filters"].setdefault("hideNoSet", False)
+        return data
+
+    def recompute_subsets(self, data: "dict[str, Any]") -> None:
+        """
+        Recomputes the sizes of the sets and the intersections of the visible sets
+        from the items in data["rawData"] (see alttxt.intersections), and replaces
+        "allSets" and "processedData" with the results.
+        processedData holds every intersection (only those with items if hideEmpty is set),
+        sorted as the grammar says, and accessibleProcessedData is removed so that the
+        visible subsets are derived from them under the grammar (see alttxt.view).
+        Raises an exception if the export has no rawData.
+        """
+        from alttxt.intersections import SetBitmaps
+
+        if "rawData" not in data:
+            raise Exception("Cannot recompute the intersections of an export without rawData.")
+        bitmaps = SetBitmaps.from_raw_data(data["rawData"])
+        data["allSets"] = [
+            {"name": set_id, "size": size} for set_id, size in zip(bitmaps.set_ids, bitmaps.set_sizes().tolist())
+        ]
+
+        filters = data["filters"]
+        intersections = bitmaps.intersections(data["visibleSets"], include_empty=not filters["hideEmpty"])
+        order = intersections.order(SortBy(data["sortBy"].lower()), SortOrder(data["sortByOrder"].lower()))
+        all_values = intersections.export_values(order)
+        data["processedData"] = {"values": all_values, "order": list(all_values)}
+        data.pop("accessibleProcessedData", None)
+
+    @staticmethod
+    def classify_subset(degree: int, num_individual_sets: int) -> IntersectionType:
         """
         Classifies a subset based on its degree and the number of individual sets.
         """
@@ -124,7 +317,7 @@ class Parser:
             else:
                 return IntersectionType.HIGHORDER_SET
     
-    def parse_data_no_agg(self, data: "dict[str, dict[str, Any]]") -> DataModel:
+    def parse_data_no_agg(self, data: "dict[str, Any]") -> DataModel:
         """
         Responsible for parsing non-aggregated data from the JSON export
         from the UpSet Multinet implementation. Other functions in this
@@ -144,9 +337,18 @@ class Parser:
         # Dictionary mapping set names to their sizes
         sizes: dict[str, int] = {}
 
-        # Dictionary mapping sets/intersections/aggregations to information about them
-        subsets: list[Subset] = []
-        data_visible_subsets = data["accessibleProcessedData"]["values"]
+        # Each set in allSets is assigned a bit in the subsets' membership masks.
+        # Visible subsets name their sets with hyphens instead of underscores.
+        set_bits: dict[str, int] = {}
+        all_set_names: list[str] = []
+        visible_set_names: list[str] = []
+        for set_ in data["allSets"]:
+            self.add_set_bit(set_["name"], set_bits, all_set_names, visible_set_names)
+
+        # Columns of the visible sets/intersections/aggregations
+        visible_columns = SubsetColumns()
+        # Exports without accessibleProcessedData have their visible subsets derived below
+        data_visible_subsets = data.get("accessibleProcessedData", {"values": {}})["values"]
         for item in data_visible_subsets.values():
             # Name of the set/intersection/aggregation-
             # a list of set names in the case of intersections
@@ -171,19 +373,16 @@ class Parser:
             # Classification
             classification = self.classify_subset(degree, len(data["visibleSets"]))
 
-            # Process setMembership to store only the names of sets with "Yes" membership
-            setMembership = {self.trim_set_name(key): value for key, value in item.get("setMembership", {}).items() if value == "Yes"}
+            # Only store the sets with "Yes" membership, as bits of the mask
+            mask = self.membership_mask(item.get("setMembership", {}), set_bits, all_set_names, visible_set_names)
 
-            # Only store the keys (set names) that have "Yes" as their value
-            yes_sets = {key.replace('_','-') for key, value in setMembership.items() if value == "Yes"}
-
-            subsets.append(Subset(name=name, size=size, dev=dev, degree=degree, classification=classification, setMembership=yes_sets))
+            visible_columns.append(name, size, dev, degree, classification, mask)
 
         lowercase_data_visible_subsets = {k.lower(): k for k in data_visible_subsets.keys()}
 
-        all_subsets: list[Subset] = []
+        all_columns = SubsetColumns()
         data_all_subsets = data["processedData"]["values"]
-        count: list[int] = []
+        all_sets_length = len(data["allSets"])
         for key, item in data_all_subsets.items():
 
             # Convert key to lowercase for case-insensitive comparison
@@ -207,24 +406,19 @@ class Parser:
             except KeyError:
                 dev: float = round(item.get("deviation", self.default_field), 2)
 
-            # Degree - the degree might not be available in the raw data, handle accordingly
+            # Only store the sets with "Yes" membership, as bits of the mask
+            mask = self.membership_mask(item.get("setMembership", {}), set_bits, all_set_names, visible_set_names)
+
+            # Degree - processedData only has it in some exports; otherwise it is the number of sets in the mask
             degree: int = item.get("degree")
             if degree is not None:
                 degree = int(degree)
             else:
-                degree = 0  # or some default value
-
-            all_sets_length = len(data["allSets"])
+                degree = bin(mask).count("1")
 
             classification = self.classify_subset(degree, all_sets_length)
 
-            setMembership = {self.trim_set_name(key): value for key, value in item.get("setMembership", {}).items() if value == "Yes"}
-        
-            # Only store the keys (set names) that have "Yes" as their value
-            yes_sets = {key for key, value in setMembership.items() if value == "Yes"}
-            
-            count.append(size)
-            all_subsets.append(Subset(name=name, size=size, dev=dev, degree=degree, classification=classification, setMembership=yes_sets))
+            all_columns.append(name, size, dev, degree, classification, mask)
 
         # List of set names
         sets_: list[str] = []
@@ -238,11 +432,64 @@ class Parser:
             sets_.append(set_name.replace('_', '-'))
 
         
+        all_subset_table = all_columns.to_table(all_set_names)
+        if "accessibleProcessedData" in data:
+            subset_table = visible_columns.to_table(visible_set_names)
+        else:
+            from alttxt.view import plot_view
+
+            view = plot_view(all_subset_table, self.parse_grammar(data))
+            subset_table = view.subset_table(len(data["visibleSets"]))
+
         # Initialize deviations
-        data_model = DataModel(sets=sets_, sizes=sizes, count=count, subsets=subsets, all_subsets=all_subsets, all_sets_length=all_sets_length)
+        data_model = DataModel(
+            sets=sets_,
+            sizes=sizes,
+            count=list(all_columns.sizes),
+            subset_table=subset_table,
+            all_subset_table=all_subset_table,
+            all_sets_length=all_sets_length,
+        )
     
         return data_model
 
+    def add_set_bit(
+        self,
+        set_name: str,
+        set_bits: "dict[str, int]",
+        all_set_names: "list[str]",
+        visible_set_names: "list[str]",
+    ) -> int:
+        """
+        Assigns the next membership mask bit to a set, if it has none yet,
+        and returns the set's bit.
+        The set's name is recorded without the 'Set_' prefix in all_set_names,
+        and additionally with underscores replaced by hyphens in visible_set_names.
+        """
+        if set_name not in set_bits:
+            set_bits[set_name] = len(all_set_names)
+            trimmed = self.trim_set_name(set_name)
+            all_set_names.append(trimmed)
+            visible_set_names.append(trimmed.replace('_', '-'))
+        return set_bits[set_name]
+
+    def membership_mask(
+        self,
+        set_membership: "dict[str, str]",
+        set_bits: "dict[str, int]",
+        all_set_names: "list[str]",
+        visible_set_names: "list[str]",
+    ) -> int:
+        """
+        Converts a subset's setMembership into a bitmask of the sets with "Yes" membership.
+        Sets missing from allSets are assigned a new bit.
+        """
+        mask = 0
+        for set_name, value in set_membership.items():
+            if value == "Yes":
+                mask |= 1 << self.add_set_bit(set_name, set_bits, all_set_names, visible_set_names)
+        return mask
+
     def parse_grammar(self, grammar: "dict[str, Any]") -> GrammarModel:
         """
         Parses the state data from the JSON export from the UpSet Multinet implementation
@@ -295,7 +542,7 @@ class Parser:
             )
 
         collapsed: list[str] = grammar["collapsed"]
-        visible_sets: list[str] = grammar["visibleSets"]
+        visible_sets: list[str] = list(grammar["visibleSets"])
         all_set_names: list[str] = list(map(lambda x: x["name"], grammar["allSets"]))
         visible_atts: list[str] = grammar["visibleAttributes"]
 
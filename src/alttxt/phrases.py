@@ -31,7 +31,7 @@ DESCRIPTIONS: "dict[str, Any]" = {
         "queries_and_filters": "{{set_query}}. {{degree_filters}}. {{hide_settings}}.",
         "set_description": "[[set_divergence]] [[set_description]].",
         "selection_description": "{{selected_intersection}}{{bookmark_list}}",
-        "intersection_description": "[[sort_by]]. {{pop_non-empty_intersections}}."
+        "intersection_description": "[[sort_by]]. {{pop_non-empty_intersections}}.{{aggregation}}"
         " {{set_query}}. {{list_max_5int}}.",
         "statistical_information": "[[size_percs]]. [[maxmin_set_percentages_info]].",
     },
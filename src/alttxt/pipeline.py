@@ -0,0 +1,202 @@
+"""
+The stages of turning an UpSet export into alt text, shared by every entry point:
+parse the export, build the TokenMap for the tokens the level can reach,
+and render the text with AltTxtGen.
+"""
+import mmap
+import time
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple, Union
+
+from alttxt import jsonstream
+from alttxt.dependencies import dependency_graph
+from alttxt.enums import Level
+from alttxt.generator import AltTxtGen
+from alttxt.models import DataModel, GrammarModel
+from alttxt.parser import PARSED_KEYS, RAW_KEYS, RAW_SKIPPED_PATHS, SKIPPED_PATHS, Parser, needs_raw_data
+from alttxt.profiling import Profile, stage
+from alttxt.tokenmap import TokenMap
+
+if TYPE_CHECKING:
+    from alttxt.cache import ResultCache
+
+# The generated text, or the structured output of the default level
+Output = Union[str, "Dict[str, str]"]
+
+
+class ExportError(ValueError):
+    """
+    Raised by parse_bytes when an export cannot be parsed.
+    """
+
+
+def parse(
+    data: "Union[Path, Dict[str, Any]]",
+    snapshot_dir: Optional[Path] = None,
+    profile: Optional[Profile] = None,
+    recompute: bool = False,
+) -> "Tuple[GrammarModel, DataModel]":
+    """
+    Parses an export into its grammar and data.
+    Params:
+    - data: Path to the export, which is streamed (see Parser),
+            or the export already decoded from JSON
+    - snapshot_dir: If given, a directory of snapshots of parsed exports
+            to load the export from or add it to (see Parser)
+    - profile: If given, the time of each stage is recorded in it
+    - recompute: Whether to recompute the intersections from the items
+            in the export's rawData (see Parser)
+    """
+    with stage(profile, "load_data"):
+        upset_parser = Parser(data, streaming=True, snapshot_dir=snapshot_dir, recompute=recompute)
+    with stage(profile, "parse_grammar"):
+        grammar = upset_parser.get_grammar()
+    with stage(profile, "parse_data"):
+        data_model = upset_parser.get_data()
+    return grammar, data_model
+
+
+def parse_bytes(raw: "Union[bytes, mmap.mmap]", profile: Optional[Profile] = None) -> "Tuple[GrammarModel, DataModel]":
+    """
+    Parses an export held in memory, such as an upload.
+    Only the keys the parser reads are decoded, as when streaming from a file,
+    plus rawData if the subsets have to be recomputed from it (see needs_raw_data).
+    Raises ExportError if the export is not valid JSON or cannot be parsed.
+    """
+    try:
+        with stage(profile, "load_data"):
+            data = jsonstream.load_keys(raw, PARSED_KEYS, SKIPPED_PATHS)
+            if needs_raw_data(data):
+                data = jsonstream.load_keys(raw, PARSED_KEYS + RAW_KEYS, SKIPPED_PATHS + RAW_SKIPPED_PATHS)
+        return parse(data, profile=profile)
+    except Exception as e:
+        raise ExportError(f"{type(e).__name__}: {e}") from e
+
+
+def generate(
+    grammar: GrammarModel,
+    data: DataModel,
+    level: Level,
+    structured: bool = False,
+    title: Optional[str] = None,
+    profile: Optional[Profile] = None,
+) -> Output:
+    """
+    Generates the alt text of a parsed export.
+    Only the tokens the level can reach are mapped.
+    If profile is given, the time of each stage and token is recorded in it.
+    """
+    with stage(profile, "tokenmap"):
+        tokenmap = TokenMap(data, grammar, title, dependency_graph(level, structured).tokens, profile)
+    return render(tokenmap, level, structured, profile)
+
+
+def render(tokenmap: TokenMap, level: Level, structured: bool = False, profile: Optional[Profile] = None) -> Output:
+    """
+    Renders the alt text of a level from a TokenMap, which must map the tokens the level can reach.
+    Tokens already computed by the map are reused, so after TokenMap.update
+    only the tokens whose inputs changed are computed again.
+    """
+    with stage(profile, "render"):
+        return AltTxtGen(level, structured, tokenmap, tokenmap.grammar).text
+
+
+def generate_bytes(
+    raw: "Union[bytes, mmap.mmap]",
+    level: Level,
+    structured: bool = False,
+    title: Optional[str] = None,
+) -> Output:
+    """
+    Generates the alt text of an export held in memory or memory-mapped.
+    Raises ExportError if the export cannot be parsed.
+    """
+    grammar, data = parse_bytes(raw)
+    return generate(grammar, data, level, structured, title)
+
+
+def profile_bytes(
+    raw: bytes,
+    level: Level,
+    structured: bool = False,
+    title: Optional[str] = None,
+) -> "Tuple[Output, Dict[str, Any]]":
+    """
+    Generates the alt text of an export held in memory, and returns it
+    with the timings of the run (see Profile.as_dict).
+    Raises ExportError if the export cannot be parsed.
+    """
+    profile = Profile()
+    grammar, data = parse_bytes(raw, profile)
+    output = generate(grammar, data, level, structured, title, profile)
+    return output, profile.as_dict()
+
+
+def describe(
+    path: Path,
+    level: Level,
+    structured: bool = False,
+    title: Optional[str] = None,
+    cache: "Optional[ResultCache]" = None,
+    snapshot_dir: Optional[Path] = None,
+    profile: bool = False,
+) -> "Dict[str, Any]":
+    """
+    Generates the alt text of one export and returns a record of the run:
+    - file: The path of the export
+    - level, structured: The options the text was generated with
+    - output: The generated text, or None if generation failed
+    - timings: The seconds spent parsing, generating and in total,
+      and looking the result up if a cache is given
+    - error: None, or the type and message of the exception that was raised
+    - cached: Whether the output came from the cache (only if a cache is given)
+    - profile: The timings of each stage and token (only if profile is True,
+      see Profile.as_dict). Empty if the output came from the cache.
+    If snapshot_dir is given, exports are parsed through snapshots (see Parser).
+    Exceptions are recorded rather than raised, so that one bad export
+    does not stop a batch.
+    """
+    record: "Dict[str, Any]" = {
+        "file": str(path),
+        "level": level.value,
+        "structured": structured,
+        "output": None,
+        "timings": {},
+        "error": None,
+    }
+    run_profile = Profile() if profile else None
+    start = time.perf_counter()
+    try:
+        if cache is None:
+            grammar, data = parse(path, snapshot_dir, run_profile)
+        else:
+            raw = path.read_bytes()
+            key = cache.key(raw, level, structured, title)
+            record["output"] = cache.get(key)
+            record["cached"] = record["output"] is not None
+            record["timings"]["lookup"] = time.perf_counter() - start
+            if record["cached"]:
+                record["timings"]["total"] = record["timings"]["lookup"]
+                if run_profile is not None:
+                    record["profile"] = run_profile.as_dict()
+                return record
+            if snapshot_dir is not None:
+                grammar, data = parse(path, snapshot_dir, run_profile)
+            else:
+                grammar, data = parse_bytes(raw, run_profile)
+        parsed = time.perf_counter()
+        record["timings"]["parse"] = parsed - start - record["timings"].get("lookup", 0.0)
+        record["output"] = generate(grammar, data, level, structured, title, run_profile)
+        record["timings"]["generate"] = time.perf_counter() - parsed
+        if cache is not None:
+            cache.put(key, record["output"])
+    except ExportError as e:
+        # The message already names the original exception
+        record["error"] = str(e)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["timings"]["total"] = time.perf_counter() - start
+    if run_profile is not None:
+        record["profile"] = run_profile.as_dict()
+    return record
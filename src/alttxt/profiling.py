@@ -0,0 +1,177 @@
+"""
+Wall and CPU time of the stages of a generation run, and of each token it computes.
+
+The stages are:
+- load_data: reading the export (Parser.load_data, or loading its snapshot)
+- parse_grammar: Parser.parse_grammar
+- parse_data: Parser.parse_data_no_agg
+- tokenmap: TokenMap.__init__
+- render: AltTxtGen.text, which expands the grammar and calls AltTxtGen.replaceTokens.
+  The tokens are computed while rendering, so their times are part of it.
+
+Recording a profile costs two clock reads per stage and per token, so it can
+be left enabled on a sampled fraction of requests (see sampled). CPU time
+is the time of the calling thread. A cProfile of the stages is only
+collected when asked for, since it slows the run down several times.
+
+Memory accounting is also optional: it traces every allocation with
+tracemalloc, which slows the run down and adds its own memory, so it is
+meant for benchmarks and investigations rather than production.
+"""
+import contextlib
+import cProfile
+import random
+import time
+import tracemalloc
+
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+# A wall and a CPU time, in seconds
+Timing = Dict[str, float]
+
+# Number of allocation sites reported for each stage
+TOP_SITES = 10
+
+
+class Profile:
+    """
+    The timings of one generation run.
+    - stages: The wall and CPU time of each stage, in the order they ran
+    - tokens: The wall and CPU time of computing each token, in the order they were computed.
+      Helpers shared between tokens are memoized, so their cost is counted
+      for the first token that needs them.
+    - memory: If memory is accounted, for each stage, in bytes:
+      - peak: The most memory traced while the stage ran
+      - current: The memory traced once the stage was done, i.e. retained by all stages so far
+      - retained: The growth of the traced memory over the stage
+      - top: The TOP_SITES source lines whose allocations grew the most over
+        the stage, with the growth in bytes and number of blocks
+    Params:
+    - cprofile: Whether to also run cProfile over the stages (see dump_stats)
+    - memory: Whether to account the memory of each stage with tracemalloc.
+      Tracing is started if it is not running, and stopped by close.
+    """
+
+    def __init__(self, cprofile: bool = False, memory: bool = False) -> None:
+        self.stages: "Dict[str, Timing]" = {}
+        self.tokens: "Dict[str, Timing]" = {}
+        self.memory: "Dict[str, Dict[str, Any]]" = {}
+        self.profiler: Optional[cProfile.Profile] = cProfile.Profile() if cprofile else None
+        self.trace_memory = memory
+        self._started_tracing = False
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._before = 0
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Times the body of a with statement as a stage.
+        A stage that runs more than once accumulates its times.
+        """
+        if self.trace_memory:
+            self._start_memory()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            self._add(self.stages, name, time.perf_counter() - wall, time.thread_time() - cpu)
+            if self.trace_memory:
+                self._end_memory(name)
+
+    def token(self, name: str, compute: Callable[..., Any], *args: Any) -> Any:
+        """
+        Returns compute(*args), timed as the computation of a token.
+        """
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return compute(*args)
+        finally:
+            self._add(self.tokens, name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def as_dict(self) -> "Dict[str, Any]":
+        """
+        Returns the timings as plain data, ready to be encoded as JSON:
+        the stages, the tokens and the total of the stages,
+        and the memory of each stage if it was accounted.
+        """
+        result: "Dict[str, Any]" = {
+            "stages": {name: dict(timing) for name, timing in self.stages.items()},
+            "tokens": {name: dict(timing) for name, timing in self.tokens.items()},
+            "total": {
+                "wall": sum(timing["wall"] for timing in self.stages.values()),
+                "cpu": sum(timing["cpu"] for timing in self.stages.values()),
+            },
+        }
+        if self.trace_memory:
+            result["memory"] = {name: dict(usage) for name, usage in self.memory.items()}
+        return result
+
+    def close(self) -> None:
+        """
+        Stops tracing memory, if this profile started it.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+
+    def dump_stats(self, path: Path) -> None:
+        """
+        Writes the cProfile statistics of the stages to a file readable by pstats.
+        Raises ValueError if the profile was created without cprofile.
+        """
+        if self.profiler is None:
+            raise ValueError("The profile was created without cprofile=True")
+        self.profiler.dump_stats(str(path))
+
+    def _start_memory(self) -> None:
+        self._snapshot = tracemalloc.take_snapshot()
+        self._before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def _end_memory(self, name: str) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        assert self._snapshot is not None
+        top: "List[Dict[str, Any]]" = []
+        for stat in tracemalloc.take_snapshot().compare_to(self._snapshot, "lineno"):
+            if len(top) == TOP_SITES or stat.size_diff <= 0:
+                break
+            frame = stat.traceback[0]
+            # Allocations of tracemalloc itself and of the import machinery are not reported
+            if frame.filename == tracemalloc.__file__ or frame.filename.startswith("<"):
+                continue
+            top.append({"site": f"{frame.filename}:{frame.lineno}", "size": stat.size_diff, "count": stat.count_diff})
+        usage = self.memory.setdefault(name, {"peak": 0, "current": 0, "retained": 0, "top": []})
+        # A stage that runs more than once reports its highest peak and its last sites
+        usage["peak"] = max(usage["peak"], peak)
+        usage["current"] = current
+        usage["retained"] += current - self._before
+        usage["top"] = top
+
+    @staticmethod
+    def _add(timings: "Dict[str, Timing]", name: str, wall: float, cpu: float) -> None:
+        timing = timings.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        timing["wall"] += wall
+        timing["cpu"] += cpu
+
+
+def stage(profile: Optional[Profile], name: str) -> ContextManager[None]:
+    """
+    Returns profile.stage(name), or a context that does nothing if profile is None.
+    """
+    return profile.stage(name) if profile is not None else contextlib.nullcontext()
+
+
+def sampled(rate: float) -> bool:
+    """
+    Returns whether to profile a request, so that a fraction rate of requests are profiled.
+    """
+    return rate >= 1 or (rate > 0 and random.random() < rate)
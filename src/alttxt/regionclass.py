@@ -1,19 +1,167 @@
+import statistics
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from alttxt.enums import IntersectionType
+from alttxt.subsettable import CLASSIFICATIONS, SubsetTable
+
+
 class RegionClassification:
-    def __init__(self):
-        self.largest_data_region = None
-        self.large_data_region = []
-        self.medium_data_region = []
-        self.small_data_region = []
+    """
+    Classification of the subsets of a SubsetTable into size regions:
+    the single largest subset, and large, medium and small subsets
+    relative to the median size of the others.
+    The result is computed once, in one vectorized pass over the table,
+    and is immutable: each row's region is stored as an index into REGIONS,
+    and each region can be selected with a boolean mask.
+    """
+
+    REGIONS: "Tuple[str, ...]" = (
+        "largest_data_region",
+        "large_data_region",
+        "medium_data_region",
+        "small_data_region",
+    )
+    LARGEST, LARGE, MEDIUM, SMALL = range(4)
+
+    # Minimum percentage of a region's size for an intersection type
+    # to be reported in that region when it appears in several regions
+    THRESHOLD_PERCENTAGE = 35.0
+
+    def __init__(self, table: SubsetTable) -> None:
+        """
+        Classifies the subsets of the table.
+        Params:
+        - table: The subsets to classify. Must contain at least 2 subsets.
+        """
+        self._table: SubsetTable = table
+
+        order = table.sort_index.order("size", descending=True)
+        # Sizes of all but the largest subset, in descending order
+        rest = table.size[order[1:]]
+        if len(rest) == 0:
+            raise statistics.StatisticsError("no median for empty data")
+        mid = len(rest) // 2
+        median_size = rest[mid].item() if len(rest) % 2 == 1 else (rest[mid - 1].item() + rest[mid].item()) / 2
+
+        close_to_zero_threshold = median_size * 1.2  # Define what 'close to zero' means
+        band = abs(median_size - close_to_zero_threshold)
+        deviation = table.size - median_size
+
+        region = np.full(len(table), RegionClassification.LARGE, dtype=np.int8)
+        region[(deviation == 0) | (np.abs(deviation) <= band)] = RegionClassification.MEDIUM
+        region[(deviation < 0) & (np.abs(deviation) > band)] = RegionClassification.SMALL
+        region[order[0]] = RegionClassification.LARGEST
+        region.flags.writeable = False
+
+        self._region: "npt.NDArray[np.int8]" = region
+        self._largest_row: int = int(order[0])
+        self._percentages = MappingProxyType(self._region_percentages())
+        self._classification_regions = MappingProxyType(self._map_classifications())
+
+    @property
+    def table(self) -> SubsetTable:
+        return self._table
+
+    @property
+    def region(self) -> "npt.NDArray[np.int8]":
+        """
+        The index into REGIONS of the region of each row of the table (read-only).
+        """
+        return self._region
+
+    @property
+    def largest_row(self) -> int:
+        """
+        The row of the largest subset.
+        """
+        return self._largest_row
+
+    @property
+    def percentages(self) -> "Mapping[str, Mapping[IntersectionType, float]]":
+        """
+        For each region, the percentage of the region's total size
+        taken up by each intersection type present in the region.
+        """
+        return self._percentages
+
+    @property
+    def classification_regions(self) -> "Mapping[str, Tuple[str, ...]]":
+        """
+        The regions each intersection type (by value) is reported in, in REGIONS order.
+        """
+        return self._classification_regions
+
+    def mask(self, region_name: str) -> "npt.NDArray[np.bool_]":
+        """
+        Returns a boolean array selecting the rows of the table in a region.
+        """
+        selected: "npt.NDArray[np.bool_]" = self._region == RegionClassification.REGIONS.index(region_name)
+        return selected
+
+    def rows(self, region_name: str) -> "npt.NDArray[np.intp]":
+        """
+        Returns the rows of the table in a region, in descending order of size.
+        """
+        order = self._table.sort_index.order("size", descending=True)
+        rows: "npt.NDArray[np.intp]" = order[self.mask(region_name)[order]]
+        return rows
+
+    def regions_of(self, classification: str) -> "Tuple[str, ...]":
+        """
+        Returns the regions an intersection type is reported in,
+        or an empty tuple if it is not present.
+        Params:
+        - classification: The value of the IntersectionType
+        """
+        return self._classification_regions.get(classification, ())
 
-    def set_largest(self, subset):
-        self.largest_data_region = subset
+    def _region_percentages(self) -> "dict[str, Mapping[IntersectionType, float]]":
+        # Total size of each (region, intersection type) pair in one pass
+        n_types = len(CLASSIFICATIONS)
+        keys = self._region.astype(np.int64) * n_types + self._table.classification
+        sizes = np.bincount(keys, weights=self._table.size, minlength=len(self.REGIONS) * n_types)
+        present = np.bincount(keys, minlength=len(self.REGIONS) * n_types) > 0
+        sizes = sizes.reshape(len(self.REGIONS), n_types)
+        present = present.reshape(len(self.REGIONS), n_types)
 
-    def add_to_large_region(self, subset):
-        self.large_data_region.append(subset)
+        percentages: "dict[str, Mapping[IntersectionType, float]]" = {}
+        for index, region_name in enumerate(self.REGIONS):
+            total = int(sizes[index].sum())
+            percentages[region_name] = MappingProxyType({
+                CLASSIFICATIONS[code]: (int(sizes[index, code]) / total * 100) if total > 0 else 0
+                for code in np.flatnonzero(present[index]).tolist()
+            })
+        return percentages
 
-    def add_to_medium_region(self, subset):
-        self.medium_data_region.append(subset)
+    def _map_classifications(self) -> "dict[str, Tuple[str, ...]]":
+        threshold = RegionClassification.THRESHOLD_PERCENTAGE
+        classification_to_regions: "dict[str, dict[str, float]]" = {}
 
-    def add_to_small_region(self, subset):
-        self.small_data_region.append(subset)
+        for region, classifications in self._percentages.items():
+            for classification, value in classifications.items():
+                # Direct inclusion for single-region classifications or exceeding threshold
+                if classification.value not in classification_to_regions or value >= threshold:
+                    classification_to_regions.setdefault(classification.value, {})[region] = value
+                else:
+                    # Otherwise, only replace the first region if this one has a higher percentage
+                    existing_value = next(iter(classification_to_regions[classification.value].values()))
+                    if value > existing_value:
+                        classification_to_regions[classification.value][region] = value
 
+        result: "dict[str, Tuple[str, ...]]" = {}
+        for classification_value, regions_percentages in classification_to_regions.items():
+            if len(regions_percentages) > 1:
+                # Keep the regions at or above the threshold,
+                # or the one with the highest percentage if there are none
+                above_threshold_regions = [region for region, pct in regions_percentages.items() if pct >= threshold]
+                if not above_threshold_regions:
+                    above_threshold_regions = [max(regions_percentages, key=regions_percentages.__getitem__)]
+                result[classification_value] = tuple(above_threshold_regions)
+            else:
+                # If the classification is present in only one region, include it regardless of the percentage
+                result[classification_value] = tuple(regions_percentages)
+        return result
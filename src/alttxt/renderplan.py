@@ -0,0 +1,111 @@
+"""
+Compilation of phrases from the grammar in phrases.DESCRIPTIONS into render plans.
+
+A phrase is expanded by replacing every [[non-terminal]] with its mapping in
+the "symbols" table, recursively, and then every {{terminal}} with the value
+of the token from a TokenMap. The symbols table never changes, so the first
+step is done once per phrase: the expanded phrase is stored as a flat list of
+literal fragments and token slots, and rendering it is a single join over the
+values of the tokens.
+"""
+import functools
+import re
+
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+from alttxt import phrases
+
+# Delimiters of non-terminal and terminal symbols
+SYMBOL_SPLIT = re.compile(r"\[\[|\]\]")
+TOKEN_SPLIT = re.compile(r"{{|}}")
+
+
+class GrammarError(Exception):
+    """
+    Raised when a phrase cannot be compiled: it references a symbol that
+    is not defined, a symbol that (indirectly) references itself,
+    or has unbalanced brackets.
+    """
+
+
+class RenderPlan:
+    """
+    A phrase with all of its non-terminals expanded.
+    - literals: The text between tokens. Always one longer than tokens.
+    - tokens: The names of the tokens, in order of appearance
+    """
+
+    def __init__(self, literals: "Tuple[str, ...]", tokens: "Tuple[str, ...]") -> None:
+        if len(literals) != len(tokens) + 1:
+            raise ValueError("A render plan needs exactly one more literal than tokens")
+        self.literals: "Tuple[str, ...]" = literals
+        self.tokens: "Tuple[str, ...]" = tokens
+
+    def render(self, get_token: "Callable[[str], Any]") -> str:
+        """
+        Returns the phrase with each token replaced by str() of its value.
+        Params:
+        - get_token: Returns the value of a token, e.g. TokenMap.get_token
+        """
+        parts = [self.literals[0]]
+        for token, literal in zip(self.tokens, self.literals[1:]):
+            parts.append(str(get_token(token)))
+            parts.append(literal)
+        return "".join(parts)
+
+    def __repr__(self) -> str:
+        return f"RenderPlan(tokens={list(self.tokens)})"
+
+
+def _split(text: str, pattern: "re.Pattern[str]", open_: str, close: str) -> "Tuple[list[str], list[str]]":
+    """
+    Splits text into the literals and the names enclosed by open_ and close.
+    """
+    parts = pattern.split(text)
+    # A well-formed phrase alternates: literal, name, literal, ..., literal
+    delimiters = pattern.findall(text)
+    if len(parts) % 2 == 0 or any(
+        delimiter != (open_ if i % 2 == 0 else close) for i, delimiter in enumerate(delimiters)
+    ):
+        raise GrammarError(f"Unbalanced {open_}{close} in phrase: {text!r}")
+    return parts[0::2], parts[1::2]
+
+
+def compile_phrase(text: str, symbols: "Mapping[str, str]") -> RenderPlan:
+    """
+    Expands the non-terminals of a phrase and returns its render plan.
+    Leading and trailing whitespace of the phrase is removed.
+    Params:
+    - text: The phrase to compile
+    - symbols: The mapping of each non-terminal symbol to its phrase
+    Raises:
+    - GrammarError: If a symbol is undefined or cyclic, or brackets are unbalanced
+    """
+    expanded: "Dict[str, str]" = {}
+
+    def expand(phrase: str, stack: "Tuple[str, ...]") -> str:
+        literals, names = _split(phrase, SYMBOL_SPLIT, "[[", "]]")
+        result = [literals[0]]
+        for name, literal in zip(names, literals[1:]):
+            if name in stack:
+                cycle = " -> ".join(stack[stack.index(name):] + (name,))
+                raise GrammarError(f"Cyclic symbol: {cycle}")
+            if name not in expanded:
+                if name not in symbols:
+                    raise GrammarError(f"Undefined symbol: [[{name}]]")
+                expanded[name] = expand(symbols[name], stack + (name,))
+            result.append(expanded[name])
+            result.append(literal)
+        return "".join(result)
+
+    literals, tokens = _split(expand(text.strip(), ()), TOKEN_SPLIT, "{{", "}}")
+    return RenderPlan(tuple(literals), tuple(tokens))
+
+
+@functools.lru_cache(maxsize=None)
+def render_plan(text: str) -> RenderPlan:
+    """
+    Returns the render plan of a phrase of phrases.DESCRIPTIONS.
+    Plans are compiled on first use and shared for the rest of the process.
+    """
+    return compile_phrase(text, phrases.DESCRIPTIONS["symbols"])
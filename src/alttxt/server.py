@@ -0,0 +1,548 @@
+"""
+An HTTP server for generating alt text, built on asyncio and the standard library.
+
+Endpoints:
+- POST /api/alttxt/: Takes a multipart/form-data (or urlencoded) form with
+  - data: The UpSet export, usually a file upload
+  - level: The semantic level (see Level)
+  - verbosity: The verbosity (see Verbosity)
+  - explain: How much of the UpSet explanation to include (see Explanation)
+  - title: Optional title of the plot
+  - structured: Optional, "true" for the structured output of the default level
+  Responds with {"alttxt": <text or structured output>}. Missing or invalid
+  parameters and exports that cannot be parsed are answered with a 400 and
+  {"error": <message>}.
+- GET /health: Reports the number of workers and pending requests.
+
+Parsing and generation run in a bounded pool of worker processes (or threads).
+At most max_pending requests are queued for or running in the pool;
+requests beyond that are answered with a 503 and a Retry-After header
+instead of being queued without bound.
+Results are cached (see alttxt.cache), so repeated requests skip the pool.
+A sampled fraction of the generated requests can be profiled (see alttxt.profiling):
+their timings are written as JSON lines to a log.
+
+Usage: python -m alttxt.server [--host HOST] [--port PORT] [--workers N] ...
+"""
+import argparse
+import asyncio
+import email.parser
+import email.policy
+import email.utils
+import json
+import os
+import sys
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from alttxt.cache import DISK_BYTES, DISK_TTL, MEMORY_BYTES, ResultCache
+from alttxt.enums import Explanation, Level, Verbosity
+from alttxt.pipeline import ExportError, Output, generate_bytes, profile_bytes
+from alttxt.profiling import sampled
+
+API_PATH = "/api/alttxt/"
+HEALTH_PATH = "/health"
+
+# Largest request line plus headers, in bytes
+MAX_HEADER_BYTES = 64 * 1024
+# Default largest request body, in bytes
+MAX_BODY_BYTES = 32 * 1024 * 1024
+# Default seconds to wait for a request (or the next one on a kept-alive connection)
+REQUEST_TIMEOUT = 30.0
+
+Form = Dict[str, Union[str, bytes]]
+
+
+class HTTPError(Exception):
+    """
+    Ends a request with an error response.
+    - status: The HTTP status of the response
+    - message: Sent to the client as {"error": message}
+    - headers: Extra response headers
+    Errors raised while reading a request close the connection after the response.
+    """
+
+    def __init__(
+        self,
+        status: HTTPStatus,
+        message: str,
+        headers: "Optional[Dict[str, str]]" = None,
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    """
+    A parsed HTTP request.
+    """
+
+    def __init__(self, method: str, path: str, version: str, headers: "Dict[str, str]", body: bytes) -> None:
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def parse_form(content_type: str, body: bytes) -> Form:
+    """
+    Decodes the fields of a multipart/form-data or urlencoded request body.
+    File uploads are returned as bytes, every other field as a string.
+    Raises HTTPError if the body is not a form.
+    """
+    if content_type.lower().startswith("application/x-www-form-urlencoded"):
+        try:
+            fields = parse_qs(body.decode("utf-8"), keep_blank_values=True, strict_parsing=False)
+        except UnicodeDecodeError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "The form is not valid UTF-8")
+        return {name: values[-1] for name, values in fields.items()}
+
+    if not content_type.lower().startswith("multipart/form-data"):
+        raise HTTPError(
+            HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+            "Expected a multipart/form-data or application/x-www-form-urlencoded body",
+        )
+
+    header = f"Content-Type: {content_type}\r\n\r\n".encode("latin-1")
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+    if not message.is_multipart() or message.defects:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed multipart body")
+
+    form: Form = {}
+    for part in message.iter_parts():  # type: ignore[attr-defined]
+        param = part.get_param("name", header="content-disposition")
+        # Names encoded as in RFC 2231 come as (charset, language, value)
+        name = email.utils.collapse_rfc2231_value(param) if isinstance(param, tuple) else param
+        if not name:
+            continue
+        payload = part.get_payload(decode=True)
+        if not isinstance(payload, bytes):
+            payload = b""
+        if part.get_filename() is None:
+            try:
+                form[name] = payload.decode(part.get_content_charset() or "utf-8")
+            except (LookupError, UnicodeDecodeError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Field {name!r} is not valid text")
+        else:
+            form[name] = payload
+    return form
+
+
+def _choice(form: Form, name: str, choices: "List[str]", required: bool = True) -> Optional[str]:
+    """
+    Returns a text field of the form, which must be one of choices.
+    Raises HTTPError if it is missing (and required) or invalid.
+    """
+    value = form.get(name)
+    if value is None:
+        if required:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Missing required parameter: {name}")
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    if value not in choices:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid {name}: {value!r}. Expected one of {choices}")
+    return value
+
+
+def parse_params(form: Form) -> "Tuple[bytes, Level, bool, Optional[str]]":
+    """
+    Validates the parameters of a request to the API.
+    Returns the export, the level, whether the output is structured, and the title.
+    Raises HTTPError with a 400 if a parameter is missing or invalid.
+    """
+    if "data" not in form:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing required parameter: data")
+    data = form["data"]
+    raw = data if isinstance(data, bytes) else data.encode("utf-8")
+
+    level = Level(_choice(form, "level", Level.list()))  # type: ignore[arg-type]
+    # Verbosity and explain are validated for compatibility with existing clients,
+    # but every verbosity and explanation currently produces the same text
+    _choice(form, "verbosity", Verbosity.list())  # type: ignore[arg-type]
+    _choice(form, "explain", Explanation.list())  # type: ignore[arg-type]
+    structured = _choice(form, "structured", ["true", "false", "1", "0"], required=False) in ("true", "1")
+
+    title = form.get("title")
+    if isinstance(title, bytes):
+        title = title.decode("utf-8", errors="replace")
+    return raw, level, structured, title or None
+
+
+class AltTxtServer:
+    """
+    Serves the alt text API over HTTP/1.1 with keep-alive.
+    Params:
+    - host, port: The address to listen on. Port 0 picks a free port.
+    - workers: The size of the worker pool. Defaults to the number of CPUs.
+    - threads: Run the workers as threads of this process instead of processes
+    - max_body: The largest request body accepted, in bytes
+    - max_pending: The most requests queued for or running in the pool.
+      Defaults to 4 per worker.
+    - timeout: Seconds to wait for each read from a client
+    - cache: If given, the cache of results
+    - profile_rate: The fraction of generated requests to profile
+    - profile_log: Where to write the timings of profiled requests, one JSON line each.
+      Defaults to standard error.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        threads: bool = False,
+        max_body: int = MAX_BODY_BYTES,
+        max_pending: Optional[int] = None,
+        timeout: float = REQUEST_TIMEOUT,
+        cache: Optional[ResultCache] = None,
+        profile_rate: float = 0.0,
+        profile_log: Optional[TextIO] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.workers: int = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.max_body = max_body
+        self.max_pending: int = max_pending or self.workers * 4
+        self.timeout = timeout
+        self.cache = cache
+        self.profile_rate = profile_rate
+        self.profile_log = profile_log
+
+        self.pending = 0
+        self.served = 0
+        self.profiled = 0
+        self._executor: Optional[Executor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        # The tasks handling open connections, cancelled on close
+        self._connections: "set[asyncio.Task[None]]" = set()
+
+    async def start(self) -> None:
+        """
+        Starts the worker pool and begins listening.
+        If port was 0, self.port is set to the port that was picked.
+        """
+        if self.threads:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """
+        Stops listening and shuts the worker pool down.
+        """
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def serve_forever(self) -> None:
+        """
+        Serves until cancelled, starting the server if needed, then closes it.
+        """
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answers the requests of one connection until it is closed.
+        """
+        task = asyncio.current_task()
+        assert task is not None
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader, writer)
+                except HTTPError as e:
+                    await self.respond(writer, e.status, {"error": e.message}, e.headers, keep_alive=False)
+                    return
+                if request is None:
+                    return
+
+                try:
+                    status, payload, headers = await self.dispatch(request)
+                except HTTPError as e:
+                    status, payload, headers = e.status, {"error": e.message}, e.headers
+                await self.respond(writer, status, payload, headers, request.keep_alive)
+                if not request.keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[Request]:
+        """
+        Reads the next request from a connection.
+        Returns None if the client closed the connection or sent nothing before the timeout.
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Incomplete request headers")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers are too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        if version not in ("HTTP/1.0", "HTTP/1.1"):
+            raise HTTPError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED, f"Unsupported version: {version}")
+
+        headers: "Dict[str, str]" = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed header")
+            headers[name.strip().lower()] = value.strip()
+
+        if "transfer-encoding" in headers:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked requests are not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > self.max_body:
+            # The body is never read, so the connection cannot be reused
+            raise HTTPError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request body is larger than {self.max_body} bytes"
+            )
+
+        if length and headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            await writer.drain()
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.REQUEST_TIMEOUT, "Timed out reading the request body")
+
+        return Request(method.upper(), urlsplit(target).path, version, headers, body)
+
+    async def dispatch(self, request: Request) -> "Tuple[HTTPStatus, Dict[str, Any], Dict[str, str]]":
+        """
+        Routes a request and returns the status, JSON payload and extra headers of the response.
+        """
+        if request.path == HEALTH_PATH:
+            if request.method not in ("GET", "HEAD"):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET", {"Allow": "GET, HEAD"})
+            return HTTPStatus.OK, self.health(), {}
+
+        if request.path.rstrip("/") == API_PATH.rstrip("/"):
+            if request.method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST", {"Allow": "POST"})
+            return HTTPStatus.OK, {"alttxt": await self.generate(request)}, {}
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Not found: {request.path}")
+
+    async def generate(self, request: Request) -> Output:
+        """
+        Validates the parameters of an API request and generates its alt text in the worker pool.
+        """
+        if self.pending >= self.max_pending:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "The server is busy, try again later", {"Retry-After": "1"})
+        assert self._executor is not None
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            # Decoding a large upload would stall the event loop, so it is done in a thread
+            form = await loop.run_in_executor(None, parse_form, request.headers.get("content-type", ""), request.body)
+            raw, level, structured, title = parse_params(form)
+            key: Optional[str] = None
+            if self.cache is not None:
+                key = await loop.run_in_executor(None, self.cache.key, raw, level, structured, title)
+                cached = await loop.run_in_executor(None, self.cache.get, key)
+                if cached is not None:
+                    self.served += 1
+                    return cached
+            output: Output
+            if sampled(self.profile_rate):
+                output, profile = await loop.run_in_executor(
+                    self._executor, profile_bytes, raw, level, structured, title
+                )
+                self.log_profile(level, structured, len(raw), profile)
+            else:
+                output = await loop.run_in_executor(self._executor, generate_bytes, raw, level, structured, title)
+            if self.cache is not None and key is not None:
+                await loop.run_in_executor(None, self.cache.put, key, output)
+        except ExportError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Could not parse the data file: {e}")
+        except HTTPError:
+            raise
+        except Exception as e:
+            raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Failed to generate alt text: {type(e).__name__}: {e}")
+        finally:
+            self.pending -= 1
+        self.served += 1
+        return output
+
+    def log_profile(self, level: Level, structured: bool, size: int, profile: "Dict[str, Any]") -> None:
+        record = {"level": level.value, "structured": structured, "bytes": size, "profile": profile}
+        out = self.profile_log if self.profile_log is not None else sys.stderr
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        self.profiled += 1
+
+    def health(self) -> "Dict[str, Any]":
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "served": self.served,
+            "profiled": self.profiled,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    async def respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        payload: "Dict[str, Any]",
+        headers: "Dict[str, str]",
+        keep_alive: bool,
+    ) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def main(argv: "Optional[List[str]]" = None) -> int:
+    parser = argparse.ArgumentParser(prog="alttxt.server", description="Serves the alt text API over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on. Defaults to %(default)s.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on. Defaults to %(default)s.")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Number of workers. Defaults to the number of CPUs."
+    )
+    parser.add_argument("--threads", action="store_true", help="Run the workers as threads instead of processes.")
+    parser.add_argument(
+        "--max-body",
+        type=int,
+        default=MAX_BODY_BYTES,
+        help="Largest request body accepted, in bytes. Defaults to %(default)s.",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=None,
+        help="Most requests queued or running before new ones get a 503. Defaults to 4 per worker.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=REQUEST_TIMEOUT,
+        help="Seconds to wait for each read from a client. Defaults to %(default)s.",
+    )
+    parser.add_argument(
+        "--cache-memory",
+        type=int,
+        default=MEMORY_BYTES,
+        help="Bytes of results to cache in memory. 0 disables the memory cache. Defaults to %(default)s.",
+    )
+    parser.add_argument("--cache-dir", type=Path, default=None, help="Directory to also cache results in.")
+    parser.add_argument(
+        "--cache-disk-bytes",
+        type=int,
+        default=DISK_BYTES,
+        help="Bytes of results to cache in --cache-dir. Defaults to %(default)s.",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DISK_TTL,
+        help="Seconds results are kept in --cache-dir. Defaults to %(default)s.",
+    )
+    parser.add_argument(
+        "--profile-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of generated requests to profile, from 0 to 1. Defaults to %(default)s.",
+    )
+    parser.add_argument(
+        "--profile-log",
+        type=Path,
+        default=None,
+        help="File to append the timings of profiled requests to. Defaults to standard error.",
+    )
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_memory > 0 or args.cache_dir is not None:
+        cache = ResultCache(args.cache_memory, args.cache_dir, args.cache_disk_bytes, args.cache_ttl)
+    profile_log = open(args.profile_log, "a") if args.profile_log is not None else None
+    server = AltTxtServer(
+        args.host,
+        args.port,
+        args.workers,
+        args.threads,
+        args.max_body,
+        args.max_pending,
+        args.timeout,
+        cache,
+        args.profile_rate,
+        profile_log,
+    )
+
+    async def serve() -> None:
+        await server.start()
+        print(f"Serving on http://{server.host}:{server.port}{API_PATH}", file=sys.stderr)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if profile_log is not None:
+            profile_log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
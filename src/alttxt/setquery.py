@@ -0,0 +1,180 @@
+"""
+Evaluates set queries against the subsets of an UpSet plot, as the plot
+does when a set query is active: a subset matches if it is in every set
+marked Yes and in none of the sets marked No; sets marked May or not
+listed may go either way.
+
+Each query becomes a pair of membership masks, the sets it requires and
+the sets it excludes, and a subset matches when mask & required == required
+and mask & excluded == 0. Several queries are evaluated at once as a
+boolean matrix with one row per subset and one column per query, from
+which the sizes and statistics of the matches of every query are computed
+in the same pass.
+"""
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from alttxt.models import DataModel, GrammarModel, SetMembershipStatus, SetQueryModel
+from alttxt.subsettable import SubsetTable
+
+
+def query_masks(
+    query: "Mapping[str, SetMembershipStatus]", set_bit: "Callable[[str], int]"
+) -> "Optional[Tuple[int, int]]":
+    """
+    Returns the masks of the sets a query requires and excludes,
+    or None if it requires a set that is unknown, so that nothing matches.
+    Excluded sets that are unknown are ignored.
+    Params:
+    - query: The membership status of each set in the query
+    - set_bit: Returns the mask bit of a set name, or -1 if it is unknown
+    """
+    required = excluded = 0
+    for name, status in query.items():
+        if status == SetMembershipStatus.MAY:
+            continue
+        bit = set_bit(name)
+        if bit < 0:
+            if status == SetMembershipStatus.YES:
+                return None
+            continue
+        if status == SetMembershipStatus.YES:
+            required |= 1 << bit
+        else:
+            excluded |= 1 << bit
+    return required, excluded
+
+
+def match_masks(
+    masks: "npt.NDArray[Any]", queries: "Sequence[Optional[Tuple[int, int]]]"
+) -> "npt.NDArray[np.bool_]":
+    """
+    Returns a boolean matrix with one row per mask and one column per query
+    that is True where the mask matches the query.
+    Params:
+    - masks: The membership masks, a uint64 array or an object array of ints
+    - queries: The required and excluded masks of each query (see query_masks),
+      or None for queries that match nothing
+    """
+    matches = np.zeros((len(masks), len(queries)), dtype=bool)
+    valid = [(column, query) for column, query in enumerate(queries) if query is not None]
+    if not valid:
+        return matches
+    if masks.dtype == object:
+        for column, (required, excluded) in valid:
+            matches[:, column] = [int(mask) & required == required and not int(mask) & excluded for mask in masks]
+        return matches
+    columns = [column for column, _ in valid]
+    all_required = np.array([query[0] for _, query in valid], dtype=np.uint64)
+    all_excluded = np.array([query[1] for _, query in valid], dtype=np.uint64)
+    masks = masks[:, None]
+    matches[:, columns] = ((masks & all_required) == all_required) & ((masks & all_excluded) == 0)
+    return matches
+
+
+class QueryResult:
+    """
+    The subsets that match a set query, and their statistics:
+    - name: The name of the query
+    - rows: The matching rows of the table, in table order
+    - count: The number of matching subsets
+    - non_empty: The number of matching subsets with items
+    - size: The total size of the matching subsets
+    - dev: The total deviation of the matching subsets
+    - largest: The row of the largest matching subset
+      (the first in table order of equal ones), or -1 if none match
+    - median: The median size of the matching subsets, or NaN if none match
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rows: "npt.NDArray[np.intp]",
+        count: int,
+        non_empty: int,
+        size: int,
+        dev: float,
+        largest: int,
+        median: float,
+    ) -> None:
+        self.name = name
+        self.rows = rows
+        self.count = count
+        self.non_empty = non_empty
+        self.size = size
+        self.dev = dev
+        self.largest = largest
+        self.median = median
+
+    def __repr__(self) -> str:
+        return f"QueryResult({self.name!r}, {self.count} subsets, size {self.size})"
+
+
+def evaluate_queries(table: SubsetTable, queries: "Sequence[Optional[SetQueryModel]]") -> "List[QueryResult]":
+    """
+    Evaluates set queries against the subsets of a table, in one pass over the table.
+    Params:
+    - table: The subsets to query, usually DataModel.all_subset_table
+    - queries: The queries. None, or a query without Yes or No sets, matches every subset.
+    """
+    masks = [query_masks(query.query, table.set_bit) if query else (0, 0) for query in queries]
+    matches = match_masks(table.mask, masks)
+
+    count = matches.sum(axis=0, dtype=np.int64)
+    non_empty = matches[table.size > 0].sum(axis=0, dtype=np.int64)
+    size = table.size @ matches
+    dev = table.dev @ matches
+    # The largest match is the first maximum, with -1 standing in for non-matching subsets
+    largest = np.where(matches, table.size[:, None], -1).argmax(axis=0) if len(table) else np.zeros(len(queries), int)
+
+    # The median from the running count of matches in ascending size order:
+    # the first sorted positions where it passes the two middle ranks
+    median = np.full(len(queries), np.nan)
+    found = count > 0
+    if found.any():
+        order = table.sort_index.order("size")
+        sorted_sizes = table.size[order]
+        running = np.cumsum(matches[order][:, found], axis=0)
+        low = (running > (count[found] - 1)[None, :] // 2).argmax(axis=0)
+        high = (running > count[found][None, :] // 2).argmax(axis=0)
+        median[found] = (sorted_sizes[low] + sorted_sizes[high]) / 2
+
+    return [
+        QueryResult(
+            name=query.name if query else "",
+            rows=np.flatnonzero(matches[:, column]),
+            count=int(count[column]),
+            non_empty=int(non_empty[column]),
+            size=int(size[column]),
+            dev=float(dev[column]),
+            largest=int(largest[column]) if count[column] else -1,
+            median=float(median[column]),
+        )
+        for column, query in enumerate(queries)
+    ]
+
+
+def evaluate_query(table: SubsetTable, query: Optional[SetQueryModel]) -> QueryResult:
+    """
+    Evaluates one set query against the subsets of a table (see evaluate_queries).
+    """
+    return evaluate_queries(table, [query])[0]
+
+
+def with_set_query(
+    grammar: GrammarModel, data: DataModel, query: Optional[SetQueryModel]
+) -> "Tuple[GrammarModel, DataModel]":
+    """
+    Returns the grammar and data of the plot as it would be with another set query,
+    to describe it without a new export. The visible subsets are derived from all
+    subsets under the grammar with the new query (see alttxt.view.apply_grammar).
+    Params:
+    - grammar, data: The parsed export
+    - query: The set query, or None for no query
+    """
+    from alttxt.view import apply_grammar
+
+    grammar = grammar.model_copy(update={"set_query": query})
+    return grammar, apply_grammar(grammar, data)
@@ -0,0 +1,216 @@
+"""
+Binary snapshots of a parsed export (its GrammarModel and DataModel),
+keyed by a hash of the export file, so that an unchanged file is loaded
+without walking its JSON again.
+
+A snapshot is the MAGIC bytes, the length of a JSON header, the header,
+and the numeric columns of the SubsetTables as raw little-endian arrays.
+The header records the snapshot format and a fingerprint of the parser's
+source code: a snapshot written by any other version of the parser is
+ignored and rewritten.
+"""
+import functools
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from alttxt.models import DataModel, GrammarModel
+from alttxt.subsettable import SubsetTable
+
+MAGIC = b"ALTXTSNP"
+# Bump when the layout of a snapshot changes
+SNAPSHOT_FORMAT = 1
+SUFFIX = ".snap"
+
+# Snapshots are invalidated when the source of any of these modules of the package changes:
+# the parser and every module it imports, directly or not
+PARSER_MODULES = ("parser", "models", "subsettable", "jsonstream", "enums", "view", "setquery", "intersections")
+
+_HEADER_LENGTH = struct.Struct("<I")
+# Numeric SubsetTable columns stored as raw arrays, with their stored dtype
+_COLUMNS: "Tuple[Tuple[str, str], ...]" = (
+    ("size", "<i8"),
+    ("dev", "<f8"),
+    ("degree", "<i8"),
+    ("classification", "<i1"),
+)
+_TABLES = ("subset_table", "all_subset_table")
+
+
+class SnapshotError(ValueError):
+    """
+    Raised when a snapshot cannot be read or was written by another parser version.
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def parser_fingerprint() -> str:
+    """
+    Returns a hash of the snapshot format and the source of PARSER_MODULES.
+    """
+    digest = hashlib.sha256(b"%d" % SNAPSHOT_FORMAT)
+    package = Path(__file__).resolve().parent
+    for module in PARSER_MODULES:
+        digest.update((package / f"{module}.py").read_bytes())
+    return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """
+    Returns the SHA-256 of the contents of a file.
+    """
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return hashlib.sha256(b"").hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return hashlib.sha256(buf).hexdigest()
+
+
+def dumps(grammar: GrammarModel, data: DataModel, digest: str = "") -> bytes:
+    """
+    Serializes a parsed export.
+    Params:
+    - grammar, data: The parsed export
+    - digest: The hash of the export file, checked when loading
+    """
+    arrays: "List[bytes]" = []
+    offset = 0
+    tables: "Dict[str, Dict[str, Any]]" = {}
+    for table_name in _TABLES:
+        table: SubsetTable = getattr(data, table_name)
+        columns: "Dict[str, List[int]]" = {}
+        for column, dtype in _COLUMNS:
+            raw = np.ascontiguousarray(getattr(table, column), dtype=dtype).tobytes()
+            columns[column] = [offset, len(raw)]
+            arrays.append(raw)
+            offset += len(raw)
+        wide_masks: "Optional[List[str]]" = None
+        if table.mask.dtype == object:
+            # Masks of more than 64 sets do not fit in a fixed-width array
+            wide_masks = [format(mask, "x") for mask in table.mask.tolist()]
+        else:
+            raw = np.ascontiguousarray(table.mask, dtype="<u8").tobytes()
+            columns["mask"] = [offset, len(raw)]
+            arrays.append(raw)
+            offset += len(raw)
+        tables[table_name] = {
+            "length": len(table),
+            "set_names": table.set_names,
+            "names": table.name.tolist(),
+            "columns": columns,
+            "wide_masks": wide_masks,
+        }
+
+    header = json.dumps({
+        "format": SNAPSHOT_FORMAT,
+        "fingerprint": parser_fingerprint(),
+        "digest": digest,
+        "grammar": grammar.model_dump(mode="json"),
+        "data": {
+            "count": data.count,
+            "sets": data.sets,
+            "sizes": data.sizes,
+            "all_sets_length": data.all_sets_length,
+        },
+        "tables": tables,
+    }).encode()
+    # Arrays start at a multiple of 8 bytes
+    padding = b" " * (-(len(MAGIC) + _HEADER_LENGTH.size + len(header)) % 8)
+    return b"".join([MAGIC, _HEADER_LENGTH.pack(len(header) + len(padding)), header, padding, *arrays])
+
+
+def loads(raw: bytes, digest: Optional[str] = None) -> "Tuple[GrammarModel, DataModel]":
+    """
+    Deserializes a snapshot written by dumps.
+    Params:
+    - raw: The snapshot
+    - digest: If given, the hash the export file must have had
+    Raises SnapshotError if the snapshot is corrupt, was written by another
+    version of the parser, or is of another file.
+    """
+    if raw[:len(MAGIC)] != MAGIC:
+        raise SnapshotError("Not a snapshot")
+    try:
+        (header_length,) = _HEADER_LENGTH.unpack_from(raw, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(raw[start:start + header_length])
+    except (struct.error, ValueError) as e:
+        raise SnapshotError(f"Corrupt snapshot header: {e}")
+    if header.get("format") != SNAPSHOT_FORMAT or header.get("fingerprint") != parser_fingerprint():
+        raise SnapshotError("Snapshot was written by another version of the parser")
+    if digest is not None and header.get("digest") != digest:
+        raise SnapshotError("Snapshot is of another file")
+
+    body = start + header_length
+    try:
+        tables: "Dict[str, SubsetTable]" = {}
+        for table_name in _TABLES:
+            table = header["tables"][table_name]
+            columns = {}
+            for column, dtype in _COLUMNS + (("mask", "<u8"),):
+                if column not in table["columns"]:
+                    continue
+                offset, size = table["columns"][column]
+                if body + offset + size > len(raw):
+                    raise SnapshotError("Truncated snapshot")
+                columns[column] = np.frombuffer(raw, dtype=dtype, count=table["length"], offset=body + offset)
+            masks = columns["mask"] if table["wide_masks"] is None else [int(mask, 16) for mask in table["wide_masks"]]
+            tables[table_name] = SubsetTable(
+                table["names"],
+                columns["size"],
+                columns["dev"],
+                columns["degree"],
+                columns["classification"],
+                masks,
+                table["set_names"],
+            )
+        grammar = GrammarModel.model_validate(header["grammar"])
+        data = DataModel(
+            **header["data"], subset_table=tables["subset_table"], all_subset_table=tables["all_subset_table"]
+        )
+    except SnapshotError:
+        raise
+    except Exception as e:
+        raise SnapshotError(f"Corrupt snapshot: {type(e).__name__}: {e}")
+    return grammar, data
+
+
+class SnapshotStore:
+    """
+    A directory of snapshots, one per export file content.
+    Params:
+    - directory: Where snapshots are stored. Created if it does not exist.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        return self.directory / (digest + SUFFIX)
+
+    def load(self, digest: str) -> "Optional[Tuple[GrammarModel, DataModel]]":
+        """
+        Returns the parsed export with the given file hash,
+        or None if there is no usable snapshot of it.
+        """
+        try:
+            return loads(self.path(digest).read_bytes(), digest)
+        except (FileNotFoundError, SnapshotError):
+            return None
+
+    def save(self, digest: str, grammar: GrammarModel, data: DataModel) -> None:
+        """
+        Writes the snapshot of a parsed export, replacing any older one.
+        """
+        path = self.path(digest)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}")
+        temporary.write_bytes(dumps(grammar, data, digest))
+        os.replace(temporary, path)
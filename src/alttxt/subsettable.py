@@ -0,0 +1,381 @@
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+import numpy as np
+import numpy.typing as npt
+
+from alttxt.enums import IntersectionType
+
+# Classification codes stored in SubsetTable.classification index into this list
+CLASSIFICATIONS: "list[IntersectionType]" = list(IntersectionType)
+CLASSIFICATION_CODES: "dict[IntersectionType, int]" = {
+    classification: code for code, classification in enumerate(CLASSIFICATIONS)
+}
+
+# Membership masks fit in a uint64 array up to this many sets;
+# beyond that, Python ints are stored in an object array instead
+MAX_UINT64_SETS = 64
+
+# Number of bits set in each possible byte, for counting the bits of uint64 masks
+BYTE_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+class SubsetTable:
+    """
+    Columnar storage for the subsets (intersections) of an UpSet plot.
+    Each subset is one row; its fields are stored in aligned NumPy arrays:
+    - name: The display name of the subset
+    - size: The number of items in the subset
+    - dev: The deviation of the subset, rounded to 2 decimals
+    - degree: The number of sets in the intersection
+    - classification: The code of the IntersectionType of the subset
+      (an index into CLASSIFICATIONS)
+    - mask: A bitmask of the sets the subset belongs to, where bit i
+      stands for set_names[i]
+    Set membership queries (contains_set, contains_all, popcount, set_counts)
+    are answered from the masks without any string operations.
+    Code that still expects Subset objects can iterate the `subsets` view.
+    """
+
+    def __init__(
+        self,
+        names: "Union[Sequence[str], npt.NDArray[np.str_]]",
+        sizes: "Union[Sequence[int], npt.NDArray[np.integer[Any]]]",
+        devs: "Union[Sequence[float], npt.NDArray[np.floating[Any]]]",
+        degrees: "Union[Sequence[int], npt.NDArray[np.integer[Any]]]",
+        classifications: "Union[Sequence[int], npt.NDArray[np.integer[Any]]]",
+        masks: "Union[Sequence[int], npt.NDArray[Any]]",
+        set_names: "Sequence[str]",
+    ) -> None:
+        """
+        Params:
+        - names, sizes, devs, degrees, classifications, masks:
+          One entry per subset, as described in the class docstring,
+          as sequences or arrays
+        - set_names: The name of the set for each bit of the masks
+        """
+        self.set_names: "list[str]" = list(set_names)
+        self.name: "npt.NDArray[np.str_]" = np.array(names, dtype=str)
+        self.size: "npt.NDArray[np.int64]" = np.array(sizes, dtype=np.int64)
+        self.dev: "npt.NDArray[np.float64]" = np.array(devs, dtype=np.float64)
+        self.degree: "npt.NDArray[np.int64]" = np.array(degrees, dtype=np.int64)
+        self.classification: "npt.NDArray[np.int8]" = np.array(classifications, dtype=np.int8)
+        # uint64, or object (Python ints) beyond MAX_UINT64_SETS sets
+        self.mask: "npt.NDArray[Any]" = np.array(
+            masks, dtype=np.uint64 if len(self.set_names) <= MAX_UINT64_SETS else object
+        )
+
+        # Columns are shared with views and caches, so they are read-only
+        for column in (self.name, self.size, self.dev, self.degree, self.classification, self.mask):
+            column.flags.writeable = False
+
+        self._view: Optional[SubsetView] = None
+        self._bits: "Optional[dict[str, int]]" = None
+        self._sort_index: Optional[SortIndex] = None
+
+    @classmethod
+    def from_subsets(cls, subsets: "Sequence[Any]", set_names: "Optional[Sequence[str]]" = None) -> "SubsetTable":
+        """
+        Builds a table from a sequence of Subset objects.
+        Params:
+        - subsets: The Subset objects, in row order
+        - set_names: The name of the set for each mask bit. Defaults to the
+          set names found in the subsets' setMembership, in order of appearance.
+        """
+        names: "list[str]" = list(set_names) if set_names is not None else []
+        for subset in subsets:
+            names.extend(name for name in subset.setMembership if name not in names)
+        bits = {name: bit for bit, name in enumerate(names)}
+
+        return cls(
+            names=[subset.name for subset in subsets],
+            sizes=[subset.size for subset in subsets],
+            devs=[subset.dev for subset in subsets],
+            degrees=[subset.degree for subset in subsets],
+            classifications=[CLASSIFICATION_CODES[subset.classification] for subset in subsets],
+            masks=[sum(1 << bits[name] for name in subset.setMembership) for subset in subsets],
+            set_names=names,
+        )
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SubsetTable):
+            return NotImplemented
+        return (
+            self.set_names == other.set_names
+            and np.array_equal(self.name, other.name)
+            and np.array_equal(self.size, other.size)
+            and np.array_equal(self.dev, other.dev)
+            and np.array_equal(self.degree, other.degree)
+            and np.array_equal(self.classification, other.classification)
+            and np.array_equal(self.mask, other.mask)
+        )
+
+    def __repr__(self) -> str:
+        return f"SubsetTable({len(self)} subsets, {len(self.set_names)} sets)"
+
+    @property
+    def subsets(self) -> "SubsetView":
+        """
+        A read-only sequence of Subset objects backed by this table.
+        """
+        if self._view is None:
+            self._view = SubsetView(self)
+        return self._view
+
+    @property
+    def sort_index(self) -> "SortIndex":
+        """
+        The order-statistics index of this table, shared by every consumer.
+        """
+        if self._sort_index is None:
+            self._sort_index = SortIndex(self)
+        return self._sort_index
+
+    def membership(self, row: int) -> "set[str]":
+        """
+        Returns the names of the sets that the subset in the given row belongs to.
+        """
+        return set(self.member_names(row))
+
+    def member_names(self, row: int) -> "list[str]":
+        """
+        Returns the names of the sets that the subset in the given row belongs to,
+        in set order.
+        """
+        mask = int(self.mask[row])
+        return [name for bit, name in enumerate(self.set_names) if mask >> bit & 1]
+
+    def set_bit(self, set_name: str) -> int:
+        """
+        Returns the mask bit of a set, or -1 if the set is unknown.
+        Set names are looked up as given, and then with underscores replaced
+        by hyphens, as they are in the names of visible subsets.
+        """
+        if self._bits is None:
+            self._bits = {name: bit for bit, name in enumerate(self.set_names)}
+        bit = self._bits.get(set_name)
+        if bit is None:
+            bit = self._bits.get(set_name.replace("_", "-"), -1)
+        return bit
+
+    def set_mask(self, set_names: "Iterable[str]") -> "Optional[int]":
+        """
+        Returns the mask with the bits of all of the given sets,
+        or None if any of the sets is unknown.
+        """
+        mask = 0
+        for set_name in set_names:
+            bit = self.set_bit(set_name)
+            if bit < 0:
+                return None
+            mask |= 1 << bit
+        return mask
+
+    def contains_set(self, set_name: str) -> "npt.NDArray[np.bool_]":
+        """
+        Returns a boolean array that is True for the subsets that belong to the given set.
+        """
+        return self.contains_all([set_name])
+
+    def contains_all(self, set_names: "Iterable[str]") -> "npt.NDArray[np.bool_]":
+        """
+        Returns a boolean array that is True for the subsets that belong to
+        all of the given sets. Unknown sets match no subsets.
+        """
+        mask = self.set_mask(set_names)
+        if mask is None:
+            return np.zeros(len(self), dtype=bool)
+        if self.mask.dtype == object:
+            return np.array([int(row) & mask == mask for row in self.mask], dtype=bool)
+        required = np.uint64(mask)
+        matches: "npt.NDArray[np.bool_]" = (self.mask & required) == required
+        return matches
+
+    def popcount(self) -> "npt.NDArray[np.int64]":
+        """
+        Returns the number of sets each subset belongs to,
+        which is its degree when computed from the masks.
+        """
+        if self.mask.dtype == object:
+            return np.array([bin(int(row)).count("1") for row in self.mask], dtype=np.int64)
+        byte_counts = BYTE_POPCOUNT[self.mask.view(np.uint8)]
+        counts: "npt.NDArray[np.int64]" = byte_counts.reshape(len(self), 8).sum(axis=1, dtype=np.int64)
+        return counts
+
+    def set_counts(self, rows: "Optional[npt.NDArray[Any]]" = None) -> "npt.NDArray[np.int64]":
+        """
+        Returns the number of subsets that belong to each set, in set order.
+        Params:
+        - rows: A boolean array or index array selecting the subsets to count.
+          Defaults to all subsets.
+        """
+        masks = self.mask if rows is None else self.mask[rows]
+        if self.mask.dtype == object:
+            return np.array(
+                [sum(int(row) >> bit & 1 for row in masks) for bit in range(len(self.set_names))],
+                dtype=np.int64,
+            )
+        bits = np.arange(len(self.set_names), dtype=np.uint64)
+        counts: "npt.NDArray[np.int64]" = ((masks[:, None] >> bits) & np.uint64(1)).sum(axis=0, dtype=np.int64)
+        return counts
+
+
+class SortIndex:
+    """
+    Sorted orders and ranks of the rows of a SubsetTable.
+    Orders are computed once per column and direction, on first use,
+    and match Python's stable sorted(): rows with equal values keep
+    their table order in both directions.
+    """
+
+    # Columns that can be sorted by; these match the values of SubsetField
+    COLUMNS = ("name", "size", "dev", "degree")
+
+    def __init__(self, table: SubsetTable) -> None:
+        self.table: SubsetTable = table
+        self._orders: "dict[Tuple[str, bool], npt.NDArray[np.intp]]" = {}
+        self._ranks: "dict[Tuple[str, bool], npt.NDArray[np.intp]]" = {}
+
+    def _column(self, field: Any) -> str:
+        # Accepts a SubsetField or its value
+        column = getattr(field, "value", field)
+        if column not in SortIndex.COLUMNS:
+            raise ValueError(f"Cannot sort subsets by {column!r}")
+        return str(column)
+
+    def order(self, field: Any, descending: bool = False) -> "npt.NDArray[np.intp]":
+        """
+        Returns the rows of the table sorted by a column.
+        Params:
+        - field: The column to sort by, as a SubsetField or its value
+        - descending: Whether to sort in descending order
+        """
+        key = (self._column(field), descending)
+        if key not in self._orders:
+            values = getattr(self.table, key[0])
+            # Ranking the distinct values first lets strings sort in
+            # descending order while keeping equal rows stable
+            _, codes = np.unique(values, return_inverse=True)
+            codes = codes.reshape(-1)
+            order = np.argsort(-codes if descending else codes, kind="stable")
+            order.flags.writeable = False
+            self._orders[key] = order
+        return self._orders[key]
+
+    def rank(self, field: Any, descending: bool = False) -> "npt.NDArray[np.intp]":
+        """
+        Returns the position of each row of the table in order(field, descending).
+        """
+        key = (self._column(field), descending)
+        if key not in self._ranks:
+            order = self.order(field, descending)
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            rank.flags.writeable = False
+            self._ranks[key] = rank
+        return self._ranks[key]
+
+    def top(self, field: Any, k: int, descending: bool = True) -> "npt.NDArray[np.intp]":
+        """
+        Returns the first k rows by a column, largest first by default.
+        """
+        return self.order(field, descending)[:k]
+
+    def values(self, field: Any, descending: bool = False) -> "npt.NDArray[Any]":
+        """
+        Returns the values of a column in sorted order.
+        """
+        values: "npt.NDArray[Any]" = getattr(self.table, self._column(field))[self.order(field, descending)]
+        return values
+
+    def percentile(self, field: Any, perc: float) -> Any:
+        """
+        Returns the value of a column at the given percentile (0-100),
+        taking the value at index int(n * perc / 100) in ascending order.
+        """
+        values = self.values(field)
+        return values[int(len(values) * perc / 100)].item()
+
+    def median(self, field: Any) -> float:
+        """
+        Returns the median of a numeric column,
+        averaging the two middle values for an even number of rows.
+        """
+        values = self.values(field)
+        mid = len(values) // 2
+        if len(values) % 2 == 0:
+            return (float(values[mid - 1]) + float(values[mid])) / 2
+        return float(values[mid])
+
+    def first(self, field: Any, where: "npt.NDArray[np.bool_]", descending: bool = True) -> int:
+        """
+        Returns the position in order(field, descending) of the first row
+        selected by the boolean array `where`, or -1 if no row is selected.
+        """
+        ranks = self.rank(field, descending)[where]
+        return int(ranks.min()) if len(ranks) else -1
+
+
+class SubsetView(Sequence[Any]):
+    """
+    Compatibility view that presents the rows of a SubsetTable as Subset objects.
+    Subset objects are only built for the rows that are accessed, and are cached.
+    """
+
+    def __init__(self, table: SubsetTable) -> None:
+        self.table: SubsetTable = table
+        self._cache: "List[Optional[Any]]" = [None] * len(table)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "list[Any]": ...
+
+    def __getitem__(self, index: "Union[int, slice]") -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("SubsetView index out of range")
+
+        subset = self._cache[index]
+        if subset is None:
+            subset = self._build(index)
+            self._cache[index] = subset
+        return subset
+
+    def __iter__(self) -> "Iterator[Any]":
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SubsetView):
+            return self.table == other.table
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"SubsetView({list(self)!r})"
+
+    def _build(self, row: int) -> Any:
+        # Imported here since models depends on this module
+        from alttxt.models import Subset
+
+        table = self.table
+        return Subset.model_construct(
+            name=str(table.name[row]),
+            size=int(table.size[row]),
+            dev=float(table.dev[row]),
+            degree=int(table.degree[row]),
+            classification=CLASSIFICATIONS[table.classification[row]],
+            setMembership=table.membership(row),
+        )
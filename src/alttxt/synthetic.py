@@ -0,0 +1,354 @@
+"""
+Generates synthetic UpSet exports, in the schema the Parser reads, with
+controllable numbers of sets, items and intersections, for scaling studies.
+
+The visible intersections are drawn first: as many distinct
+combinations of visible sets as asked for, whose degrees follow a Poisson distribution
+around mean_degree and whose sets are picked in proportion to a Zipf
+popularity (set_skew). Items are then spread over the intersections with
+Zipf weights (size_skew), after giving each intersection one item, and
+a fraction of the items (empty_fraction) is in no visible set. Hidden sets
+are filled independently of the visible ones.
+
+Everything in the export is then derived from the items, as UpSet would:
+set sizes, the intersections with their sizes, degrees, deviations and
+attribute statistics (filtered by degree and sorted as the grammar says),
+rawData with every item and set, and optionally bookmarks, a row selection
+and a set query.
+
+Usage: python -m alttxt.synthetic --sets 40 --items 100000 --intersections 50000 -o export.json
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+import numpy.typing as npt
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from alttxt.enums import SortBy, SortOrder
+from alttxt.intersections import attribute_stats, element_name
+
+# The most visible sets supported, since memberships are packed into 64-bit masks
+MAX_VISIBLE_SETS = 63
+
+
+def set_names(count: int) -> "List[str]":
+    """
+    Returns the names of count sets, as they appear in allSets.
+    """
+    width = len(str(count))
+    return [f"Set_S{index + 1:0{width}d}" for index in range(count)]
+
+
+def draw_masks(
+    rng: np.random.Generator, visible: int, count: int, mean_degree: float, set_skew: float
+) -> "npt.NDArray[np.uint64]":
+    """
+    Returns count distinct non-empty masks of visible sets, or every mask if there are fewer.
+    """
+    possible = 2**visible - 1
+    if count >= possible:
+        return np.arange(1, possible + 1, dtype=np.uint64)
+    if possible <= 4 * count:
+        return rng.choice(possible, count, replace=False).astype(np.uint64) + np.uint64(1)
+
+    popularity = 1.0 / np.arange(1, visible + 1) ** set_skew
+    popularity /= popularity.sum()
+    bits = np.left_shift(np.uint64(1), np.arange(visible, dtype=np.uint64))
+    masks = np.empty(0, dtype=np.uint64)
+    while len(masks) < count:
+        batch = count - len(masks) + 1024
+        degrees = np.clip(rng.poisson(max(mean_degree - 1, 0), batch) + 1, 1, visible)
+        # Weighted sampling without replacement: the sets with the smallest
+        # exponential keys, scaled by popularity, are the members
+        keys = rng.exponential(size=(batch, visible)) / popularity
+        ranks = keys.argsort(axis=1).argsort(axis=1)
+        drawn = np.bitwise_or.reduce(np.where(ranks < degrees[:, None], bits, np.uint64(0)), axis=1)
+        # Keep the first occurrence of each new mask, in the order drawn
+        combined = np.concatenate((masks, drawn))
+        _, first = np.unique(combined, return_index=True)
+        masks = combined[np.sort(first)]
+    return masks[:count]
+
+
+def synthetic_export(
+    sets: int = 8,
+    visible_sets: Optional[int] = None,
+    items: int = 1000,
+    intersections: int = 50,
+    attributes: int = 2,
+    mean_degree: float = 2.0,
+    size_skew: float = 1.0,
+    set_skew: float = 0.5,
+    empty_fraction: float = 0.05,
+    sort_by: SortBy = SortBy.SIZE,
+    sort_order: SortOrder = SortOrder.DESCENDING,
+    min_degree: int = 0,
+    max_degree: Optional[int] = None,
+    hide_no_set: bool = False,
+    bookmarks: int = 0,
+    selection: bool = False,
+    set_query: bool = False,
+    raw_data: bool = True,
+    seed: int = 0,
+) -> "Dict[str, Any]":
+    """
+    Returns a synthetic UpSet export, ready to be written as JSON.
+    Params:
+    - sets: The number of sets in allSets
+    - visible_sets: The number of those that are visible. Defaults to all of them,
+      up to MAX_VISIBLE_SETS.
+    - items: The number of items
+    - intersections: The number of distinct non-empty combinations of visible sets
+      the items are spread over. There are fewer if items or the possible
+      combinations are fewer.
+    - attributes: The number of numeric attributes of each item
+    - mean_degree: The mean number of sets in an intersection
+    - size_skew: The Zipf exponent of the intersection sizes. 0 makes them all alike.
+    - set_skew: The Zipf exponent of how often each set appears in intersections
+    - empty_fraction: The fraction of items in no visible set
+    - sort_by, sort_order: How the intersections are sorted
+    - min_degree, max_degree: The degree filters. Intersections outside of them
+      are left out of processedData. max_degree defaults to the number of visible sets.
+    - hide_no_set: Whether the empty intersection is left out of processedData
+    - bookmarks: The number of intersections to bookmark, the largest ones
+    - selection: Whether the largest intersection is selected
+    - set_query: Whether to add a set query requiring the first visible set
+    - raw_data: Whether to include rawData. The parser skips it, but it makes
+      up most of a real export.
+    - seed: The seed of the random generator. The same parameters and seed
+      always give the same export.
+    Raises ValueError if the parameters are out of range.
+    """
+    visible_sets = min(sets, MAX_VISIBLE_SETS) if visible_sets is None else visible_sets
+    if not 1 <= visible_sets <= min(sets, MAX_VISIBLE_SETS):
+        raise ValueError(f"visible_sets must be between 1 and {min(sets, MAX_VISIBLE_SETS)}")
+    if items < 1 or intersections < 1:
+        raise ValueError("items and intersections must be positive")
+    max_degree = visible_sets if max_degree is None else max_degree
+    rng = np.random.default_rng(seed)
+
+    names = set_names(sets)
+    short_names = [name[len("Set_"):] for name in names]
+    visible_names = short_names[:visible_sets]
+    attribute_names = [f"Attr{index + 1}" for index in range(attributes)]
+
+    # Assign items to intersections: one each, then the rest by Zipf weights
+    patterns = draw_masks(rng, visible_sets, intersections, mean_degree, set_skew)
+    rng.shuffle(patterns)
+    empty_items = int(items * empty_fraction)
+    assigned = items - empty_items
+    seeded = min(assigned, len(patterns))
+    weights = 1.0 / np.arange(1, len(patterns) + 1) ** size_skew
+    choice = np.concatenate((
+        np.arange(seeded),
+        rng.choice(len(patterns), assigned - seeded, p=weights / weights.sum()),
+    ))
+    masks = np.concatenate((patterns[choice], np.zeros(empty_items, dtype=np.uint64)))
+    rng.shuffle(masks)
+
+    # Membership of every item in every set
+    bits = np.arange(visible_sets, dtype=np.uint64)
+    membership = np.empty((items, sets), dtype=bool)
+    membership[:, :visible_sets] = (masks[:, None] >> bits) & np.uint64(1) == 1
+    if sets > visible_sets:
+        hidden_rates = rng.uniform(0.01, 0.3, sets - visible_sets)
+        membership[:, visible_sets:] = rng.random((items, sets - visible_sets)) < hidden_rates
+    set_sizes = membership.sum(axis=0)
+    values = rng.normal(50.0, 15.0, (items, attributes)).round(2)
+
+    # The intersections of the visible sets, as UpSet computes them
+    unique_masks, groups, sizes = np.unique(masks, return_inverse=True, return_counts=True)
+    unique_members = (unique_masks[:, None] >> bits) & np.uint64(1) == 1
+    degrees = unique_members.sum(axis=1)
+    rates = set_sizes[:visible_sets] / items
+    expected = np.where(unique_members, rates, 1 - rates).prod(axis=1)
+    deviations = (sizes / items - expected) * 100
+    stats = [
+        {name: column.tolist() for name, column in attribute_stats(groups, values[:, index], len(unique_masks)).items()}
+        for index in range(attributes)
+    ]
+
+    key_values = {SortBy.SIZE: sizes, SortBy.DEGREE: degrees, SortBy.DEVIATION: deviations}[sort_by]
+    # Ties are broken by size, largest first
+    order = np.lexsort((-sizes, key_values if sort_order == SortOrder.ASCENDING else -key_values))
+    keep = (degrees >= min_degree) & (degrees <= max_degree)
+    if hide_no_set:
+        keep &= degrees > 0
+
+    item_ids = [f"items/{index}" for index in range(items)]
+    group_items: "List[List[str]]" = [[] for _ in unique_masks]
+    for item_id, group in zip(item_ids, groups.tolist()):
+        group_items[group].append(item_id)
+
+    processed: "Dict[str, Any]" = {}
+    accessible: "Dict[str, Any]" = {}
+    for index in order.tolist():
+        if not keep[index]:
+            continue
+        members = [name for name, member in zip(visible_names, unique_members[index].tolist()) if member]
+        subset_id = "Subset_" + ("~&~".join(members) if members else "Unincluded")
+        membership_values = {
+            "Set_" + name: "Yes" if member else "No"
+            for name, member in zip(visible_names, unique_members[index].tolist())
+        }
+        subset_attributes: "Dict[str, Any]" = {
+            name: {stat: column[index] for stat, column in stats[attribute].items()}
+            for attribute, name in enumerate(attribute_names)
+        }
+        subset_attributes["deviation"] = float(deviations[index])
+        processed[subset_id] = {
+            "id": subset_id,
+            "elementName": element_name(members),
+            "items": group_items[index],
+            "size": int(sizes[index]),
+            "type": "Subset",
+            "setMembership": membership_values,
+            "attributes": subset_attributes,
+        }
+        accessible[subset_id] = {
+            "elementName": element_name(members),
+            "type": "Subset",
+            "size": int(sizes[index]),
+            "attributes": subset_attributes,
+            "degree": int(degrees[index]),
+            "setMembership": membership_values,
+        }
+
+    largest = sorted(processed.values(), key=lambda subset: -subset["size"])
+    export: "Dict[str, Any]" = {
+        "version": "0.1.4",
+        "plotInformation": {"description": "synthetic data", "sets": "groups", "items": "items"},
+        "horizontal": False,
+        "firstAggregateBy": "None",
+        "firstOverlapDegree": 2,
+        "secondAggregateBy": "None",
+        "secondOverlapDegree": 2,
+        "sortVisibleBy": "Alphabetical",
+        "sortBy": sort_by.value.capitalize(),
+        "sortByOrder": sort_order.value.capitalize(),
+        "filters": {"maxVisible": max_degree, "minVisible": min_degree, "hideEmpty": True, "hideNoSet": hide_no_set},
+        "visibleSets": names[:visible_sets],
+        "visibleAttributes": ["Deviation", *attribute_names],
+        "bookmarks": [
+            {"id": subset["id"], "label": subset["elementName"], "size": subset["size"], "colorIndex": index}
+            for index, subset in enumerate(largest[:bookmarks])
+        ],
+        "collapsed": [],
+        "plots": {"scatterplots": [], "histograms": []},
+        "allSets": [{"name": name, "size": int(size)} for name, size in zip(names, set_sizes.tolist())],
+        "processedData": {"values": processed, "order": list(processed)},
+        "accessibleProcessedData": {"values": accessible},
+    }
+    if selection and largest:
+        export["rowSelection"] = {key: largest[0][key] for key in ("id", "elementName", "items")}
+        export["selectionType"] = "row"
+    if set_query:
+        query = {"Set_" + name: "May" for name in visible_names}
+        query["Set_" + visible_names[0]] = "Yes"
+        export["setQuery"] = {"name": "Query", "query": query}
+    if raw_data:
+        export["rawData"] = raw_data_block(short_names, attribute_names, item_ids, membership, values)
+    return export
+
+
+def raw_data_block(
+    short_names: "List[str]",
+    attribute_names: "List[str]",
+    item_ids: "List[str]",
+    membership: "npt.NDArray[np.bool_]",
+    values: "npt.NDArray[np.float64]",
+) -> "Dict[str, Any]":
+    """
+    Returns the rawData of an export: every item with its set columns and attributes,
+    and every set with its items.
+    """
+    flags = membership.astype(np.int8).tolist()
+    attribute_values = values.tolist()
+    raw_items = {}
+    for index, item_id in enumerate(item_ids):
+        item: "Dict[str, Any]" = {"_id": item_id, "_label": f"Item {index}", "_key": str(index), "Name": f"Item {index}"}
+        item.update(zip(short_names, flags[index]))
+        item.update(zip(attribute_names, attribute_values[index]))
+        raw_items[item_id] = item
+    raw_sets = {}
+    for column, name in enumerate(short_names):
+        members = np.flatnonzero(membership[:, column]).tolist()
+        raw_sets["Set_" + name] = {
+            "id": "Set_" + name,
+            "elementName": name,
+            "items": [item_ids[index] for index in members],
+            "type": "Set",
+            "size": len(members),
+        }
+    column_types = {name: "boolean" for name in short_names}
+    column_types.update({name: "number" for name in attribute_names})
+    column_types["Name"] = "label"
+    return {
+        "label": "Name",
+        "setColumns": short_names,
+        "attributeColumns": attribute_names,
+        "columns": ["Name", *short_names, *attribute_names],
+        "columnTypes": column_types,
+        "items": raw_items,
+        "sets": raw_sets,
+    }
+
+
+def main(argv: "Optional[List[str]]" = None) -> int:
+    parser = argparse.ArgumentParser(prog="alttxt.synthetic", description="Writes a synthetic UpSet export.")
+    parser.add_argument("--sets", type=int, default=8, help="Number of sets. Defaults to %(default)s.")
+    parser.add_argument("--visible-sets", type=int, default=None, help="Number of visible sets. Defaults to all.")
+    parser.add_argument("--items", type=int, default=1000, help="Number of items. Defaults to %(default)s.")
+    parser.add_argument(
+        "--intersections", type=int, default=50, help="Number of non-empty intersections. Defaults to %(default)s."
+    )
+    parser.add_argument("--attributes", type=int, default=2, help="Number of attributes. Defaults to %(default)s.")
+    parser.add_argument("--mean-degree", type=float, default=2.0, help="Mean intersection degree.")
+    parser.add_argument("--size-skew", type=float, default=1.0, help="Zipf exponent of intersection sizes.")
+    parser.add_argument(
+        "--sort-by", type=lambda value: SortBy(value.lower()), choices=list(SortBy), default=SortBy.SIZE
+    )
+    parser.add_argument(
+        "--sort-order", type=lambda value: SortOrder(value.lower()), choices=list(SortOrder), default=SortOrder.DESCENDING
+    )
+    parser.add_argument("--bookmarks", type=int, default=0, help="Number of intersections to bookmark.")
+    parser.add_argument("--selection", action="store_true", help="Select the largest intersection.")
+    parser.add_argument("--set-query", action="store_true", help="Add a set query.")
+    parser.add_argument("--no-raw-data", action="store_true", help="Leave out rawData.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed. Defaults to %(default)s.")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="File to write. Defaults to standard output.")
+    args = parser.parse_args(argv)
+
+    try:
+        export = synthetic_export(
+            sets=args.sets,
+            visible_sets=args.visible_sets,
+            items=args.items,
+            intersections=args.intersections,
+            attributes=args.attributes,
+            mean_degree=args.mean_degree,
+            size_skew=args.size_skew,
+            sort_by=args.sort_by,
+            sort_order=args.sort_order,
+            bookmarks=args.bookmarks,
+            selection=args.selection,
+            set_query=args.set_query,
+            raw_data=not args.no_raw_data,
+            seed=args.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if args.output is not None:
+        with open(args.output, "w") as out:
+            json.dump(export, out)
+    else:
+        json.dump(export, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,41 @@
-from typing import Any, Callable, List, Tuple, Union, Optional
+from typing import TYPE_CHECKING, Any, Callable, Iterable, List, Mapping, Tuple, Union, Optional
 from alttxt.models import DataModel, GrammarModel, SetMembershipStatus, Subset
-from alttxt.enums import SubsetField, IndividualSetSize, IntersectionTrend
-import statistics
-from alttxt.regionclass import *
+from alttxt.subsettable import SortIndex
+from alttxt.enums import AggregateBy, SubsetField, IndividualSetSize
+from alttxt.dependencies import DATA, HELPER_INPUTS, SUBSETS, VIEW_FIELDS, stale_tokens
 import math
-from collections import Counter
+import functools
 import numpy as np
-from scipy import stats
-from scipy.optimize import curve_fit
+
+# Only needed by the tokens of trends and size regions, so imported when those are computed
+if TYPE_CHECKING:
+    from alttxt.aggregation import AggregateTable
+    from alttxt.profiling import Profile
+    from alttxt.regionclass import RegionClassification
+
+
+class Lazy:
+    """
+    A token value that is computed on the first lookup of its token.
+    Once computed, it is treated like a value placed directly in the map.
+    """
+
+    def __init__(self, compute: Callable[[], Any]) -> None:
+        self.compute: Callable[[], Any] = compute
+
+
+def memoized(method: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """
+    Caches the result of a TokenMap helper that takes no arguments,
+    since several tokens are built from the same helpers.
+    """
+    @functools.wraps(method)
+    def wrapper(self: "TokenMap") -> Any:
+        if method.__name__ not in self.memo:
+            self.memo[method.__name__] = method(self)
+        return self.memo[method.__name__]
+
+    return wrapper
 
 
 class TokenMap:
@@ -25,28 +53,51 @@ class TokenMap:
     TRUNCATION_LENGTH = 19  # Global constant for truncation length
 
     def __init__(
-        self, data: DataModel, grammar: GrammarModel, title: Optional[str] = None
+        self,
+        data: DataModel,
+        grammar: GrammarModel,
+        title: Optional[str] = None,
+        tokens: "Optional[Iterable[str]]" = None,
+        profile: "Optional[Profile]" = None,
     ) -> None:
         """
         Initialize the Grammar class. Note that internal values
-        are not recomputed if the data or grammar are changed.
+        are not recomputed if the data or grammar are assigned;
+        apply new ones with update instead.
         Params:
             data: Imported from a data file generated by Upset
             grammar: Imported from a grammar file generated by Upset
             title: The title of the plot, if any
+            tokens: If given, only these tokens are mapped, e.g. the tokens
+                reachable from a Level (see alttxt.dependencies).
+                All other tokens are left unsubstituted.
+            profile: If given, the time spent computing each token is recorded in it
         """
         self.data: DataModel = data
         self.grammar: GrammarModel = grammar
         self.title: Optional[str] = title
+        self.profile: "Optional[Profile]" = profile
+        self.tokens: "Optional[List[str]]" = list(tokens) if tokens is not None else None
+
+        # Results of memoized helpers, by helper name
+        self.memo: dict[str, Any] = {}
+        # Results of get_token, by token
+        self.resolved: dict[str, Any] = {}
 
+        self.map: dict[str, Union[str, float, int, Lazy, Callable[[], Any]]] = self.build_map()
+
+    def build_map(self) -> "dict[str, Union[str, float, int, Lazy, Callable[[], Any]]]":
+        """
+        Returns the mapping of tokens to their values, restricted to self.tokens if given.
+        """
         # This defines the mapping of tokens to strings/functions
         # As with the rest of this class, the curly braces surrounding
         # tokens are left out.
-        # Generally, tokens which are easy to compute are done in the map,
-        # whereas more complex tokens are done in functions.
-        # Since functions are only executed on run, they can be used to
-        # optimize by moving expensive tokens into fuctions.
-        self.map: dict[str, Union[str, float, int, Callable[[], str]]] = {
+        # Only tokens which are trivial to compute are given directly.
+        # Everything else is a function or a Lazy value, which is only
+        # evaluated when its token is first requested, and then memoized,
+        # so building the map costs nothing and only referenced tokens are computed.
+        token_map: dict[str, Union[str, float, int, Lazy, Callable[[], Any]]] = {
             # Title of the plot as a phrase (with verb), with null check
             "title": f"is titled: {self.title}" if self.title else "has no title",
             # Dataset description as attribute name
@@ -58,17 +109,17 @@ class TokenMap:
             # Set description as set name
             "set_description": f"{self.grammar.metaData.items.lower()}" if self.grammar.metaData.items else "elements",
             # largest by what factor
-            "largest_factor": f" {self.truncate_separately(self.sort_subsets_by_key(SubsetField.SIZE, True)[0].name)} is the largest by a factor of {self.calculate_largest_factor()}." if self.calculate_largest_factor() >= 2 else "",
+            "largest_factor": Lazy(self.largest_factor),
             # set intersection categorization text based on intersection type and size
-            "empty_set_presence": f" The empty intersection is present with a size of {self.get_empty_intersection_size()}." if (self.categorize_subsets().get('the empty intersection') and self.categorize_subsets().get('the empty intersection')!='largest_data_region') else "",
-            "all_set_presence": f" An all set intersection is present with a size of {self.get_all_set_intersection_size()}." if self.get_all_set_intersection_size()!= None else f" An all set intersection is not present.",
-            "intersection_trend_analysis":f"{self.calculate_intersection_trend()}",
-            "individual_set_presence": f"{self.individual_set_presence()}",
-            "low_set_presence": f"{self.low_set_presence()}",
-            "high_set_presence": f"{self.high_set_presence()}",
-            "medium_set_presence": f"{self.medium_set_presence()}",
+            "empty_set_presence": Lazy(self.empty_set_presence),
+            "all_set_presence": Lazy(self.all_set_presence),
+            "intersection_trend_analysis": Lazy(lambda: f"{self.calculate_intersection_trend()}"),
+            "individual_set_presence": Lazy(lambda: f"{self.individual_set_presence()}"),
+            "low_set_presence": Lazy(lambda: f"{self.low_set_presence()}"),
+            "high_set_presence": Lazy(lambda: f"{self.high_set_presence()}"),
+            "medium_set_presence": Lazy(lambda: f"{self.medium_set_presence()}"),
             # Total number of elements in all sets, duplicates appear to be counted
-            "universal_set_size": sum(self.data.sizes.values()),
+            "universal_set_size": Lazy(lambda: sum(self.data.sizes.values())),
             # Number of sets
             "set_count": len(self.data.sets),
             # Number of visible sets
@@ -82,42 +133,42 @@ class TokenMap:
             # List of sorted visible set names and sizes
             "list_sorted_visible_sets": self.list_sorted_visible_sets,
             # Largest visible set name
-            "max_set_name": self.truncate_string(self.sort_visible_sets()[0][0]),
+            "max_set_name": Lazy(lambda: self.truncate_string(self.sort_visible_sets()[0][0])),
             # Largest visible set size
-            "max_set_size": self.sort_visible_sets()[0][1],
+            "max_set_size": Lazy(lambda: self.sort_visible_sets()[0][1]),
             # max set percentage
-            "max_set_percentage": self.calculate_max_min_set_presence(
+            "max_set_percentage": Lazy(lambda: self.calculate_max_min_set_presence(
                 self.sort_visible_sets()[0][0]
-            ),
+            )),
             # Smallest visible set name
-            "min_set_name": self.truncate_string(self.sort_visible_sets()[-1][0]),
+            "min_set_name": Lazy(lambda: self.truncate_string(self.sort_visible_sets()[-1][0])),
             # Smallest visible set size
-            "min_set_size": self.sort_visible_sets()[-1][1],
+            "min_set_size": Lazy(lambda: self.sort_visible_sets()[-1][1]),
             # min set percentage
-            "min_set_percentage": self.calculate_max_min_set_presence(self.sort_visible_sets()[-1][0]),
+            "min_set_percentage": Lazy(lambda: self.calculate_max_min_set_presence(self.sort_visible_sets()[-1][0])),
             # Set Divergence
             "set_divergence": self.calculate_set_divergence,
             # largest intersection name and size
-            "max_intersection_name": self.calculate_max_intersection()[0],
-            "max_intersection_size": self.calculate_max_intersection()[1],
+            "max_intersection_name": Lazy(lambda: self.calculate_max_intersection()[0]),
+            "max_intersection_size": Lazy(lambda: self.calculate_max_intersection()[1]),
             # largest two intersections
-            "largest_intersections": self.max_n_intersections(2),
+            "largest_intersections": Lazy(lambda: self.max_n_intersections(2)),
             # largest two set or more intersections, conditional on largest_intersections not containing the same information
-            "two_set_intersection": self.max_intersection_two_sets(),
+            "two_set_intersection": Lazy(self.max_intersection_two_sets),
             # other large intersections. conditional on largest_intersections not containing the same information
-            "other_large_intersections": self.other_large_intersections(),
+            "other_large_intersections": Lazy(self.other_large_intersections),
             # size of the largest set/intersection
-            "min_size": min(self.data.count),
+            "min_size": Lazy(lambda: min(self.data.count)),
             # size of the smallest set/intersection
-            "max_size": max(self.data.count),
+            "max_size": Lazy(lambda: max(self.data.count)),
             # Average size of all intersections
             "avg_size": self.avg_size,
             # Median size of all intersections
             "median_size": self.median_size,
             # 25th percentile for size
-            "25perc_size": self.get_subset_percentile(SubsetField.SIZE, 25),
+            "25perc_size": Lazy(lambda: self.get_subset_percentile(SubsetField.SIZE, 25)),
             # 75th percentile for size
-            "75perc_size": self.get_subset_percentile(SubsetField.SIZE, 75),
+            "75perc_size": Lazy(lambda: self.get_subset_percentile(SubsetField.SIZE, 75)),
             # Counts populated intersections
             "pop_intersect_count": len(self.data.subsets),
             # Counts non-empty visible intersections
@@ -129,89 +180,158 @@ class TokenMap:
             # Number of total non-empty intersections
             "total_non_empty_intersect_count": self.count_non_empty_subsets,
             # a non terminal symbol, might move later
-            "pop_non-empty_intersections": (
+            "pop_non-empty_intersections": Lazy(lambda: (
                 f"There are {self.count_non_empty_subsets()} non-empty intersections, all of which are shown in the plot"
                 if self.count_non_empty_subsets()
                 == self.count_non_empty_visible_subsets()
                 else f"There are {self.count_non_empty_subsets()} non-empty intersections, {self.count_non_empty_visible_subsets()} of which are shown in the plot"
-            ),
+            )),
             # Sort type for intersections
             "sort_type": self.grammar.sort_by.value,
             "sort_order": self.grammar.sort_order.value,
             # Number of intersections of each degree
             "list_degree_count": self.degree_count,
             # Number of intersections of each degree, their average size, and their average deviation
-            "list_degree_info": self.degree_str(False),
+            "list_degree_info": Lazy(lambda: self.degree_str(False)),
             # Number of intersections of each degree, their average size,
             # their average deviation, and their total size
-            "list_degree_info_verbose": self.degree_str(True),
+            "list_degree_info_verbose": Lazy(lambda: self.degree_str(True)),
             # Total subset size
             "subset_size": len(self.data.subsets),
             # 10 largest intersections by size- includes name, size, deviation
-            "list_max_10int": self.max_n_intersections(10),
+            "list_max_10int": Lazy(lambda: self.max_n_intersections(10)),
             # Largest 5 intersections by size, including name, size, deviation
-            "list_max_5int": self.max_n_intersections(5),
+            "list_max_5int": Lazy(lambda: self.max_n_intersections(5)),
             # List all intersections in order of size, including name, size, deviation
-            "list_all_int": self.max_n_intersections(len(self.data.subsets)),
-            "max_int_size": self.sort_subsets_by_key(SubsetField.SIZE, True)[0].size,
-            "max_int_name": self.sort_subsets_by_key(SubsetField.SIZE, True)[0].name,
-            "min_int_size": self.sort_subsets_by_key(SubsetField.SIZE, True)[-1].size,
-            "min_int_name": self.sort_subsets_by_key(SubsetField.SIZE, True)[-1].name,
+            "list_all_int": Lazy(lambda: self.max_n_intersections(len(self.data.subsets))),
+            "max_int_size": Lazy(lambda: self.max_int_field(SubsetField.SIZE)),
+            "max_int_name": Lazy(lambda: self.max_int_field(SubsetField.NAME)),
+            "min_int_size": Lazy(lambda: self.min_int_field(SubsetField.SIZE)),
+            "min_int_name": Lazy(lambda: self.min_int_field(SubsetField.NAME)),
             # 90th percentile for size
-            "90perc_size": self.get_subset_percentile(SubsetField.SIZE, 90),
+            "90perc_size": Lazy(lambda: self.get_subset_percentile(SubsetField.SIZE, 90)),
             # 10th percentile for size
-            "10perc_size": self.get_subset_percentile(SubsetField.SIZE, 10),
+            "10perc_size": Lazy(lambda: self.get_subset_percentile(SubsetField.SIZE, 10)),
             # Total number of attributes
             "var_count": len(self.grammar.visible_atts),
             # List of attribute names
             "list_var_names": ", ".join(self.grammar.visible_atts),
             # Number of intersections with positive deviation
-            "pos_dev_count": self.dev_info()["pos_count"],
+            "pos_dev_count": Lazy(lambda: self.dev_info()["pos_count"]),
             # Number of intersections with negative deviation
-            "neg_dev_count": self.dev_info()["neg_count"],
+            "neg_dev_count": Lazy(lambda: self.dev_info()["neg_count"]),
             # Total size of positive deviation intersections
-            "pos_dev_size": self.dev_info()["pos_size_total"],
+            "pos_dev_size": Lazy(lambda: self.dev_info()["pos_size_total"]),
             # Total size of negative deviation intersections
-            "neg_dev_size": self.dev_info()["neg_size_total"],
+            "neg_dev_size": Lazy(lambda: self.dev_info()["neg_size_total"]),
             # Average positive deviation
-            "avg_pos_dev": self.dev_info()["pos_avg"],
+            "avg_pos_dev": Lazy(lambda: self.dev_info()["pos_avg"]),
             # Average negative deviation
-            "avg_neg_dev": self.dev_info()["neg_avg"],
+            "avg_neg_dev": Lazy(lambda: self.dev_info()["neg_avg"]),
             # Sizes of visible sets, listed
             "list_set_sizes": self.set_sizes,
             # 10 largest deviations, listed
-            "list10_dev_outliers": self.dev_outliers(10) if len(self.data.subsets)>=10 else self.dev_outliers(len(self.data.subsets)),
+            "list10_dev_outliers": Lazy(lambda: self.dev_outliers(10) if len(self.data.subsets)>=10 else self.dev_outliers(len(self.data.subsets))),
             # 5 largest deviations, listed
-            "list5_dev_outliers": self.dev_outliers(5) if len(self.data.subsets)>=5 else self.dev_outliers(len(self.data.subsets)),
+            "list5_dev_outliers": Lazy(lambda: self.dev_outliers(5) if len(self.data.subsets)>=5 else self.dev_outliers(len(self.data.subsets))),
             "category_of_subsets": self.categorize_subsets,
-            "highest_dominant_set": self.find_dominant_sets(len(self.grammar.visible_sets)),
-            "large_sets": self.find_sets_in_large_subsets(),
-            "all_set_index": self.get_all_set_position(),
+            "highest_dominant_set": Lazy(lambda: self.find_dominant_sets(len(self.grammar.visible_sets))),
+            "large_sets": Lazy(self.find_sets_in_large_subsets),
+            "all_set_index": Lazy(self.get_all_set_position),
             "set_query": self.set_query,
             "degree_filters": self.degree_filters,
             "hide_settings": self.hide_settings,
             "selected_intersection": self.selected_intersection,
             "bookmark_list": self.bookmark_list,
+            # The aggregates of an aggregated plot, largest first
+            "aggregation": self.aggregation,
         }
 
+        if self.tokens is not None:
+            return {token: token_map[token] for token in self.tokens if token in token_map}
+        return token_map
+
     ###############################
     #       Public methods        #
     ###############################
 
+    def update(self, grammar: GrammarModel, data: Optional[DataModel] = None) -> "frozenset[str]":
+        """
+        Applies a new grammar, and optionally new data, and forgets only the
+        tokens and memoized helpers whose inputs changed (see
+        alttxt.dependencies.TOKEN_INPUTS), so that they alone are recomputed
+        when next requested.
+        If data is not given and the grammar's filters, set query or sort changed,
+        the visible subsets are derived from all subsets (see alttxt.view).
+        Other data, such as the intersections of other visible sets,
+        has to come from the new export.
+        Returns the mapped tokens that were forgotten.
+        """
+        changed = {
+            field for field in GrammarModel.model_fields if getattr(grammar, field) != getattr(self.grammar, field)
+        }
+        if data is None:
+            data = self.data
+            if changed & VIEW_FIELDS:
+                from alttxt.view import apply_grammar
+
+                data = apply_grammar(grammar, self.data)
+        if data is not self.data:
+            if any(getattr(data, field) is not getattr(self.data, field) for field in DataModel.model_fields
+                   if field != "subset_table"):
+                changed |= {SUBSETS, DATA}
+            # A view that comes out the same keeps the old table, and the order statistics cached on it
+            elif data.subset_table == self.data.subset_table:
+                data = data.model_copy(update={"subset_table": self.data.subset_table})
+            else:
+                changed.add(SUBSETS)
+
+        self.grammar, self.data = grammar, data
+        stale = stale_tokens(changed, self.map)
+        for token in stale:
+            self.resolved.pop(token, None)
+        for helper in list(self.memo):
+            if HELPER_INPUTS.get(helper, changed) & changed:
+                del self.memo[helper]
+        self.map = self.build_map()
+        return stale
+
     def get_token(self, token: str) -> str:
         """
         Return the string associated with the given token.
         If the token is unmapped, does not substitute it.
         Instead, returns it with curly braces around it.
-        If the mapped value is not a string, float, int, or function,
+        If the mapped value is not a string, float, int, function or Lazy value,
         raises an exception.
+        The result is computed on the first request for the token and memoized.
         """
         if token not in self.map:
             # Substitute single curly braces so that the while loop doesn't go forever
             return "{" + token + "}"
 
+        if token not in self.resolved:
+            if self.profile is None:
+                self.resolved[token] = self.resolve_token(token)
+            else:
+                self.resolved[token] = self.profile.token(token, self.resolve_token, token)
+        return self.resolved[token]
+
+    ###############################
+    #           Helpers           #
+    ###############################
+
+    def resolve_token(self, token: str) -> Any:
+        """
+        Computes the value of a mapped token; see get_token.
+        """
         result: Any = self.map[token]
 
+        if isinstance(result, Lazy):
+            try:
+                result = result.compute()
+            except Exception as e:
+                raise Exception(f"Exception while computing value for token {token}: {str(e)}")
+
         if type(result) == float:
             return str(round(result, 2))
         elif type(result) == int:
@@ -226,10 +346,6 @@ class TokenMap:
         else:
             raise Exception("Invalid token type: " + str(type(result)))
 
-    ###############################
-    #           Helpers           #
-    ###############################
-
     def sort_subsets_by_key(
         self, key: SubsetField, descending: bool = True
     ) -> "list[Subset]":
@@ -237,13 +353,36 @@ class TokenMap:
         Returns the list of subsets from self.data.subsets,
         sorted by a specified key. The key must be a valid field
         in the dict or an error will be raised.
+        The order is read from the shared sort index of the subsets.
         Params:
           key: The key to sort by. Must be a valid field in the Subset class.
           descending: Whether to sort in descending order
         """
-        return sorted(
-            self.data.subsets, key=lambda x: getattr(x, key.value), reverse=descending
-        )
+        subsets = self.data.subsets
+        return [subsets[row] for row in self.sort_index.order(key, descending).tolist()]
+
+    @property
+    def sort_index(self) -> SortIndex:
+        """
+        The order-statistics index of the visible subsets,
+        computed once per dataset and shared by all sorted-order tokens.
+        """
+        return self.data.subset_table.sort_index
+
+    def max_int_field(self, field: SubsetField) -> Any:
+        """
+        Returns a field of the largest intersection by size.
+        """
+        row = self.sort_index.order(SubsetField.SIZE, True)[0]
+        return getattr(self.data.subset_table, field.value)[row].item()
+
+    def min_int_field(self, field: SubsetField) -> Any:
+        """
+        Returns a field of the smallest intersection by size;
+        the last one in table order if several are equally small.
+        """
+        row = self.sort_index.order(SubsetField.SIZE, True)[-1]
+        return getattr(self.data.subset_table, field.value)[row].item()
 
     def degree_info(
         self, max_degree: int
@@ -275,24 +414,29 @@ class TokenMap:
             the value at an index is the total size of intersections with that degree.
         """
 
+        table = self.data.subset_table
+
         # 1 is added to each so that the max degree is included
         total_sizes: list[int] = [0] * (max_degree + 1)
         devs: list[float] = [0.0] * (max_degree + 1)
         degree_count: list[int] = [0] * (max_degree + 1)
         degree_count[0] = 1
 
-        # Total all three values
-        for subset in self.data.subsets:
-            if subset.name == "Unincluded":
-                total_sizes[0] += subset.size
-                devs[0] += subset.dev
-
-            degree = subset.degree
-            if degree > max_degree:
-                continue
-            degree_count[degree] += 1
-            total_sizes[degree] += subset.size
-            devs[degree] += subset.dev
+        unincluded = table.name == "Unincluded"
+        if unincluded.any():
+            total_sizes[0] += int(table.size[unincluded].sum())
+            devs[0] += sum(table.dev[unincluded].tolist())
+
+        # Total all three values, grouped by degree
+        in_range = table.degree <= max_degree
+        degrees = table.degree[in_range]
+        counts = np.bincount(degrees, minlength=max_degree + 1)
+        sizes = np.bincount(degrees, weights=table.size[in_range], minlength=max_degree + 1)
+        for degree in np.flatnonzero(counts).tolist():
+            degree_count[degree] += int(counts[degree])
+            total_sizes[degree] += int(sizes[degree])
+            # Deviations are summed in row order, as floats
+            devs[degree] += sum(table.dev[in_range][degrees == degree].tolist())
 
         # Convert totals to averages
         avg_sizes: list[float] = [0.0] * (max_degree + 1)
@@ -304,6 +448,7 @@ class TokenMap:
 
         return degree_count, avg_sizes, devs, total_sizes
 
+    @memoized
     def dev_info(self) -> dict[str, float]:
         """
         Returns a dictionary containing information about deviation.
@@ -319,22 +464,17 @@ class TokenMap:
             "pos_size_avg": average size of positive deviations
             "neg_size_avg": average size of negative deviations
         """
-        pos_count: int = 0
-        neg_count: int = 0
-        pos_dev_total: int = 0
-        neg_dev_total: int = 0
-        pos_size_total: int = 0
-        neg_size_total: int = 0
-
-        for subset in self.data.subsets:
-            if subset.dev > 0:
-                pos_count += 1
-                pos_dev_total += subset.dev
-                pos_size_total += subset.size
-            elif subset.dev < 0:
-                neg_count += 1
-                neg_dev_total += subset.dev
-                neg_size_total += subset.size
+        table = self.data.subset_table
+        pos = table.dev > 0
+        neg = table.dev < 0
+
+        pos_count: int = int(pos.sum())
+        neg_count: int = int(neg.sum())
+        # Deviations are summed in row order, as floats
+        pos_dev_total: float = sum(table.dev[pos].tolist())
+        neg_dev_total: float = sum(table.dev[neg].tolist())
+        pos_size_total: int = int(table.size[pos].sum())
+        neg_size_total: int = int(table.size[neg].sum())
 
         return {
             "pos_count": pos_count,
@@ -408,26 +548,32 @@ class TokenMap:
           field: The field to get the percentile of.
           perc: The percentile to get. Must be between 0 and 100.
         """
-        set_sort: list[Subset] = self.sort_subsets_by_key(field, False)
-        index = int(len(set_sort) * perc / 100)
-        return str(getattr(set_sort[index], field.value))
+        return str(self.sort_index.percentile(field, perc))
 
     def dev_outliers(self, n: int) -> str:
         """
         Returns a string listing the n largest intersections by absolute deviation,
         including the set name and its deviation
         """
-        pos_sort: list[Subset] = self.sort_subsets_by_key(SubsetField.DEVIATION, True)
-        neg_sort: list[Subset] = self.sort_subsets_by_key(SubsetField.DEVIATION, False)
+        table = self.data.subset_table
+        pos_sort: list[int] = self.sort_index.order(SubsetField.DEVIATION, True).tolist()
+        neg_sort: list[int] = self.sort_index.order(SubsetField.DEVIATION, False).tolist()
 
+        # Merge from the top of both orders
+        pos_next = 0
+        neg_next = 0
         result: str = ""
         for i in range(0, n):
-            if abs(pos_sort[0].dev) >= abs(neg_sort[0].dev):
-                next_int: Subset = pos_sort.pop(0)
+            pos_row = pos_sort[pos_next]
+            neg_row = neg_sort[neg_next]
+            if abs(table.dev[pos_row]) >= abs(table.dev[neg_row]):
+                row = pos_row
+                pos_next += 1
             else:
-                next_int: Subset = neg_sort.pop(0)
+                row = neg_row
+                neg_next += 1
 
-            result += f"{next_int.name} ({next_int.dev}), "
+            result += f"{table.name[row]} ({table.dev[row].item()}), "
 
         # Trim the trailing ', '
         return result[:-2]
@@ -470,25 +616,13 @@ class TokenMap:
         if large_sets in dominant_sets:
             return ""
 
-        largest_intersections = [self.sort_subsets_by_key(SubsetField.SIZE, True)[i] for i in range(2)]
-
-        # there are much better ways to implement this, but I am strapped for time...
-        # TODO: improve this implementation
-        # for every set in large_sets, check if it is entirely in any of the largest_intersections set membership list
-        for intersection in largest_intersections:
-            # initialize a flag to check if the set is in the intersection
-            is_in_largest_intersections = True
-            # remove 'and' and split the large_sets string to get individual set names
-            for set in large_sets.replace('and', '').split(", "):
-                # remove any whitespace
-                set = set.strip()
-                # if the set is not in the setmembership, we should break and set the flag to false
-                # this is required because it is possible that there are multiple intersections that need to be checked
-                if set not in intersection.setMembership:
-                    is_in_largest_intersections = False
-                    break
-            if is_in_largest_intersections:
-                return ""
+        table = self.data.subset_table
+        largest_intersections = [self.sort_index.order(SubsetField.SIZE, True)[i] for i in range(2)]
+
+        # if any of the two largest intersections contains every one of the large sets,
+        # they are not "other" large intersections
+        if table.contains_all(self.large_subset_sets())[largest_intersections].any():
+            return ""
 
         return f" Other large intersections also involve {large_sets}."
 
@@ -523,14 +657,12 @@ class TokenMap:
         Params:
           n: Number of sets to list
         """
-        sort: list[Subset] = self.sort_subsets_by_key(SubsetField.SIZE, True)
+        table = self.data.subset_table
+        sort = self.sort_index.top(SubsetField.SIZE, n).tolist()
         result: str = ""
-        for i in range(0, n):
-            if i >= len(sort):
-                break
-            
-            formatted_names = self.truncate_separately(sort[i].name)
-            result += f"{formatted_names} ({sort[i].size}); "
+        for row in sort:
+            formatted_names = self.truncate_separately(str(table.name[row]))
+            result += f"{formatted_names} ({table.size[row]}); "
 
         result = result.rstrip("; ")
         parts = result.split("; ")
@@ -540,8 +672,8 @@ class TokenMap:
         elif len(parts) == 2:
             result = " and ".join(parts)
 
-        if len(sort) < n:
-            return f"The largest {len(sort)} intersections are {result}"
+        if len(table) < n:
+            return f"The largest {len(table)} intersections are {result}"
         return f"The largest {n} intersections are {result}"
 
     def degree_count(self) -> str:
@@ -587,12 +719,10 @@ class TokenMap:
         Returns the average size of all visible non-empty set intersections,
         rounded to an int.
         """
-        count = 0
-        total = 0
-        for intersection in self.data.subsets:
-            if intersection.size > 0:  # Check if the intersection is non-empty
-                total += intersection.size
-                count += 1
+        sizes = self.data.subset_table.size
+        non_empty = sizes[sizes > 0]
+        count = len(non_empty)
+        total = int(non_empty.sum())
 
         if count > 0:
             average = total / count
@@ -608,18 +738,7 @@ class TokenMap:
         Returns the median size of all set intersections,
         rounded to an int.
         """
-        sort: list[Subset] = self.sort_subsets_by_key(SubsetField.SIZE, False)
-
-        # Calculate the middle index
-        mid = len(sort) // 2  # Divide and get floor
-
-        # Check if the number of subsets is even
-        if len(sort) % 2 == 0:  # Even number of elements
-            median_val = (sort[mid - 1].size + sort[mid].size) / 2
-        else:  # Odd number of elements
-            median_val = sort[mid].size
-
-        return str(int(median_val))
+        return str(int(self.sort_index.median(SubsetField.SIZE)))
 
     def list_set_names(self) -> str:
         """
@@ -639,6 +758,7 @@ class TokenMap:
             + self.grammar.visible_sets[-1]
         )
 
+    @memoized
     def sort_visible_sets(self) -> dict[str, int]:
         """
         Returns a dictionary mapping visible set names to their sizes,
@@ -689,15 +809,7 @@ class TokenMap:
         Returns:
             int: The count of non-empty subsets.
         """
-        non_empty_count = 0
-
-        # Iterate through each subset in the list
-        for subset in self.data.subsets:
-            # Check if the size of the subset is greater than zero
-            if subset.size > 0:
-                non_empty_count += 1
-
-        return non_empty_count
+        return int(np.count_nonzero(self.data.subset_table.size > 0))
 
     def count_non_empty_subsets(self) -> int:
         """
@@ -706,31 +818,20 @@ class TokenMap:
         Returns:
             int: The count of non-empty subsets.
         """
-        non_empty_count = 0
-
-        # Iterate through each subset in the list
-        for subset in self.data.all_subsets:
-            # Check if the size of the subset is greater than zero
-            if subset.size > 0:
-                non_empty_count += 1
-
-        return non_empty_count
+        return int(np.count_nonzero(self.data.all_subset_table.size > 0))
 
     def calculate_max_min_set_presence(self, maxmin_sized_set_name) -> str:
         """
         Calculate the percentage of non-empty intersections where the largest and smallest sets are present.
         """
-        # Counters for the number of non-empty intersections including the largest and smallest sets
-        maxmin_set_count = 0
+        table = self.data.subset_table
+        non_empty = table.size > 0
 
         # Total number of non-empty intersections
-        total_non_empty = sum(1 for subset in self.data.subsets if subset.size > 0)
+        total_non_empty = int(np.count_nonzero(non_empty))
 
-        # Iterate through all subsets
-        for subset in self.data.subsets:
-            if subset.size > 0:  # Check only non-empty subsets
-                if maxmin_sized_set_name in subset.name:
-                    maxmin_set_count += 1
+        # Number of non-empty intersections that include the largest or smallest set
+        maxmin_set_count = int(np.count_nonzero(table.contains_set(maxmin_sized_set_name)[non_empty]))
 
         # Calculate percentages
         maxmin_set_percentage = (
@@ -739,6 +840,7 @@ class TokenMap:
 
         return f"{round(maxmin_set_percentage, 1)}%"
 
+    @memoized
     def calculate_max_intersection(self) -> dict[str, int]:
         """
         Calculate the largest intersection size and name that contains more than one set.
@@ -813,6 +915,7 @@ class TokenMap:
         else:
             return IndividualSetSize.IDENTICAL.value
 
+    @memoized
     def calculate_change_trend(self):
         """
         Analyzes the trend of changes in intersection sizes and classifies the trend.
@@ -820,6 +923,7 @@ class TokenMap:
         This method calculates the trend of changes in intersection sizes using three types of fits:
         linear, exponential, and quadratic polynomial. It then compares the residuals of these fits to determine
         the best fitting model and classifies the trend based on the parameters of the best fit.
+        The fits are done by alttxt.trend with a bounded amount of work.
 
         Returns:
             IntersectionTrend: An enumeration value representing the classified trend:
@@ -828,50 +932,16 @@ class TokenMap:
                 - IntersectionTrend.QUICK: If the quadratic polynomial fit is the best.
                 - IntersectionTrend.STEADY: If the linear fit is the best.
         """
-        intersection_sizes = [self.data.subsets[i].size for i in range(len(self.data.subsets))]
-
-        x = np.arange(len(intersection_sizes))
-        y = np.array(intersection_sizes)
+        from alttxt.trend import classify_trend
 
-        # linear fit
-        slope, intercept, r_value, p_value, _ = stats.linregress(x, y)
-        linear_fit = slope * x + intercept
-        linear_residuals = np.sum((y - linear_fit) ** 2)
-
-        # polynomial (quadratic) fit
-        fit = np.polyfit(x, y, 2, full=True)
-        quadratic_residuals = fit[1][0]
-
-        # exponential fit
-        popt, _ = curve_fit(lambda x, a, beta, c: a*np.exp(-beta*x)+c, x, y,
-                            p0=[max(y), 0.1, min(y)],
-                            bounds=([0, 0, 0], [np.inf, np.inf, np.inf]),
-                            maxfev=5000)
-        a, beta, c = popt
-
-        if beta > 0 and a > 0:
-            x_fit = np.linspace(0, len(x)-1, 100)
-            y_fit = a * np.exp(-beta * x_fit) + c
-            y_fit_interpolated = np.interp(x, x_fit, y_fit)  # Interpolate y_fit to match x
-            exponential_residuals = np.sum((y - y_fit_interpolated) ** 2)
-        else:
-            exponential_residuals = np.inf
-
-        if exponential_residuals < linear_residuals and exponential_residuals < quadratic_residuals:
-            if beta > 0.8:
-                return IntersectionTrend.DRASTIC.value
-            else:
-                return IntersectionTrend.RAPID.value
-        elif quadratic_residuals < linear_residuals and quadratic_residuals < exponential_residuals:
-            return IntersectionTrend.QUICK.value
-        else:
-            return IntersectionTrend.STEADY.value
+        return classify_trend(self.data.subset_table.size).value
 
+    @memoized
     def calculate_largest_factor(self):
-        sorted_sizes = self.sort_subsets_by_key(SubsetField.SIZE, True)
+        sorted_sizes = self.sort_index.values(SubsetField.SIZE, True)[:2].tolist()
         if len(sorted_sizes) >= 2:
-            largest_size = sorted_sizes[0].size
-            second_largest_size = sorted_sizes[1].size
+            largest_size = sorted_sizes[0]
+            second_largest_size = sorted_sizes[1]
             
             if second_largest_size > 0:
                 factor = largest_size / second_largest_size
@@ -885,112 +955,23 @@ class TokenMap:
         return None  
 
 
-    def categorize_subsets(self):
+    @memoized
+    def region_classification(self) -> "RegionClassification":
         """
-        Categorize the subsets into small, medium, large and largest regions based on their size.
+        Returns the classification of the visible subsets into size regions,
+        computed once per dataset.
         """
-        results = {}
-        sorted_subsets = sorted(self.data.subsets, key=lambda subset: subset.size, reverse=True)
-        
-        largest_subset = sorted_subsets.pop(0)  # Remove the largest
-        
-        median_size = statistics.median([subset.size for subset in sorted_subsets])
-        
-        region_classification = RegionClassification()
-        
-        region_classification.set_largest(largest_subset)
-        
-        close_to_zero_threshold = median_size * 1.2  # Define what 'close to zero' means
-        
-        for subset in sorted_subsets:
-            deviation = subset.size - median_size
-            
-            if deviation < 0 and abs(deviation) > abs(median_size-close_to_zero_threshold):
-                region_classification.add_to_small_region(subset)
-            elif deviation == 0 or abs(deviation) <= abs(median_size-close_to_zero_threshold):
-                region_classification.add_to_medium_region(subset)
-            else:  # deviation > 0 and not close to zero
-                region_classification.add_to_large_region(subset)
-
-
-        regions = {
-        'largest_data_region': [region_classification.largest_data_region],
-        'large_data_region': region_classification.large_data_region,
-        'medium_data_region': region_classification.medium_data_region,
-        'small_data_region': region_classification.small_data_region,
-        # Assuming largest_data_region is a single subset, not a list
-        
-        }
-
+        from alttxt.regionclass import RegionClassification
 
-        total_sizes = {region: sum(subset.size for subset in subsets) for region, subsets in regions.items()}
+        return RegionClassification(self.data.subset_table)
 
-        for region_name, subsets in regions.items():
-            # Initialize dictionary to store sizes for special classifications
-            special_sizes = {}
-            # Initialize Counter for other classifications
-            classification_sizes = Counter()
-
-            for subset in subsets:
-                # Handle 'the empty set' and 'all set' by directly logging their sizes
-                if subset.classification in ['the empty set']:
-                    special_sizes[subset.classification] = subset.size
-                else:
-                    classification_sizes[subset.classification] += subset.size
-
-                    
-
-            # Calculate percentages based on sizes for other classifications
-            percentages = {cls: (size / total_sizes[region_name] * 100) if total_sizes[region_name] > 0 else 0 for cls, size in classification_sizes.items()}
-            
-            # Update results with percentages and direct sizes for special cases
-            results[region_name] = {**percentages, **special_sizes}
-
-        classification_to_regions = {}
-        
-        threshold_percentage = 35.0  # Define the threshold for inclusion
-
-        for region, classifications in results.items():
-                for classification, value in classifications.items():
-                    # Direct inclusion for single-region classifications or exceeding threshold
-                    if classification.value not in classification_to_regions or value >= threshold_percentage:
-                        classification_to_regions.setdefault(classification.value, {}).update({region: value})
-                    else:
-                        # Include only if the percentage exceeds the threshold
-                        existing_region, existing_value = next(iter(classification_to_regions[classification.value].items()))
-                        if value > existing_value:
-                            classification_to_regions[classification.value].update({region: value})
-                        # classification_to_regions[classification.value].update({region: value})
-
-
-            # Refine mapping based on the new rules
-        for classification, regions_percentages in classification_to_regions.items():
-            if len(regions_percentages) > 1:
-                    # Filter regions by threshold and select the highest if none exceed the threshold
-                above_threshold_regions = {region: pct for region, pct in regions_percentages.items() if pct >= threshold_percentage}
-
-            # If no regions meet the threshold, choose the one with the highest percentage
-                if not above_threshold_regions:
-                    highest_region = max(regions_percentages, key=regions_percentages.get)
-                    classification_to_regions[classification] = {highest_region}
-                else:
-                    # Include all regions that meet the threshold
-                    classification_to_regions[classification] = set(above_threshold_regions.keys())
-            else:
-                # If the classification is present in only one region, include it regardless of the percentage
-                classification_to_regions[classification] = set(regions_percentages.keys())
-
-        # Handle special cases such as 'the empty set' and 'all set'
-        # They should be directly mapped without considering the threshold
-        for special_case in ['the empty set', 'all set']:
-            if special_case in results:
-                for region in results[special_case]:
-                    classification_to_regions[special_case] = {region}
-
-
-        final_output = {cls: {regions} if isinstance(regions, str) else set(regions) for cls, regions in classification_to_regions.items()}
-        
-        return final_output
+    def categorize_subsets(self) -> "Mapping[str, Tuple[str, ...]]":
+        """
+        Categorize the subsets into small, medium, large and largest regions based on their size.
+        Returns the regions each intersection type is present in.
+        """
+        classification: "RegionClassification" = self.region_classification()
+        return classification.classification_regions
 
     def get_empty_intersection_size(self):
     # Iterate through subsets to find 'the empty intersection'
@@ -1006,7 +987,37 @@ class TokenMap:
                 return subset.size
         # Return 0 or None if 'all set' intersection is not found
         return None
-    
+
+    @memoized
+    def largest_factor(self) -> str:
+        """
+        Returns the sentence naming the largest intersection and the factor
+        by which it is larger than the next one, if that is at least 2.
+        """
+        factor = self.calculate_largest_factor()
+        if factor is None or factor < 2:
+            return ""
+        return f" {self.truncate_separately(self.max_int_field(SubsetField.NAME))} is the largest by a factor of {factor}."
+
+    @memoized
+    def empty_set_presence(self) -> str:
+        """
+        Returns the sentence giving the size of the empty intersection, if it is present.
+        """
+        if not self.categorize_subsets().get("the empty intersection"):
+            return ""
+        return f" The empty intersection is present with a size of {self.get_empty_intersection_size()}."
+
+    @memoized
+    def all_set_presence(self) -> str:
+        """
+        Returns the sentence giving the size of the intersection of all sets, or saying it is not present.
+        """
+        size = self.get_all_set_intersection_size()
+        if size is None:
+            return " An all set intersection is not present."
+        return f" An all set intersection is present with a size of {size}."
+
     def individual_set_presence(self) -> str:
         categorization = self.categorize_subsets()
         individual_set_regions = categorization.get('individual set')
@@ -1079,8 +1090,8 @@ class TokenMap:
     def calculate_intersection_trend(self) -> str:
         intersection_trend = self.calculate_change_trend()
 
-        max_int_size = self.sort_subsets_by_key(SubsetField.SIZE, True)[0].size
-        min_int_size = self.sort_subsets_by_key(SubsetField.SIZE, True)[-1].size
+        max_int_size = self.max_int_field(SubsetField.SIZE)
+        min_int_size = self.min_int_field(SubsetField.SIZE)
 
         return f" The intersection sizes peak at a value of {max_int_size} and then {intersection_trend} flatten down to {min_int_size}."
 
@@ -1116,17 +1127,20 @@ class TokenMap:
         2. It filters the sets based on an 80% occurrence threshold.
         3. It generates a descriptive string indicating the dominant sets and their occurrences.
         """
-        set_occurrences = Counter()
-
-        dominant_intersections = self.find_dominant_intersections()
+        table = self.data.subset_table
+        dominant = table.size > float(self.avg_size())
+        dominant_count = int(np.count_nonzero(dominant))
 
         # get common occurences for each set
-        for subset in dominant_intersections:
-            for set_name in self.grammar.visible_sets:
-                if set_name in subset.name:
-                    set_occurrences[set_name] += 1
+        occurrences: list[Tuple[int, int, int, str]] = []
+        for index, set_name in enumerate(self.grammar.visible_sets):
+            in_dominant = table.contains_set(set_name)[dominant]
+            count = int(np.count_nonzero(in_dominant))
+            if count > 0:
+                # Ties are broken by the first dominant intersection each set appears in
+                occurrences.append((-count, int(np.argmax(in_dominant)), index, set_name))
 
-        most_common_sets = set_occurrences.most_common(visible_sets)
+        most_common_sets = [(set_name, -count) for count, _, _, set_name in sorted(occurrences)][:visible_sets]
 
         # 80% threshold for "dominant" set
         THRESHOLD = 80
@@ -1135,7 +1149,7 @@ class TokenMap:
 
         # for each value in most_common_sets, filter by the percentage threshold
         for set_name, count in most_common_sets:
-            percentage = (count / len(dominant_intersections)) * 100
+            percentage = (count / dominant_count) * 100
             if percentage >= THRESHOLD:
                 filtered_sets.append((set_name, count, percentage))
 
@@ -1151,31 +1165,32 @@ class TokenMap:
 
         return result
 
-    def find_sets_in_large_subsets(self):
-        sorted_subsets = sorted(self.data.subsets, key=lambda subset: subset.size, reverse=True)
+    def large_subset_sets(self) -> "list[str]":
+        """
+        Returns the names of the sets in the 2nd largest subset, or,
+        if that is a single set, in the 2nd and 3rd largest subsets together.
+        Empty (no-set) subsets among the 2nd and 3rd largest are skipped.
+        """
+        table = self.data.subset_table
+        sorted_subsets = self.sort_index.order(SubsetField.SIZE, True).tolist()
 
         # Check the top two largest subsets and remove them if they have empty setMembership. Remove the second and third largest, if empty
-        if len(sorted_subsets) > 1 and len(sorted_subsets[1].setMembership) == 0:
+        if len(sorted_subsets) > 1 and table.mask[sorted_subsets[1]] == 0:
             sorted_subsets.pop(1)
-        elif len(sorted_subsets) > 2 and len(sorted_subsets[2].setMembership) == 0:
+        elif len(sorted_subsets) > 2 and table.mask[sorted_subsets[2]] == 0:
             sorted_subsets.pop(2)
 
         # Extract set names from the 2nd largest subset
-        second_largest_sets = sorted_subsets[1].setMembership
-        sets = []
+        mask = int(table.mask[sorted_subsets[1]])
 
-        if len(second_largest_sets) == 1:
-            # Extract set names from the 3rd largest subset
-            third_largest_sets = sorted_subsets[2].setMembership
-            # Find the intersection of sets between the 2nd and 3rd largest subsets
-            common_sets = second_largest_sets.union(third_largest_sets)
+        if table.popcount()[sorted_subsets[1]] == 1:
+            # Combine the sets of the 2nd and 3rd largest subsets
+            mask |= int(table.mask[sorted_subsets[2]])
 
-            for cs in common_sets:
-                sets.append(cs)
+        return [name for bit, name in enumerate(table.set_names) if mask >> bit & 1]
 
-        else:
-            for sm in second_largest_sets:
-                sets.append(sm)
+    def find_sets_in_large_subsets(self):
+        sets = self.large_subset_sets()
 
         if len(sets) == 2:
             return f"{self.truncate_string(sets[0])} and {self.truncate_string(sets[1])}"
@@ -1185,19 +1200,16 @@ class TokenMap:
             return self.truncate_string(sets)
 
     def get_all_set_position(self):
-        sorted_subsets = sorted(self.data.subsets, key=lambda subset: subset.size, reverse=True)
+        table = self.data.subset_table
 
-        # Find the "all set" intersection if it exists
-        all_set_index = None
-        for index, subset in enumerate(sorted_subsets):
-            if subset.degree == len(self.grammar.visible_sets):  # all_sets_length is equal to the number of visible sets
-                all_set_size = subset.size
-                all_set_index = index
-                break
+        # Find the position of the "all set" intersection by size, if it exists
+        # all_sets_length is equal to the number of visible sets
+        all_set_index = self.sort_index.first(SubsetField.SIZE, table.degree == len(self.grammar.visible_sets))
 
         # Determine the position of the "all set" intersection
-        if all_set_index is not None:
-            total_subsets = len(sorted_subsets)
+        if all_set_index >= 0:
+            all_set_size = table.size[self.sort_index.order(SubsetField.SIZE, True)[all_set_index]]
+            total_subsets = len(table)
             if all_set_index == 0:
                 return f"The intersection of all sets is the largest with {all_set_size} elements."
             elif all_set_index == 1:
@@ -1288,6 +1300,83 @@ class TokenMap:
 
         return formatted_names
     
+    @memoized
+    def aggregate_table(self) -> "Optional[AggregateTable]":
+        """
+        Returns the aggregates of the visible subsets, or None if the plot is not aggregated.
+        """
+        if self.grammar.first_aggregate_by == AggregateBy.NONE:
+            return None
+        from alttxt.aggregation import aggregate
+
+        return aggregate(
+            self.data.subset_table,
+            self.grammar.first_aggregate_by,
+            self.grammar.first_overlap_degree,
+            self.grammar.second_aggregate_by,
+            self.grammar.second_overlap_degree,
+        )
+
+    def aggregate_kind(self, aggregate_by: AggregateBy, overlap_degree: int) -> str:
+        """Returns how an aggregation groups the intersections, e.g. 'degree'"""
+        if aggregate_by == AggregateBy.OVERLAP:
+            return f"overlaps of {overlap_degree} sets"
+        return {AggregateBy.DEGREE: "degree", AggregateBy.SETS: "set", AggregateBy.DEVIATION: "deviation"}[aggregate_by]
+
+    def aggregate_name(self, row: int) -> str:
+        """Returns the name of an aggregate, with the names of its sets truncated"""
+        table: "AggregateTable" = self.aggregate_table()
+        aggregate_by = table.first if table.level[row] == 1 else table.second
+        if aggregate_by in (AggregateBy.SETS, AggregateBy.OVERLAP):
+            return " and ".join(self.truncate_string(name) for name in table.name[row].split(" and "))
+        return table.name[row]
+
+    def list_aggregates(self, rows: "List[int]", with_parent: bool = False) -> str:
+        """
+        Returns a string listing the given aggregates, with their size and number of intersections
+        """
+        table = self.aggregate_table()
+        items = self.grammar.metaData.items.lower() if self.grammar.metaData.items else "elements"
+        parts = []
+        for row in rows:
+            name = self.aggregate_name(row)
+            if with_parent:
+                name += f" within {self.aggregate_name(table.parent[row])}"
+            count = table.count[row]
+            parts.append(
+                f"{name} ({table.size[row]} {items} in {count} "
+                f"intersection{'s' if count != 1 else ''})"
+            )
+        if len(parts) > 2:
+            return "; ".join(parts[:-1]) + "; and " + parts[-1]
+        return " and ".join(parts)
+
+    def aggregation(self) -> str:
+        """
+        Returns a string describing the aggregates of the plot, largest first,
+        with a leading space and a terminating period,
+        or an empty string if the plot is not aggregated.
+        """
+        table = self.aggregate_table()
+        if table is None:
+            return ""
+        first = table.rows(1)
+        kind = self.aggregate_kind(table.first, self.grammar.first_overlap_degree)
+        largest = table.largest(first, 5).tolist()
+        result = (
+            f" The intersections are aggregated by {kind} into {len(first)} group{'s' if len(first) != 1 else ''}"
+            f"; {'the largest are' if len(largest) < len(first) else 'they are'} {self.list_aggregates(largest)}."
+        )
+        second = table.rows(2)
+        if len(second):
+            kind = self.aggregate_kind(table.second, self.grammar.second_overlap_degree)
+            largest = table.largest(second, 3).tolist()
+            result += (
+                f" Each group is further aggregated by {kind} into {len(second)} subgroups in total"
+                f"; the largest are {self.list_aggregates(largest, with_parent=True)}."
+            )
+        return result
+
     def degree_filters(self) -> str:
         """Returns a string describing the min and max degree filtered for, no terminating period"""
         return f"The plot is filtered for subsets with degree between {self.grammar.filters.min_visible} and {self.grammar.filters.max_visible}"
@@ -0,0 +1,220 @@
+"""
+Classification of the trend of a series of intersection sizes.
+
+The sizes (in plot order) are fit with a linear, a quadratic and an
+exponential decay model, and the model with the smallest squared error
+decides the IntersectionTrend. All three fits use closed-form least
+squares: the exponential model a * exp(-beta * x) + c is linear in a and c
+for a fixed decay rate beta, so only beta is searched, over a fixed grid
+followed by a fixed number of zoomed-in grid refinements. The work done is capped
+by an iteration budget and, optionally, a time budget, so the cost of a
+fit does not depend on how noisy the data is.
+"""
+import math
+import time
+
+import numpy as np
+import numpy.typing as npt
+
+from typing import Any, Optional, Sequence, Tuple, Union
+
+from alttxt.enums import IntersectionTrend
+
+# Decay rates tried before refining, log-spaced. Rates above the largest
+# one are indistinguishable from it for integer x.
+BETA_GRID = np.geomspace(1e-4, 50.0, 40)
+# Number of decay rates fit in each refinement round
+REFINE_POINTS = 8
+# Maximum number of decay rates evaluated (grid and 4 refinement rounds)
+MAX_ITERATIONS = 72
+# Exponential fits with a decay rate above this are drastic, otherwise rapid
+DRASTIC_BETA = 0.8
+# Number of points the exponential fit is sampled at to compute its error
+EXPONENTIAL_SAMPLES = 100
+
+
+class TrendFit:
+    """
+    The result of fitting a series of sizes; see fit_trend.
+    - linear_residuals, quadratic_residuals, exponential_residuals:
+      The sum of squared errors of each model. The exponential error is
+      infinite if no decaying fit (a > 0, beta > 0) was found.
+    - a, beta, c: The parameters of the exponential fit
+    - iterations: The number of decay rates evaluated
+    - complete: False if the time budget ran out before the refinement finished
+    """
+
+    def __init__(
+        self,
+        linear_residuals: float,
+        quadratic_residuals: float,
+        exponential_residuals: float,
+        a: float,
+        beta: float,
+        c: float,
+        iterations: int,
+        complete: bool,
+    ) -> None:
+        self.linear_residuals = linear_residuals
+        self.quadratic_residuals = quadratic_residuals
+        self.exponential_residuals = exponential_residuals
+        self.a = a
+        self.beta = beta
+        self.c = c
+        self.iterations = iterations
+        self.complete = complete
+
+    @property
+    def trend(self) -> IntersectionTrend:
+        """
+        The trend given by the best fitting model.
+        """
+        exponential = self.exponential_residuals
+        quadratic = self.quadratic_residuals
+        linear = self.linear_residuals
+
+        if exponential < linear and exponential < quadratic:
+            if self.beta > DRASTIC_BETA:
+                return IntersectionTrend.DRASTIC
+            return IntersectionTrend.RAPID
+        elif quadratic < linear and quadratic < exponential:
+            return IntersectionTrend.QUICK
+        return IntersectionTrend.STEADY
+
+    def __repr__(self) -> str:
+        return (
+            f"TrendFit(trend={self.trend.name}, linear={self.linear_residuals:.6g}, "
+            f"quadratic={self.quadratic_residuals:.6g}, exponential={self.exponential_residuals:.6g}, "
+            f"beta={self.beta:.6g}, iterations={self.iterations})"
+        )
+
+
+def _polynomial_residuals(x: "npt.NDArray[np.float64]", y: "npt.NDArray[np.float64]", degree: int) -> float:
+    """
+    Returns the sum of squared errors of the least squares polynomial fit.
+    """
+    # x is scaled to [0, 1] to keep the normal equations well conditioned
+    scaled = x / max(x[-1], 1.0)
+    design = np.vander(scaled, degree + 1)
+    coefficients, *_ = np.linalg.lstsq(design, y, rcond=None)
+    return float(np.sum((y - design @ coefficients) ** 2))
+
+
+def _fit_amplitudes(
+    y: "npt.NDArray[np.float64]", decays: "npt.NDArray[np.float64]"
+) -> "Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]":
+    """
+    For each row of decays, returns the least squares a >= 0 and c >= 0
+    of y = a * decay + c, and the sum of squared errors of that fit.
+    """
+    decay_means = decays.mean(axis=1)
+    y_mean = float(y.mean())
+    centered = decays - decay_means[:, None]
+    variances = np.einsum("ij,ij->i", centered, centered)
+
+    # Unconstrained fit, used where both parameters come out non-negative
+    a = np.divide(centered @ (y - y_mean), variances, out=np.zeros_like(variances), where=variances > 0)
+    c = y_mean - a * decay_means
+    feasible = (variances > 0) & (a >= 0) & (c >= 0)
+
+    # Otherwise the best fit lies on an edge: no decay term, or no offset
+    norms = np.einsum("ij,ij->i", decays, decays)
+    origin_a = np.maximum(np.divide(decays @ y, norms, out=np.zeros_like(norms), where=norms > 0), 0.0)
+    constant_c = max(y_mean, 0.0)
+    constant_sse = float(np.sum((y - constant_c) ** 2))
+    origin_residuals = y - origin_a[:, None] * decays
+    origin_sse = np.einsum("ij,ij->i", origin_residuals, origin_residuals)
+    use_origin = origin_sse < constant_sse
+
+    a = np.where(feasible, a, np.where(use_origin, origin_a, 0.0))
+    c = np.where(feasible, c, np.where(use_origin, 0.0, constant_c))
+    residuals = y - a[:, None] * decays - c[:, None]
+    return a, c, np.einsum("ij,ij->i", residuals, residuals)
+
+
+def fit_trend(
+    sizes: "Union[Sequence[float], npt.NDArray[Any]]",
+    max_iterations: int = MAX_ITERATIONS,
+    time_budget: Optional[float] = None,
+) -> TrendFit:
+    """
+    Fits linear, quadratic and exponential decay models to a series of sizes.
+    Params:
+    - sizes: The intersection sizes, in plot order, as a sequence or an array
+    - max_iterations: The maximum number of decay rates to evaluate for the
+      exponential model. The grid in BETA_GRID is evaluated first (or a
+      subsample of it if the budget is smaller), then the best rate is refined
+      in rounds of REFINE_POINTS rates while the budget allows.
+    - time_budget: If given, the number of seconds after which no further
+      refinement rounds are started and the best rate found so far is used
+    """
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    y = np.asarray(sizes, dtype=np.float64)
+    x = np.arange(len(y), dtype=np.float64)
+
+    if len(y) < 3:
+        # Too few points to tell the models apart
+        return TrendFit(0.0, 0.0, math.inf, 0.0, 0.0, 0.0, 0, True)
+
+    linear_residuals = _polynomial_residuals(x, y, 1)
+    quadratic_residuals = _polynomial_residuals(x, y, 2)
+
+    grid = BETA_GRID
+    if max_iterations < len(grid):
+        grid = grid[np.linspace(0, len(grid) - 1, max(max_iterations, 1)).astype(int)]
+
+    def fit(rates: "npt.NDArray[np.float64]") -> "Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]":
+        # decays[i, j] = exp(-rates[i] * x[j])
+        return _fit_amplitudes(y, np.exp(-np.outer(rates, x)))
+
+    # The whole grid is fit in one batch
+    grid_a, grid_c, grid_sse = fit(grid)
+    best = int(np.argmin(grid_sse))
+    a, c, sse = float(grid_a[best]), float(grid_c[best]), float(grid_sse[best])
+    beta = float(grid[best])
+    iterations = len(grid)
+
+    # Refine around the best rate, in log space: each round fits
+    # REFINE_POINTS rates between the neighbours of the best rate so far
+    low = math.log(grid[max(best - 1, 0)])
+    high = math.log(grid[min(best + 1, len(grid) - 1)])
+    complete = True
+    while high > low and iterations + REFINE_POINTS <= max_iterations:
+        if deadline is not None and time.perf_counter() > deadline:
+            complete = False
+            break
+        rates = np.exp(np.linspace(low, high, REFINE_POINTS))
+        round_a, round_c, round_sse = fit(rates)
+        iterations += REFINE_POINTS
+
+        index = int(np.argmin(round_sse))
+        if round_sse[index] < sse:
+            a, c, sse = float(round_a[index]), float(round_c[index]), float(round_sse[index])
+            beta = float(rates[index])
+        low = math.log(rates[max(index - 1, 0)])
+        high = math.log(rates[min(index + 1, REFINE_POINTS - 1)])
+
+    if beta > 0 and a > 0:
+        # The error is measured on the fit sampled at EXPONENTIAL_SAMPLES points
+        # and interpolated at each x, as the trend thresholds were tuned for
+        samples = np.linspace(0, len(x) - 1, EXPONENTIAL_SAMPLES)
+        sampled_fit = np.interp(x, samples, a * np.exp(-beta * samples) + c)
+        exponential_residuals = float(np.sum((y - sampled_fit) ** 2))
+    else:
+        exponential_residuals = math.inf
+
+    return TrendFit(
+        linear_residuals, quadratic_residuals, exponential_residuals, a, beta, c, iterations, complete
+    )
+
+
+def classify_trend(
+    sizes: "Union[Sequence[float], npt.NDArray[Any]]",
+    max_iterations: int = MAX_ITERATIONS,
+    time_budget: Optional[float] = None,
+) -> IntersectionTrend:
+    """
+    Returns the trend of a series of intersection sizes.
+    See fit_trend for the parameters.
+    """
+    return fit_trend(sizes, max_iterations, time_budget).trend
@@ -0,0 +1,116 @@
+"""
+Derives the visible subsets of an UpSet plot from all of its subsets and
+the grammar, as the plot does:
+- Filters: the subsets with a degree between filters.min_visible and
+  filters.max_visible, without the empty ones if filters.hide_empty is set
+  and without the no-set intersection if filters.hide_no_set is set
+- The set query, if any (see alttxt.setquery)
+- Sorting by sort_by in sort_order. The sort is stable, so subsets that tie
+  keep the order of all subsets, which is the plot's own order in exports.
+The grammar's collapsed aggregates only hide subsets inside aggregates,
+which are described from the aggregates (see alttxt.aggregation),
+so they do not change the visible subsets.
+
+This lets one parsed export be described under other grammars,
+and exports to be parsed without their accessibleProcessedData.
+"""
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from alttxt.enums import SortBy, SortOrder
+from alttxt.models import DataModel, FilterModel, GrammarModel, SetQueryModel
+from alttxt.setquery import evaluate_query
+from alttxt.subsettable import CLASSIFICATION_CODES, SubsetTable
+
+# The column of SubsetTable that each sort sorts by
+SORT_COLUMNS = {SortBy.SIZE: "size", SortBy.DEGREE: "degree", SortBy.DEVIATION: "dev"}
+
+
+def filter_mask(
+    table: SubsetTable, filters: FilterModel, set_query: Optional[SetQueryModel] = None
+) -> "npt.NDArray[np.bool_]":
+    """
+    Returns a boolean array that is True for the subsets that pass the filters and match the set query.
+    """
+    visible = (table.degree >= filters.min_visible) & (table.degree <= filters.max_visible)
+    if filters.hide_empty:
+        visible &= table.size > 0
+    if filters.hide_no_set:
+        visible &= table.degree > 0
+    if set_query is not None:
+        matches = np.zeros(len(table), dtype=bool)
+        matches[evaluate_query(table, set_query).rows] = True
+        visible &= matches
+    return visible
+
+
+def sort_rows(
+    table: SubsetTable, rows: "npt.NDArray[np.intp]", sort_by: SortBy, sort_order: SortOrder
+) -> "npt.NDArray[np.intp]":
+    """
+    Returns the given rows of a table sorted stably by a column (see SORT_COLUMNS).
+    """
+    # The rank of each row in the table's shared sort index orders the rows without comparing values again
+    ranks = table.sort_index.rank(SORT_COLUMNS[sort_by], descending=sort_order == SortOrder.DESCENDING)
+    return rows[np.argsort(ranks[rows], kind="stable")]
+
+
+class PlotView:
+    """
+    The visible subsets of a plot, as rows of the table of all its subsets:
+    - rows: The visible rows, in plot order
+    - index: The position of each row of the table in the plot, or -1 if it is hidden
+    """
+
+    def __init__(self, table: SubsetTable, rows: "npt.NDArray[np.intp]") -> None:
+        """
+        Params:
+        - table: All subsets of the plot
+        - rows: The visible rows of the table, in plot order
+        """
+        self.table = table
+        self.rows = rows
+        self.index = np.full(len(table), -1, dtype=np.int64)
+        self.index[rows] = np.arange(len(rows))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def subset_table(self, visible_sets: int) -> SubsetTable:
+        """
+        Returns the visible subsets as a table, named as the parser names
+        visible subsets: with underscores in set names replaced by hyphens.
+        Params:
+        - visible_sets: The number of visible sets, which the subsets are classified against
+        """
+        from alttxt.parser import Parser
+
+        table, rows = self.table, self.rows
+        degrees = table.degree[rows]
+        classifications = [
+            CLASSIFICATION_CODES[Parser.classify_subset(degree, visible_sets)] for degree in degrees.tolist()
+        ]
+        return SubsetTable(
+            np.char.replace(table.name[rows], "_", "-"), table.size[rows], table.dev[rows], degrees,
+            classifications, table.mask[rows], [name.replace("_", "-") for name in table.set_names],
+        )
+
+
+def plot_view(table: SubsetTable, grammar: GrammarModel) -> PlotView:
+    """
+    Returns the visible subsets of a table of all subsets under a grammar's filters, set query and sort.
+    """
+    rows = np.flatnonzero(filter_mask(table, grammar.filters, grammar.set_query))
+    return PlotView(table, sort_rows(table, rows, grammar.sort_by, grammar.sort_order))
+
+
+def apply_grammar(grammar: GrammarModel, data: DataModel) -> DataModel:
+    """
+    Returns the data with its visible subsets derived from all subsets under a grammar.
+    Exports made while a set query was active may only hold the subsets that
+    match it; parse them with recompute set to get all subsets.
+    """
+    view = plot_view(data.all_subset_table, grammar)
+    return data.model_copy(update={"subset_table": view.subset_table(len(grammar.visible_sets))})
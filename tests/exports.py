@@ -0,0 +1,12 @@
+"""
+The example exports shared by the tests.
+"""
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+# Every example export, including the deliberately malformed ones
+ALL_DATA_FILES = sorted(DATA_DIR.glob("*.json"))
+# The deliberately malformed exports, which cannot be parsed
+BAD_FILES = [DATA_DIR / "bad.json", DATA_DIR / "bad_agg_test.json"]
+# The exports that can be parsed
+DATA_FILES = [path for path in ALL_DATA_FILES if path not in BAD_FILES]
@@ -0,0 +1,107 @@
+from itertools import combinations
+
+import pytest
+
+from alttxt.aggregation import aggregate, grouping
+from alttxt.enums import AggregateBy, Level
+from alttxt.pipeline import generate, parse, parse_bytes
+from alttxt.subsettable import SubsetTable
+from alttxt.synthetic import synthetic_export
+from tests.exports import DATA_DIR
+
+
+@pytest.fixture(scope="module")
+def table():
+    _, data = parse(DATA_DIR / "movie.json")
+    return data.subset_table
+
+
+def brute_force(table, aggregate_by: AggregateBy, overlap_degree: int = 2) -> "dict[str, set[int]]":
+    subsets = range(len(table))
+    if aggregate_by == AggregateBy.DEGREE:
+        groups = {f"degree {degree}": {row for row in subsets if table.degree[row] == degree} for degree in range(20)}
+    elif aggregate_by == AggregateBy.DEVIATION:
+        groups = {
+            "positive deviation": {row for row in subsets if table.dev[row] > 0},
+            "negative deviation": {row for row in subsets if table.dev[row] < 0},
+        }
+    else:
+        degree = 1 if aggregate_by == AggregateBy.SETS else overlap_degree
+        groups = {
+            " and ".join(combo): {row for row in subsets if set(combo) <= table.membership(row)}
+            for combo in combinations(table.set_names, degree)
+        }
+    return {name: rows for name, rows in groups.items() if rows}
+
+
+@pytest.mark.parametrize("aggregate_by", [AggregateBy.DEGREE, AggregateBy.DEVIATION, AggregateBy.SETS, AggregateBy.OVERLAP])
+def test_grouping(table, aggregate_by: AggregateBy) -> None:
+    names, members = grouping(table, aggregate_by)
+    assert members.shape == (len(table), len(names))
+    found = {name: set(members[:, column].nonzero()[0].tolist()) for column, name in enumerate(names)}
+    assert found == brute_force(table, aggregate_by)
+
+
+def test_zero_deviation() -> None:
+    table = SubsetTable(["A", "B", "A, B"], [3, 2, 1], [0.5, 0.0, -0.5], [1, 1, 2], [0, 0, 0], [1, 2, 3], ["A", "B"])
+    names, members = grouping(table, AggregateBy.DEVIATION)
+    assert names == ["positive deviation", "negative deviation"]
+    assert members.tolist() == [[True, False], [False, False], [False, True]]
+
+    table = SubsetTable(["A"], [3], [0.0], [1], [0], [1], ["A"])
+    assert grouping(table, AggregateBy.DEVIATION)[0] == []
+
+
+def test_overlap_degree(table) -> None:
+    names, _ = grouping(table, AggregateBy.OVERLAP, 3)
+    assert set(names) == set(brute_force(table, AggregateBy.OVERLAP, 3))
+    with pytest.raises(ValueError):
+        grouping(table, AggregateBy.OVERLAP, 0)
+
+
+def test_two_levels(table) -> None:
+    aggregates = aggregate(table, AggregateBy.SETS, second=AggregateBy.DEGREE)
+    first = aggregates.rows(1)
+    assert [aggregates.name[row] for row in first] == list(brute_force(table, AggregateBy.SETS))
+    for row in first.tolist():
+        children = aggregates.rows(2, row)
+        assert aggregates.size[children].sum() == aggregates.size[row]
+        assert aggregates.count[children].sum() == aggregates.count[row]
+        rows = set(aggregates.members[:, row].nonzero()[0].tolist())
+        assert aggregates.size[row] == sum(table.size[subset] for subset in rows)
+        assert aggregates.dev[row] == pytest.approx(sum(table.dev[subset] for subset in rows))
+
+    largest = aggregates.largest(first, 2)
+    assert aggregates.size[largest].tolist() == sorted(aggregates.size[first].tolist(), reverse=True)[:2]
+
+
+def test_second_level_limit(table, monkeypatch: pytest.MonkeyPatch) -> None:
+    aggregates = aggregate(table, AggregateBy.SETS, second=AggregateBy.OVERLAP)
+    second = len(aggregates.rows(2))
+    monkeypatch.setattr("alttxt.aggregation.MAX_SECOND_LEVEL_GROUPS", second)
+    assert len(aggregate(table, AggregateBy.SETS, second=AggregateBy.OVERLAP)) == len(aggregates)
+    monkeypatch.setattr("alttxt.aggregation.MAX_SECOND_LEVEL_GROUPS", second - 1)
+    with pytest.raises(ValueError):
+        aggregate(table, AggregateBy.SETS, second=AggregateBy.OVERLAP)
+
+
+def test_aggregated_export() -> None:
+    path = DATA_DIR / "agg_test.json"
+    grammar, data = parse(path)
+    assert grammar.first_aggregate_by == AggregateBy.DEGREE
+    assert all(subset.name for subset in data.subsets)
+    text = generate(grammar, data, Level.TWO)
+    assert "The intersections are aggregated by degree into 4 groups" in text
+    assert generate(*parse_bytes(path.read_bytes()), Level.TWO) == text
+
+    grammar, data = parse(DATA_DIR / "movie.json")
+    assert "aggregated" not in generate(grammar, data, Level.TWO)
+
+
+def test_synthetic_aggregated_export() -> None:
+    export = synthetic_export(sets=6, items=1000, intersections=30, seed=2)
+    export.update(firstAggregateBy="Overlaps", firstOverlapDegree=2, secondAggregateBy="Deviations")
+    grammar, data = parse(export)
+    text = generate(grammar, data, Level.TWO)
+    assert "aggregated by overlaps of 2 sets into" in text
+    assert "Each group is further aggregated by deviation" in text
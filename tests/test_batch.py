@@ -0,0 +1,60 @@
+import json
+
+from pathlib import Path
+
+import pytest
+
+from alttxt import batch
+from alttxt.__main__ import main
+from alttxt.enums import Level
+from alttxt.pipeline import describe, generate, parse
+from tests.exports import DATA_DIR
+
+GOOD_FILES = [DATA_DIR / "movie.json", DATA_DIR / "quadratic.json"]
+BAD_FILE = DATA_DIR / "bad_agg_test.json"
+
+
+def test_expand_inputs(tmp_path: Path) -> None:
+    nested = tmp_path / "nested"
+    nested.mkdir()
+    for path in (tmp_path / "a.json", nested / "b.json", tmp_path / "notes.txt"):
+        path.write_text("{}")
+
+    assert batch.expand_inputs([str(tmp_path)]) == [tmp_path / "a.json", nested / "b.json"]
+    assert batch.expand_inputs([str(tmp_path / "**" / "b.json"), str(nested / "b.json")]) == [nested / "b.json"]
+    with pytest.raises(FileNotFoundError):
+        batch.expand_inputs([str(tmp_path / "*.csv")])
+
+
+def test_describe_records_output_and_errors() -> None:
+    record = describe(GOOD_FILES[0], Level.ONE)
+    grammar, data = parse(GOOD_FILES[0])
+    assert record["output"] == generate(grammar, data, Level.ONE)
+    assert record["error"] is None
+    assert set(record["timings"]) == {"parse", "generate", "total"}
+
+    record = describe(BAD_FILE, Level.ONE)
+    assert record["output"] is None
+    assert record["error"].startswith("ValueError: 'boop' is not a valid AggregateBy")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_keeps_input_order_and_fails_per_file(workers: int) -> None:
+    paths = [GOOD_FILES[0], BAD_FILE, GOOD_FILES[1]]
+    records = list(batch.run(paths, Level.TWO, workers=workers))
+    assert [record["file"] for record in records] == [str(path) for path in paths]
+    assert [record["error"] is None for record in records] == [True, False, True]
+    assert records[0]["output"] == describe(GOOD_FILES[0], Level.TWO)["output"]
+
+
+def test_cli_batch(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    output = tmp_path / "out.jsonl"
+    inputs = [str(path) for path in GOOD_FILES]
+    assert main(["--batch", *inputs, "--workers", "2", "--structured", "--output", str(output)]) == 0
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record["file"] for record in records] == inputs
+    assert all(record["structured"] and "longDescription" in record["output"] for record in records)
+    assert "2 files (0 failed, 0 cached)" in capsys.readouterr().err
+
+    assert main(["--batch", str(BAD_FILE), "--output", str(output)]) == 1
@@ -0,0 +1,166 @@
+import ast
+import json
+import mmap
+import os
+import pickle
+import time
+
+from pathlib import Path
+
+import pytest
+
+from alttxt import cache as cache_module
+from alttxt.cache import DiskCache, MemoryCache, ResultCache, cache_key, export_digest
+from alttxt.enums import Level
+from alttxt.pipeline import ExportError, describe, generate_bytes
+from tests.exports import DATA_DIR
+
+DATA_FILE = DATA_DIR / "movie.json"
+
+
+def test_export_digest_is_canonical() -> None:
+    export = json.loads(DATA_FILE.read_bytes())
+    digest = export_digest(DATA_FILE.read_bytes())
+
+    # Unread keys and the order of the keys do not matter
+    reordered = dict(reversed(list(export.items())))
+    reordered["rawData"] = {"items": []}
+    assert export_digest(json.dumps(reordered).encode()) == export_digest(json.dumps(export).encode())
+    assert digest != export_digest(json.dumps({**export, "sortBy": "Degree"}).encode())
+
+    key = cache_key(digest, Level.ONE)
+    assert key != cache_key(digest, Level.TWO)
+    assert key != cache_key(digest, Level.ONE, structured=True)
+    assert key != cache_key(digest, Level.ONE, title="A title")
+
+
+def test_export_digest_covers_raw_data_when_recomputed() -> None:
+    export = json.loads(DATA_FILE.read_bytes())
+    del export["processedData"]
+    items = export["rawData"]["items"]
+    halved = {**export, "rawData": {**export["rawData"], "items": dict(list(items.items())[: len(items) // 2])}}
+    raw, halved_raw = json.dumps(export).encode(), json.dumps(halved).encode()
+    assert export_digest(raw) != export_digest(halved_raw)
+
+    # The items listed by each set are left out, as they repeat the set columns of the items
+    sets = {name: {**set_, "items": []} for name, set_ in export["rawData"]["sets"].items()}
+    assert export_digest(json.dumps({**export, "rawData": {**export["rawData"], "sets": sets}}).encode()) == export_digest(raw)
+
+    cache = ResultCache()
+    assert cache.generate(raw, Level.TWO) == (generate_bytes(raw, Level.TWO), False)
+    output, hit = cache.generate(halved_raw, Level.TWO)
+    assert not hit
+    assert output == generate_bytes(halved_raw, Level.TWO) != generate_bytes(raw, Level.TWO)
+
+
+def test_cache_key_covers_generator_source(monkeypatch: pytest.MonkeyPatch) -> None:
+    digest = export_digest(DATA_FILE.read_bytes())
+    key = cache_key(digest, Level.ONE)
+    monkeypatch.setattr(cache_module, "generator_fingerprint", lambda: "changed")
+    assert cache_key(digest, Level.ONE) != key
+
+
+def test_fingerprint_covers_generator_imports() -> None:
+    # Every module of the package that pipeline imports, directly or not
+    package = Path(cache_module.__file__).parent
+    found, pending = set(), ["pipeline"]
+    while pending:
+        module = pending.pop()
+        found.add(module)
+        tree = ast.parse((package / f"{module}.py").read_text())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module and node.module.startswith("alttxt"):
+                names = [node.module.split(".")[1]] if "." in node.module else [alias.name for alias in node.names]
+                pending.extend(name for name in names if name not in found)
+    assert found == set(cache_module.GENERATOR_MODULES)
+
+
+def test_aggregated_exports_are_keyed_by_raw_data() -> None:
+    export = json.loads((DATA_FILE.parent / "agg_test.json").read_bytes())
+    items = export["rawData"]["items"]
+    halved = {**export, "rawData": {**export["rawData"], "items": dict(list(items.items())[: len(items) // 2])}}
+    raw, halved_raw = json.dumps(export).encode(), json.dumps(halved).encode()
+
+    cache = ResultCache()
+    cache.generate(raw, Level.DEFAULT)
+    output, hit = cache.generate(halved_raw, Level.DEFAULT)
+    assert not hit
+    assert output == generate_bytes(halved_raw, Level.DEFAULT) != generate_bytes(raw, Level.DEFAULT)
+
+
+def test_memory_cache_evicts_least_recently_used() -> None:
+    memory = MemoryCache(max_bytes=10)
+    memory.put("a", b"1234")
+    memory.put("b", b"1234")
+    assert memory.get("a") == b"1234"
+    memory.put("c", b"1234")
+
+    assert memory.get("b") is None
+    assert memory.get("a") == memory.get("c") == b"1234"
+    memory.put("huge", b"x" * 11)
+    assert memory.get("huge") is None
+    stats = memory.stats.as_dict()
+    assert stats == {"hits": 3, "misses": 2, "evictions": 1, "expirations": 0, "entries": 2, "bytes": 8}
+
+
+def test_disk_cache_size_and_ttl(tmp_path: Path) -> None:
+    disk = DiskCache(tmp_path, max_bytes=10, ttl=60)
+    disk.put("aa1", b"1234")
+    disk.put("aa2", b"1234")
+    old = time.time() - 30
+    os.utime(disk.path("aa1"), (old, old))
+
+    # A second instance sees the results of the first
+    assert DiskCache(tmp_path).get("aa2") == b"1234"
+    disk.put("bb3", b"1234")
+    assert disk.get("aa1") is None
+    assert disk.stats.evictions == 1
+    assert disk.stats.bytes == 8
+
+    expired = time.time() - 120
+    os.utime(disk.path("aa2"), (expired, expired))
+    assert disk.get("aa2") is None
+    assert disk.stats.expirations == 1
+    assert disk.stats.entries == 1
+
+
+def test_hits_skip_generation(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    raw = DATA_FILE.read_bytes()
+    cache = ResultCache(directory=tmp_path)
+    output, hit = cache.generate(raw, Level.DEFAULT, True)
+    assert not hit
+    assert output == generate_bytes(raw, Level.DEFAULT, True)
+
+    monkeypatch.setattr(cache_module, "generate_bytes", lambda *args: pytest.fail("generated again"))
+    assert cache.generate(raw, Level.DEFAULT, True) == (output, True)
+
+    # A new process only has the disk tier, and copies hits to memory
+    restored = pickle.loads(pickle.dumps(ResultCache(directory=tmp_path)))
+    assert restored.generate(raw, Level.DEFAULT, True) == (output, True)
+    assert restored.stats()["disk"]["hits"] == 1
+    assert restored.generate(raw, Level.DEFAULT, True) == (output, True)
+    assert restored.stats()["memory"]["hits"] == 1
+
+
+def test_memory_mapped_exports() -> None:
+    cache = ResultCache()
+    with open(DATA_FILE, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+        assert cache.generate(raw, Level.ONE) == (generate_bytes(DATA_FILE.read_bytes(), Level.ONE), False)
+    assert cache.generate(DATA_FILE.read_bytes(), Level.ONE)[1]
+
+
+def test_errors_are_not_cached() -> None:
+    cache = ResultCache()
+    for _ in range(2):
+        with pytest.raises(ExportError):
+            cache.generate(b"not json", Level.ONE)
+    assert cache.stats()["memory"]["entries"] == 0
+
+
+def test_describe_with_cache(tmp_path: Path) -> None:
+    cache = ResultCache(max_memory_bytes=0, directory=tmp_path)
+    first = describe(DATA_FILE, Level.TWO, cache=cache)
+    second = describe(DATA_FILE, Level.TWO, cache=cache)
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert first["output"] == second["output"] == describe(DATA_FILE, Level.TWO)["output"]
+    assert set(second["timings"]) == {"lookup", "total"}
@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+import pytest
+
+from alttxt import client, daemon as daemon_module
+from alttxt.__main__ import main
+from alttxt.daemon import is_running
+from tests.exports import DATA_DIR
+
+if TYPE_CHECKING:
+    from alttxt.daemon import Daemon
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="The daemon needs Unix domain sockets and fork")
+
+
+@pytest.fixture
+def daemon(tmp_path: Path) -> Iterator["Daemon"]:
+    daemon = daemon_module.Daemon(str(tmp_path / "alttxt.sock"))
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield daemon
+    finally:
+        daemon.shutdown()
+        thread.join()
+        daemon.server_close()
+
+
+@pytest.mark.parametrize("args", [["-l", "1"], ["-l", "2"], ["-l", "default", "-st"]])
+def test_client_matches_command_line(daemon: "Daemon", capsys: pytest.CaptureFixture, args: "list[str]") -> None:
+    argv = ["-D", str(DATA_DIR / "movie.json"), *args]
+    assert main(argv) == 0
+    expected = capsys.readouterr().out
+
+    assert client.main(argv, daemon.socket_path) == 0
+    assert capsys.readouterr().out == expected
+
+
+def test_relative_paths_use_client_directory(
+    daemon: "Daemon", capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(DATA_DIR)
+    assert client.main(["-D", "movie.json", "-l", "1"], daemon.socket_path) == 0
+    assert capsys.readouterr().out
+
+
+def test_exit_status_and_errors(daemon: "Daemon", capsys: pytest.CaptureFixture) -> None:
+    assert client.main(["--no-such-flag"], daemon.socket_path) == 2
+    assert "usage" in capsys.readouterr().err
+
+
+def test_shutdown(tmp_path: Path) -> None:
+    daemon = daemon_module.Daemon(str(tmp_path / "alttxt.sock"))
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    assert client.request({"command": "ping"}, daemon.socket_path)["exit"] == 0
+    assert client.request({"command": "shutdown"}, daemon.socket_path)["exit"] == 0
+    thread.join(5)
+    assert not thread.is_alive()
+    daemon.server_close()
+    assert not is_running(daemon.socket_path)
+
+
+def test_calls_run_in_a_child(daemon: "Daemon", tmp_path: Path) -> None:
+    # A title that looks like a command is still a call, run away from the daemon's process
+    cwd = os.getcwd()
+    argv = ["-t", "shutdown", "-D", str(DATA_DIR / "movie.json"), "-l", "1"]
+    response = client.request({"argv": argv, "cwd": str(tmp_path)}, daemon.socket_path)
+    assert response["exit"] == 0 and response["stdout"]
+    assert os.getcwd() == cwd
+    assert client.request({"command": "ping"}, daemon.socket_path)["pid"] == os.getpid()
+
+
+def test_invalid_requests(daemon: "Daemon") -> None:
+    for message in ([1, 2], {"command": "boop"}, {"argv": []}):
+        response = client.request(message, daemon.socket_path)  # type: ignore[arg-type]
+        assert response["exit"] == 2
+        assert response["stderr"].startswith("Invalid daemon request")
+
+
+def test_falls_back_without_daemon(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    argv = ["-D", str(DATA_DIR / "movie.json"), "-l", "1"]
+    assert client.main(argv, str(tmp_path / "missing.sock")) == 0
+    fallback = capsys.readouterr().out
+    main(argv)
+    assert fallback == capsys.readouterr().out
+
+
+def test_falls_back_without_unix_sockets(
+    daemon: "Daemon", capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # As on Windows, where the client cannot reach a daemon
+    monkeypatch.setattr(client, "DAEMON_SUPPORTED", False)
+    argv = ["-D", str(DATA_DIR / "movie.json"), "-l", "1"]
+    with pytest.raises(OSError):
+        client.request({"command": "ping"}, daemon.socket_path)
+    assert client.main(argv, daemon.socket_path) == 0
+    fallback = capsys.readouterr().out
+    main(argv)
+    assert fallback == capsys.readouterr().out
+
+
+def test_stale_socket_is_replaced(tmp_path: Path) -> None:
+    path = tmp_path / "alttxt.sock"
+    path.touch()
+    assert not is_running(str(path))
+    daemon_module.Daemon(str(path)).server_close()
+    assert not path.exists()
@@ -0,0 +1,78 @@
+import pytest
+
+from alttxt import phrases
+from alttxt.__main__ import main
+from alttxt.dependencies import (
+    DATA_TOKENS, GRAMMAR_TOKENS, TOKEN_COSTS, TOKEN_INPUTS, DependencyGraph, dependency_graph, reachable_tokens,
+    stale_tokens,
+)
+from alttxt.enums import Level
+from alttxt.generator import AltTxtGen
+from alttxt.parser import Parser
+from alttxt.tokenmap import TokenMap
+from tests.exports import DATA_DIR
+
+DATA_FILE = DATA_DIR / "movie.json"
+
+
+def test_level_one_tokens() -> None:
+    assert reachable_tokens(Level.ONE) == {
+        "visible_set_count",
+        "highest_dominant_set",
+        "largest_intersections",
+        "two_set_intersection",
+        "other_large_intersections",
+        "all_set_index",
+        "dataset_description",
+        "set_count",
+        "universal_set_size",
+    }
+
+
+def test_structured_adds_phrases_only_at_default_level() -> None:
+    assert dependency_graph(Level.ONE, True).tokens == dependency_graph(Level.ONE).tokens
+    assert reachable_tokens(Level.DEFAULT) <= reachable_tokens(Level.DEFAULT, True)
+    assert ("AltText",) in dependency_graph(Level.DEFAULT, True).phrases
+
+
+def test_every_token_has_a_cost() -> None:
+    tokenmap = TokenMap(Parser(DATA_FILE, streaming=True).get_data(), Parser(DATA_FILE).get_grammar())
+    assert set(tokenmap.map) == set(TOKEN_COSTS)
+    for level in Level:
+        assert reachable_tokens(level, True) <= set(TOKEN_COSTS)
+
+
+def test_every_token_has_inputs() -> None:
+    tokenmap = TokenMap(Parser(DATA_FILE, streaming=True).get_data(), Parser(DATA_FILE).get_grammar())
+    assert set(tokenmap.map) == set(TOKEN_INPUTS)
+    assert DATA_TOKENS | GRAMMAR_TOKENS == set(TOKEN_INPUTS)
+    assert {"bookmark_list", "degree_filters", "set_query", "list_max_5int"} <= GRAMMAR_TOKENS
+    assert {"universal_set_size", "list_set_names"} <= DATA_TOKENS
+    assert stale_tokens(["bookmarked_intersections"]) == {"bookmark_list"}
+
+
+def test_undefined_symbols_have_no_dependencies() -> None:
+    descriptions = dict(phrases.DESCRIPTIONS)
+    descriptions["symbols"] = {}
+    graph = DependencyGraph(Level.ONE, descriptions=descriptions)
+    assert graph.symbols["l1_desc"] == ((), ())
+
+
+@pytest.mark.parametrize("level", list(Level))
+@pytest.mark.parametrize("structured", [False, True])
+def test_restricted_tokenmap_renders_the_same_text(level: Level, structured: bool) -> None:
+    parser = Parser(DATA_FILE, streaming=True)
+    grammar = parser.get_grammar()
+    full = TokenMap(parser.get_data(), grammar)
+    restricted = TokenMap(parser.get_data(), grammar, tokens=dependency_graph(level, structured).tokens)
+
+    assert set(restricted.map) == reachable_tokens(level, structured)
+    assert AltTxtGen(level, structured, restricted, grammar).text == AltTxtGen(level, structured, full, grammar).text
+
+
+def test_cli_prints_graph_without_data(capsys: pytest.CaptureFixture) -> None:
+    assert main(["--dependencies", "-l", "1"]) == 0
+    output = capsys.readouterr().out
+    assert output.startswith("level=1 structured=False tokens=9")
+    assert "level_1/dataset_properties\n  [[l1_desc]]" in output
+    assert "{{highest_dominant_set}}  O(n s)" in output
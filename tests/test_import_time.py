@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+from typing import Dict, List
+
+import pytest
+
+from tests.exports import DATA_DIR
+
+# Seconds that importing everything the Level 1 path of the command line needs may take.
+# Set ALTTXT_IMPORT_BUDGET to adjust it for slower machines.
+IMPORT_BUDGET = float(os.environ.get("ALTTXT_IMPORT_BUDGET", "0.75"))
+# The budget is checked against the fastest of a few runs, to leave out noise
+RUNS = 3
+
+HEAVY_MODULES = ("numpy", "pydantic", "scipy")
+
+
+def import_times(*args: str) -> "Dict[str, int]":
+    """
+    Runs the command line in a new interpreter with -X importtime and returns
+    the cumulative import time, in microseconds, of each imported module.
+    Names of modules imported by another module keep their indentation.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "alttxt", *args], capture_output=True, text=True
+    )
+    times: "Dict[str, int]" = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def imported(*args: str) -> "List[str]":
+    return [name.strip() for name in import_times(*args)]
+
+
+@pytest.mark.parametrize("args", [["--version"], ["--help"], ["--no-such-flag"]])
+def test_help_and_version_skip_heavy_imports(args: "List[str]") -> None:
+    modules = imported(*args)
+    for module in HEAVY_MODULES:
+        assert module not in modules
+
+
+def test_level_1_skips_unused_modules() -> None:
+    modules = imported("-D", str(DATA_DIR / "movie.json"), "-l", "1")
+    assert "alttxt.pipeline" in modules
+    for module in ("scipy", "alttxt.trend", "alttxt.regionclass", "alttxt.cache", "alttxt.batch", "alttxt.snapshot"):
+        assert module not in modules
+
+
+def test_level_1_import_budget() -> None:
+    totals = []
+    for _ in range(RUNS):
+        times = import_times("-D", str(DATA_DIR / "movie.json"), "-l", "1")
+        # Nested imports are counted in the cumulative time of the top-level import that caused them
+        top_level = [cumulative for name, cumulative in times.items() if not name.startswith(" ")]
+        totals.append(sum(top_level) / 1e6)
+    assert min(totals) <= IMPORT_BUDGET, f"Importing the Level 1 path took {min(totals):.3f} s"
@@ -0,0 +1,110 @@
+import json
+
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+
+from alttxt.intersections import SetBitmaps, attribute_stats, element_name
+from alttxt.parser import Parser
+from alttxt.pipeline import parse, parse_bytes
+from tests.exports import DATA_DIR, DATA_FILES
+
+# Exports in the current format, whose processedData can be compared against
+EXPORTS = [path for path in DATA_FILES if path.name != "agg_test.json"]
+
+
+def by_membership(values: "Dict[str, Any]") -> "Dict[frozenset, Dict[str, Any]]":
+    return {
+        frozenset(name for name, status in subset["setMembership"].items() if status == "Yes"): subset
+        for subset in values.values()
+    }
+
+
+def test_names() -> None:
+    assert element_name([]) == "Unincluded"
+    assert element_name(["A"]) == "Just A"
+    assert element_name(["A", "B"]) == "A, and B"
+    assert element_name(["A", "B", "C"]) == "A, B, and C"
+
+
+def test_matches_brute_force() -> None:
+    rng = np.random.default_rng(0)
+    columns = rng.random((1001, 5)) < [0.1, 0.3, 0.5, 0.02, 0.9]
+    bitmaps = SetBitmaps.from_columns([f"Set_{i}" for i in range(5)], columns)
+    assert bitmaps.set_sizes().tolist() == columns.sum(axis=0).tolist()
+
+    intersections = bitmaps.intersections(include_empty=True)
+    assert len(intersections) == 32
+    rates = columns.mean(axis=0)
+    for row, combination in enumerate(product([False, True], repeat=5)):
+        member = np.array(combination[::-1])
+        mask = sum(1 << bit for bit in range(5) if member[bit])
+        assert int(intersections.masks[row]) == mask
+        size = int((columns == member).all(axis=1).sum())
+        assert intersections.sizes[row] == size
+        assert intersections.degrees[row] == member.sum()
+        expected = np.prod(np.where(member, rates, 1 - rates))
+        assert intersections.deviations[row] == pytest.approx((size / 1001 - expected) * 100)
+
+
+def test_attribute_stats() -> None:
+    rng = np.random.default_rng(1)
+    groups = rng.integers(0, 4, 200)
+    values = rng.normal(size=200)
+    stats = attribute_stats(groups, values, 4)
+    for group in range(4):
+        group_values = values[groups == group]
+        assert stats["mean"][group] == pytest.approx(group_values.mean())
+        assert stats["min"][group] == group_values.min()
+        assert stats["third"][group] == pytest.approx(np.quantile(group_values, 0.75))
+
+
+@pytest.mark.parametrize("path", EXPORTS, ids=lambda path: path.name)
+def test_matches_exports(path: Path) -> None:
+    export = json.loads(path.read_text())
+    bitmaps = SetBitmaps.from_raw_data(export["rawData"])
+    assert {entry["name"]: entry["size"] for entry in export["allSets"]} == dict(
+        zip(bitmaps.set_ids, bitmaps.set_sizes().tolist())
+    )
+
+    computed = by_membership(bitmaps.intersections(export["visibleSets"]).export_values())
+    for members, subset in by_membership(export["processedData"]["values"]).items():
+        recomputed = computed[members]
+        assert recomputed["size"] == subset["size"]
+        deviation = subset["attributes"].get("deviation", subset.get("deviation"))
+        assert recomputed["attributes"]["deviation"] == pytest.approx(deviation)
+        for name, stats in subset["attributes"].items():
+            if name != "deviation":
+                assert recomputed["attributes"][name]["mean"] == pytest.approx(stats["mean"])
+
+
+def test_recompute_stale_export() -> None:
+    export = json.loads((DATA_DIR / "movie.json").read_text())
+    original = parse(json.loads((DATA_DIR / "movie.json").read_text()))[1]
+    stale = export["accessibleProcessedData"]["values"]["Subset_Action"]
+    stale["size"] = 1
+
+    data = Parser(export, recompute=True).get_data()
+    assert dict(zip(data.subset_table.name, data.subset_table.size)) == dict(
+        zip(original.subset_table.name, original.subset_table.size)
+    )
+    assert data.all_subset_table.degree.tolist() == data.all_subset_table.popcount().tolist()
+
+
+def test_export_without_processed_data(tmp_path: Path) -> None:
+    export = json.loads((DATA_DIR / "movies_with_bookmarks_selection.json").read_text())
+    del export["processedData"], export["accessibleProcessedData"]
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(export))
+
+    grammar, data = parse(path)
+    assert grammar.bookmarked_intersections
+    assert len(data.subsets) == 96
+    assert parse_bytes(path.read_bytes())[1].subset_table == data.subset_table
+
+    del export["rawData"]
+    with pytest.raises(Exception, match="rawData"):
+        Parser(export)
@@ -0,0 +1,106 @@
+import json
+import pstats
+import subprocess
+import sys
+import tracemalloc
+
+from pathlib import Path
+
+import pytest
+
+from alttxt.dependencies import reachable_tokens
+from alttxt.enums import Level
+from alttxt.pipeline import describe, generate, parse, profile_bytes
+from alttxt.profiling import Profile, sampled
+from tests.exports import DATA_DIR
+
+STAGES = ["load_data", "parse_grammar", "parse_data", "tokenmap", "render"]
+
+
+def test_stages_accumulate() -> None:
+    profile = Profile()
+    for _ in range(2):
+        with profile.stage("work"):
+            sum(range(10000))
+    assert profile.token("answer", lambda x: x * 2, 21) == 42
+    result = profile.as_dict()
+    assert list(result["stages"]) == ["work"]
+    assert list(result["tokens"]) == ["answer"]
+    assert result["total"]["wall"] == result["stages"]["work"]["wall"] > 0
+
+
+@pytest.mark.parametrize("level", list(Level))
+def test_profiled_run(level: Level) -> None:
+    path = DATA_DIR / "movie.json"
+    profile = Profile()
+    grammar, data = parse(path, profile=profile)
+    output = generate(grammar, data, level, profile=profile)
+    assert list(profile.stages) == STAGES
+    assert profile.tokens
+    assert set(profile.tokens) <= reachable_tokens(level)
+    # Profiling does not change the output
+    assert output == generate(*parse(path), level)
+
+
+def test_profile_bytes() -> None:
+    raw = (DATA_DIR / "movie.json").read_bytes()
+    output, profile = profile_bytes(raw, Level.ONE)
+    assert output == generate(*parse(DATA_DIR / "movie.json"), Level.ONE)
+    assert list(profile["stages"]) == STAGES
+    json.dumps(profile)
+
+
+def test_cprofile_stats(tmp_path: Path) -> None:
+    profile = Profile(cprofile=True)
+    generate(*parse(DATA_DIR / "movie.json", profile=profile), Level.TWO, profile=profile)
+    profile.dump_stats(tmp_path / "run.prof")
+    assert pstats.Stats(str(tmp_path / "run.prof")).total_calls > 0
+
+    with pytest.raises(ValueError):
+        Profile().dump_stats(tmp_path / "none.prof")
+
+
+def test_memory_profile() -> None:
+    path = DATA_DIR / "movie.json"
+    profile = Profile(memory=True)
+    assert tracemalloc.is_tracing()
+    try:
+        generate(*parse(path, profile=profile), Level.DEFAULT, profile=profile)
+    finally:
+        profile.close()
+    assert not tracemalloc.is_tracing()
+
+    memory = profile.as_dict()["memory"]
+    assert list(memory) == STAGES
+    for usage in memory.values():
+        assert usage["peak"] >= usage["current"] > 0
+        assert all(site["size"] > 0 and ":" in site["site"] for site in usage["top"])
+    # The decoded export is retained until it is parsed
+    assert memory["load_data"]["retained"] > 0
+    assert "memory" not in Profile().as_dict()
+
+
+def test_describe_profile() -> None:
+    record = describe(DATA_DIR / "movie.json", Level.ONE, profile=True)
+    assert record["error"] is None
+    assert list(record["profile"]["stages"]) == STAGES
+    assert "profile" not in describe(DATA_DIR / "movie.json", Level.ONE)
+
+
+def test_command_line_profile() -> None:
+    args = [sys.executable, "-m", "alttxt", "-D", str(DATA_DIR / "movie.json"), "-l", "2"]
+    plain = subprocess.run(args, capture_output=True, text=True)
+    profiled = subprocess.run(args + ["--profile"], capture_output=True, text=True)
+    assert profiled.returncode == 0
+    assert profiled.stdout == plain.stdout
+    assert list(json.loads(profiled.stderr)["stages"]) == STAGES
+
+    traced = subprocess.run(args + ["--profile-memory"], capture_output=True, text=True)
+    assert traced.stdout == plain.stdout
+    assert list(json.loads(traced.stderr)["memory"]) == STAGES
+
+
+def test_sampled() -> None:
+    assert not sampled(0.0)
+    assert sampled(1.0)
+    assert 200 < sum(sampled(0.5) for _ in range(1000)) < 800
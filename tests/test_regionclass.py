@@ -0,0 +1,91 @@
+import statistics
+
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from alttxt.parser import Parser
+from alttxt.regionclass import RegionClassification
+from alttxt.subsettable import SubsetTable
+from tests.exports import DATA_FILES
+
+
+def _reference_regions(subsets: list) -> "dict[str, set[str]]":
+    """
+    The original list-based categorization, kept as a reference.
+    """
+    sorted_subsets = sorted(subsets, key=lambda subset: subset.size, reverse=True)
+    largest = sorted_subsets.pop(0)
+    median_size = statistics.median([subset.size for subset in sorted_subsets])
+    band = abs(median_size - median_size * 1.2)
+
+    regions: "dict[str, list]" = {name: [] for name in RegionClassification.REGIONS}
+    regions["largest_data_region"].append(largest)
+    for subset in sorted_subsets:
+        deviation = subset.size - median_size
+        if deviation < 0 and abs(deviation) > band:
+            regions["small_data_region"].append(subset)
+        elif deviation == 0 or abs(deviation) <= band:
+            regions["medium_data_region"].append(subset)
+        else:
+            regions["large_data_region"].append(subset)
+
+    mapping: "dict[str, dict[str, float]]" = {}
+    for region, members in regions.items():
+        total = sum(subset.size for subset in members)
+        sizes: Counter = Counter()
+        for subset in members:
+            sizes[subset.classification] += subset.size
+        for cls, size in sizes.items():
+            value = size / total * 100 if total > 0 else 0
+            if cls.value not in mapping or value >= 35.0:
+                mapping.setdefault(cls.value, {})[region] = value
+            elif value > next(iter(mapping[cls.value].values())):
+                mapping[cls.value][region] = value
+
+    result: "dict[str, set[str]]" = {}
+    for cls, pcts in mapping.items():
+        above = {region for region, pct in pcts.items() if pct >= 35.0}
+        if len(pcts) > 1 and not above:
+            above = {max(pcts, key=pcts.get)}
+        result[cls] = above if len(pcts) > 1 else set(pcts)
+    return result
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: p.name)
+def test_matches_reference(path: Path) -> None:
+    data = Parser(path).get_data()
+    classification = RegionClassification(data.subset_table)
+
+    expected = _reference_regions(list(data.subsets))
+    assert {cls: set(regions) for cls, regions in classification.classification_regions.items()} == expected
+
+
+def test_regions_are_indexed_and_immutable() -> None:
+    table = SubsetTable(
+        ["a", "b", "c", "d", "e"], [100, 10, 10, 2, 40], [0.0] * 5, [1, 1, 2, 2, 3], [1, 1, 2, 2, 3],
+        [1, 2, 3, 6, 7], ["A", "B", "C"],
+    )
+    classification = RegionClassification(table)
+
+    assert classification.largest_row == 0
+    assert classification.rows("large_data_region").tolist() == [4]
+    assert np.flatnonzero(classification.mask("medium_data_region")).tolist() == [1, 2]
+    assert classification.rows("small_data_region").tolist() == [3]
+    assert classification.regions_of("individual set") == ("largest_data_region", "medium_data_region")
+    assert classification.regions_of("missing") == ()
+
+    with pytest.raises(ValueError):
+        classification.region[0] = 1
+    with pytest.raises(TypeError):
+        classification.classification_regions["individual set"] = ()  # type: ignore[index]
+    with pytest.raises(AttributeError):
+        classification.region = classification.region  # type: ignore[misc]
+
+
+def test_needs_two_subsets() -> None:
+    table = SubsetTable(["a"], [1], [0.0], [1], [1], [1], ["A"])
+    with pytest.raises(statistics.StatisticsError):
+        RegionClassification(table)
@@ -0,0 +1,58 @@
+import pytest
+
+from alttxt import phrases
+from alttxt.dependencies import LEVEL_PHRASES, STRUCTURED_PHRASES
+from alttxt.renderplan import GrammarError, RenderPlan, compile_phrase, render_plan
+
+SYMBOLS = {
+    "greeting": "hello [[name]]",
+    "name": "{{first}} {{last}}",
+    "empty": "",
+}
+
+
+def test_plan_expands_symbols_into_token_slots() -> None:
+    plan = compile_phrase("  [[greeting]], you have {{count}} items. [[empty]]", SYMBOLS)
+    assert plan.tokens == ("first", "last", "count")
+    assert plan.literals == ("hello ", " ", ", you have ", " items. ")
+    values = {"first": "Ada", "last": "Lovelace", "count": 3}
+    assert plan.render(values.__getitem__) == "hello Ada Lovelace, you have 3 items. "
+
+
+def test_plan_without_tokens() -> None:
+    plan = compile_phrase("no tokens", {})
+    assert plan.tokens == ()
+    assert plan.render(lambda token: pytest.fail("no tokens to resolve")) == "no tokens"
+
+
+def test_undefined_symbol() -> None:
+    with pytest.raises(GrammarError, match=r"Undefined symbol: \[\[missing\]\]"):
+        compile_phrase("[[greeting]] [[missing]]", SYMBOLS)
+
+
+def test_cyclic_symbol() -> None:
+    symbols = {"a": "x [[b]]", "b": "y [[c]]", "c": "[[a]]"}
+    with pytest.raises(GrammarError, match="Cyclic symbol: a -> b -> c -> a"):
+        compile_phrase("[[a]]", symbols)
+    with pytest.raises(GrammarError, match="Cyclic symbol: self -> self"):
+        compile_phrase("[[self]]", {"self": "again [[self]]"})
+
+
+@pytest.mark.parametrize("text", ["[[greeting", "{{count", "greeting]] [[name", "{{a}}}}"])
+def test_unbalanced_brackets(text: str) -> None:
+    with pytest.raises(GrammarError, match="Unbalanced"):
+        compile_phrase(text, SYMBOLS)
+
+
+def test_render_plan_is_shared() -> None:
+    text = phrases.DESCRIPTIONS["level_1"]["dataset_properties"]
+    assert render_plan(text) is render_plan(text)
+
+
+def test_rendered_phrases_compile() -> None:
+    paths = {path for level_paths in LEVEL_PHRASES.values() for path in level_paths} | set(STRUCTURED_PHRASES)
+    for path in paths:
+        value = phrases.DESCRIPTIONS
+        for key in path:
+            value = value[key]
+        assert isinstance(render_plan(value), RenderPlan)
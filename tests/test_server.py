@@ -0,0 +1,175 @@
+import asyncio
+import contextlib
+import http.client
+import io
+import json
+import threading
+import uuid
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import pytest
+
+from alttxt.cache import ResultCache
+from alttxt.enums import Level
+from alttxt.pipeline import generate, parse
+from alttxt.server import AltTxtServer
+from tests.exports import DATA_DIR
+
+PARAMS = {"verbosity": "high", "level": "2", "explain": "none"}
+
+
+@contextlib.contextmanager
+def running(server: AltTxtServer) -> Iterator[AltTxtServer]:
+    """
+    Runs the server on an event loop in a background thread.
+    """
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(server.close())
+        loop.close()
+
+
+@pytest.fixture
+def server() -> Iterator[AltTxtServer]:
+    with running(AltTxtServer(port=0, workers=2, threads=True, max_body=4 * 1024 * 1024, max_pending=2)) as server:
+        yield server
+
+
+def encode_multipart(fields: "Dict[str, str]", files: "Dict[str, bytes]") -> "Tuple[str, bytes]":
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, content in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.json"\r\n'
+            "Content-Type: application/json\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return f"multipart/form-data; boundary={boundary}", b"".join(parts)
+
+
+def post(
+    server: AltTxtServer, fields: "Dict[str, str]", data: Optional[bytes] = None
+) -> "Tuple[int, Dict[str, Any]]":
+    content_type, body = encode_multipart(fields, {"data": data} if data is not None else {})
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    connection.request("POST", "/api/alttxt/", body, {"Content-Type": content_type})
+    response = connection.getresponse()
+    result = response.status, json.loads(response.read())
+    connection.close()
+    return result
+
+
+def test_generates_alt_text(server: AltTxtServer) -> None:
+    path = DATA_DIR / "movie.json"
+    status, payload = post(server, {**PARAMS, "title": "A test plot"}, path.read_bytes())
+    assert status == 200
+    grammar, data = parse(path)
+    assert payload["alttxt"] == generate(grammar, data, Level.TWO, title="A test plot")
+
+    status, payload = post(server, {**PARAMS, "level": "default", "structured": "true"}, path.read_bytes())
+    assert status == 200
+    assert set(payload["alttxt"]) == {"techniqueDescription", "shortDescription", "longDescription"}
+
+
+@pytest.mark.parametrize("missing", ["verbosity", "level", "explain"])
+def test_missing_parameter(server: AltTxtServer, missing: str) -> None:
+    fields = {name: value for name, value in PARAMS.items() if name != missing}
+    status, payload = post(server, fields, (DATA_DIR / "movie.json").read_bytes())
+    assert status == 400
+    assert payload["error"] == f"Missing required parameter: {missing}"
+
+
+def test_missing_data(server: AltTxtServer) -> None:
+    assert post(server, PARAMS) == (400, {"error": "Missing required parameter: data"})
+
+
+@pytest.mark.parametrize("name", ["verbosity", "level", "explain"])
+def test_invalid_parameter(server: AltTxtServer, name: str) -> None:
+    status, payload = post(server, {**PARAMS, name: "hello"}, (DATA_DIR / "movie.json").read_bytes())
+    assert status == 400
+    assert payload["error"].startswith(f"Invalid {name}: 'hello'")
+
+
+@pytest.mark.parametrize("file_name", ["bad_agg_test.json", "bad.json", "../README.md"])
+def test_bad_data(server: AltTxtServer, file_name: str) -> None:
+    status, payload = post(server, PARAMS, (DATA_DIR / file_name).read_bytes())
+    assert status == 400
+    assert payload["error"].startswith("Could not parse the data file")
+
+
+def test_body_size_limit(server: AltTxtServer) -> None:
+    # The limit is checked before the body is read
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    connection.putrequest("POST", "/api/alttxt/")
+    connection.putheader("Content-Type", "multipart/form-data; boundary=x")
+    connection.putheader("Content-Length", str(server.max_body + 1))
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 413
+    assert response.getheader("Connection") == "close"
+    connection.close()
+
+
+def test_backpressure(server: AltTxtServer) -> None:
+    server.pending = server.max_pending
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+        content_type, body = encode_multipart(PARAMS, {"data": b"{}"})
+        connection.request("POST", "/api/alttxt/", body, {"Content-Type": content_type})
+        response = connection.getresponse()
+        assert response.status == 503
+        assert response.getheader("Retry-After") == "1"
+        connection.close()
+    finally:
+        server.pending = 0
+
+
+def test_health_and_routing(server: AltTxtServer) -> None:
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    # Several requests on one kept-alive connection
+    connection.request("GET", "/health")
+    response = connection.getresponse()
+    assert response.status == 200
+    assert json.loads(response.read())["status"] == "ok"
+
+    connection.request("GET", "/api/alttxt/")
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 405
+
+    connection.request("GET", "/nope")
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 404
+    connection.close()
+
+
+def test_cached_requests() -> None:
+    cache = ResultCache()
+    with running(AltTxtServer(port=0, workers=1, threads=True, cache=cache)) as server:
+        raw = (DATA_DIR / "movie.json").read_bytes()
+        first = post(server, PARAMS, raw)
+        assert post(server, PARAMS, raw) == first
+        assert cache.stats()["memory"]["hits"] == 1
+
+
+def test_profiles_sampled_requests() -> None:
+    log = io.StringIO()
+    server = AltTxtServer(port=0, workers=1, threads=True, max_body=4 * 1024 * 1024, profile_rate=1.0, profile_log=log)
+    with running(server):
+        status, payload = post(server, PARAMS, (DATA_DIR / "movie.json").read_bytes())
+    assert status == 200
+    record = json.loads(log.getvalue())
+    assert record["level"] == "2"
+    assert set(record["profile"]["stages"]) == {"load_data", "parse_grammar", "parse_data", "tokenmap", "render"}
+    assert server.profiled == 1
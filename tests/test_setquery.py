@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from alttxt.enums import Level
+from alttxt.models import SetQueryModel
+from alttxt.pipeline import generate, parse
+from alttxt.setquery import evaluate_queries, evaluate_query, match_masks, query_masks, with_set_query
+from tests.exports import DATA_DIR
+
+QUERY_FILE = DATA_DIR / "movies_set_query_test.json"
+
+QUERIES = [
+    SetQueryModel(name="drama", query={"Drama": "Yes", "Children": "No", "Comedy": "May"}),
+    SetQueryModel(name="no comedy", query={"Comedy": "No", "Drama": "No"}),
+    SetQueryModel(name="pair", query={"Action": "Yes", "Adventure": "Yes"}),
+    SetQueryModel(name="unknown", query={"Nonexistent": "Yes"}),
+    SetQueryModel(name="empty", query={}),
+]
+
+
+def brute_force(table, query: SetQueryModel) -> "list[int]":
+    rows = []
+    for row in range(len(table)):
+        membership = table.membership(row)
+        if all((name in membership) == (status == "Yes") for name, status in query.query.items() if status != "May"):
+            rows.append(row)
+    return rows
+
+
+def test_query_masks() -> None:
+    bits = {"A": 0, "B": 1, "C": 2}.get
+    assert query_masks({"A": "Yes", "B": "No", "C": "May"}, lambda name: bits(name, -1)) == (0b001, 0b010)
+    assert query_masks({"D": "No"}, lambda name: bits(name, -1)) == (0, 0)
+    assert query_masks({"D": "Yes"}, lambda name: bits(name, -1)) is None
+
+    masks = np.array([0b000, 0b001, 0b011, 0b101], dtype=np.uint64)
+    matches = match_masks(masks, [(0b001, 0b010), None, (0, 0)])
+    assert matches[:, 0].tolist() == [False, True, False, True]
+    assert not matches[:, 1].any()
+    assert matches[:, 2].all()
+    assert (match_masks(masks.astype(object), [(0b001, 0b010), None, (0, 0)]) == matches).all()
+
+
+def test_evaluate_queries() -> None:
+    _, data = parse(QUERY_FILE, recompute=True)
+    table = data.all_subset_table
+    results = evaluate_queries(table, QUERIES + [None])
+    for query, result in zip(QUERIES + [None], results):
+        rows = brute_force(table, query) if query else list(range(len(table)))
+        assert result.rows.tolist() == rows
+        sizes = table.size[rows]
+        assert result.count == len(rows)
+        assert result.non_empty == int((sizes > 0).sum())
+        assert result.size == sizes.sum()
+        assert result.dev == pytest.approx(table.dev[rows].sum())
+        if rows:
+            assert table.size[result.largest] == sizes.max()
+            assert result.median == np.median(sizes)
+        else:
+            assert result.largest == -1 and np.isnan(result.median)
+    assert evaluate_query(table, QUERIES[0]).rows.tolist() == results[0].rows.tolist()
+
+
+def test_recompute_applies_set_query() -> None:
+    grammar, exported = parse(QUERY_FILE)
+    _, recomputed = parse(QUERY_FILE, recompute=True)
+    assert len(recomputed.all_subset_table) > len(exported.all_subset_table)
+    assert sorted(recomputed.subset_table.name) == sorted(exported.subset_table.name)
+    assert evaluate_query(recomputed.all_subset_table, grammar.set_query).count == len(exported.subset_table)
+
+
+def test_with_set_query() -> None:
+    grammar, data = parse(QUERY_FILE, recompute=True)
+    query = QUERIES[1]
+    queried_grammar, queried_data = with_set_query(grammar, data, query)
+    assert queried_grammar.set_query == query
+    assert queried_data.all_subset_table is data.all_subset_table
+    table = queried_data.subset_table
+    assert len(table) and not (table.contains_set("Comedy") | table.contains_set("Drama")).any()
+    assert "must not contain Comedy or Drama" in generate(queried_grammar, queried_data, Level.TWO)
+
+    unqueried_grammar, unqueried_data = with_set_query(grammar, data, None)
+    assert len(unqueried_data.subset_table) > max(len(data.subset_table), len(table))
+    assert "No set query is active" in generate(unqueried_grammar, unqueried_data, Level.TWO)
@@ -0,0 +1,101 @@
+import ast
+import json
+import shutil
+
+from pathlib import Path
+
+import pytest
+
+from alttxt import snapshot
+from alttxt.models import DataModel
+from alttxt.parser import Parser
+from alttxt.snapshot import SnapshotError, SnapshotStore, dumps, file_digest, loads
+from alttxt.subsettable import SubsetTable
+from tests.exports import DATA_DIR, DATA_FILES
+
+
+def _parse(path: Path, snapshot_dir: "Path | None" = None) -> Parser:
+    return Parser(path, streaming=True, snapshot_dir=snapshot_dir)
+
+
+def _assert_same(first: DataModel, second: DataModel) -> None:
+    assert first.subset_table == second.subset_table
+    assert first.all_subset_table == second.all_subset_table
+    assert (first.count, first.sets, first.sizes, first.all_sets_length) == (
+        second.count, second.sets, second.sizes, second.all_sets_length
+    )
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: p.name)
+def test_round_trip(path: Path) -> None:
+    upset_parser = _parse(path)
+    grammar, data = upset_parser.get_grammar(), upset_parser.get_data()
+    loaded_grammar, loaded_data = loads(dumps(grammar, data))
+    assert loaded_grammar == grammar
+    _assert_same(loaded_data, data)
+
+
+def test_wide_masks_round_trip() -> None:
+    upset_parser = _parse(DATA_DIR / "movie.json")
+    set_names = [f"Set {i}" for i in range(70)]
+    table = SubsetTable(["wide"], [3], [0.5], [2], [0], [(1 << 69) | 1], set_names)
+    data = DataModel(count=[3], sets=set_names, sizes={}, subset_table=table, all_subset_table=table, all_sets_length=70)
+    _, loaded = loads(dumps(upset_parser.get_grammar(), data))
+    assert loaded.subset_table.mask.dtype == object
+    _assert_same(loaded, data)
+
+
+def test_parser_writes_then_loads_snapshot(tmp_path: Path) -> None:
+    export = tmp_path / "export.json"
+    shutil.copy(DATA_DIR / "movie.json", export)
+    snapshots = tmp_path / "snapshots"
+
+    first = _parse(export, snapshots)
+    assert not first.from_snapshot
+    assert SnapshotStore(snapshots).path(file_digest(export)).exists()
+
+    second = _parse(export, snapshots)
+    assert second.from_snapshot
+    assert second.get_grammar() == first.get_grammar()
+    _assert_same(second.get_data(), first.get_data())
+
+    # A changed file gets a new snapshot
+    content = json.loads(export.read_bytes())
+    content["sortBy"] = "Degree"
+    export.write_text(json.dumps(content))
+    changed = _parse(export, snapshots)
+    assert not changed.from_snapshot
+    assert changed.get_grammar().sort_by != first.get_grammar().sort_by
+
+
+def test_other_parser_versions_are_ignored(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _parse(DATA_DIR / "movie.json", tmp_path)
+    monkeypatch.setattr(snapshot, "parser_fingerprint", lambda: "another version")
+    with pytest.raises(SnapshotError, match="another version of the parser"):
+        loads(SnapshotStore(tmp_path).path(file_digest(DATA_DIR / "movie.json")).read_bytes())
+    assert not _parse(DATA_DIR / "movie.json", tmp_path).from_snapshot
+
+
+def test_fingerprint_covers_parser_imports() -> None:
+    # Every module of the package the parser imports, directly or not, except the snapshots themselves
+    package = Path(snapshot.__file__).parent
+    found, pending = set(), ["parser"]
+    while pending:
+        module = pending.pop()
+        found.add(module)
+        tree = ast.parse((package / f"{module}.py").read_text())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module and node.module.startswith("alttxt"):
+                names = [node.module.split(".")[1]] if "." in node.module else [alias.name for alias in node.names]
+                pending.extend(name for name in names if name not in found and name != "snapshot")
+    assert found == set(snapshot.PARSER_MODULES)
+
+
+def test_corrupt_snapshots_are_reparsed(tmp_path: Path) -> None:
+    _parse(DATA_DIR / "movie.json", tmp_path)
+    path = SnapshotStore(tmp_path).path(file_digest(DATA_DIR / "movie.json"))
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(SnapshotError):
+        loads(path.read_bytes())
+    assert not _parse(DATA_DIR / "movie.json", tmp_path).from_snapshot
+    assert _parse(DATA_DIR / "movie.json", tmp_path).from_snapshot
@@ -0,0 +1,93 @@
+import json
+
+from pathlib import Path
+
+import pytest
+
+from alttxt import jsonstream
+from alttxt.parser import PARSED_KEYS, Parser
+from tests.exports import ALL_DATA_FILES, DATA_DIR
+
+
+@pytest.mark.parametrize("path", ALL_DATA_FILES, ids=lambda p: p.name)
+def test_load_keys_matches_json(path: Path) -> None:
+    full = json.loads(path.read_bytes())
+    expected = {key: full[key] for key in PARSED_KEYS if key in full}
+    assert jsonstream.load_file_keys(path, PARSED_KEYS) == expected
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        {"a": 'quoted \\" and {brackets} [inside] strings\\\\', "b": [1, {"c": None}]},
+        {"nested": [[[{"x": '\\\"'}]]], "after": True},
+        {},
+    ],
+)
+def test_load_keys_skips_values(doc: dict) -> None:
+    buf = json.dumps(doc, indent=1).encode()
+    for key in doc:
+        assert jsonstream.load_keys(buf, [key]) == {key: doc[key]}
+
+
+@pytest.mark.parametrize("buf", [b"", b"[1]", b'{"a" 1}', b'{"a": [1, 2', b'{"a": "x'])
+def test_load_keys_invalid(buf: bytes) -> None:
+    with pytest.raises(ValueError):
+        jsonstream.load_keys(buf, ["a"])
+
+
+def test_load_keys_skip_paths() -> None:
+    doc = {
+        "values": {
+            "a": {"id": "a", "items": ["x", "y\\\"z"], "size": 2},
+            "b": {"items": [], "attributes": {"items": 1}},
+        },
+        "order": ["a", "b"],
+    }
+    buf = json.dumps({"data": doc, "other": [1]}).encode()
+    stats = jsonstream.SkipStats()
+
+    result = jsonstream.load_keys(buf, ["data"], [("data", "values", "*", "items")], stats)
+
+    assert result == {
+        "data": {
+            "values": {"a": {"id": "a", "size": 2}, "b": {"attributes": {"items": 1}}},
+            "order": ["a", "b"],
+        }
+    }
+    assert (stats.fields, stats.strings) == (2, 2)
+
+
+@pytest.mark.parametrize(
+    "path", [DATA_DIR / "movies_with_bookmarks_selection.json", DATA_DIR / "orgs.json"], ids=lambda p: p.name
+)
+def test_skip_paths_decoded_whole(path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Values whose dropped fields are a small part of them are decoded whole, then pruned
+    paths = [("processedData", "values", "*", "items"), ("rowSelection", "items")]
+    results = []
+    for fraction in (0.0, 2.0):
+        monkeypatch.setattr(jsonstream, "SPLICE_MIN_FRACTION", fraction)
+        stats = jsonstream.SkipStats()
+        results.append((jsonstream.load_file_keys(path, PARSED_KEYS, paths, stats), stats.fields, stats.strings))
+    assert results[0] == results[1]
+
+
+def test_streaming_parser_skips_items() -> None:
+    path = DATA_DIR / "movies_with_bookmarks_selection.json"
+    upset_parser = Parser(path, streaming=True)
+    full = json.loads(path.read_bytes())
+
+    assert all("items" not in subset for subset in upset_parser.data["processedData"]["values"].values())
+    assert "items" not in upset_parser.data["rowSelection"]
+    assert upset_parser.skip_stats is not None
+    assert upset_parser.skip_stats.strings == (
+        sum(len(subset["items"]) for subset in full["processedData"]["values"].values())
+        + len(full["rowSelection"]["items"])
+    )
+
+
+def test_streaming_parser_matches_default() -> None:
+    path = DATA_DIR / "movies_with_bookmarks_selection.json"
+    default, streaming = Parser(path), Parser(path, streaming=True)
+    assert streaming.get_grammar() == default.get_grammar()
+    assert streaming.get_data() == default.get_data()
@@ -0,0 +1,137 @@
+import json
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from alttxt.enums import IntersectionType
+from alttxt.models import Subset
+from alttxt.parser import Parser, needs_raw_data
+from alttxt.subsettable import SortIndex, SubsetTable
+from tests.exports import DATA_FILES
+
+
+def _subsets() -> "list[Subset]":
+    return [
+        Subset(name="A", size=5, dev=1.5, degree=1,
+               classification=IntersectionType.INDIVIDUAL, setMembership={"A"}),
+        Subset(name="A & B", size=0, dev=-0.25, degree=2,
+               classification=IntersectionType.LOW_SET, setMembership={"A", "B"}),
+    ]
+
+
+def test_table_columns() -> None:
+    table = SubsetTable.from_subsets(_subsets(), ["A", "B"])
+    assert len(table) == 2
+    assert table.size.tolist() == [5, 0]
+    assert table.dev.tolist() == [1.5, -0.25]
+    assert table.mask.tolist() == [0b01, 0b11]
+    assert table.membership(1) == {"A", "B"}
+    with pytest.raises(ValueError):
+        table.size[0] = 1
+
+
+def test_view_matches_subsets() -> None:
+    subsets = _subsets()
+    view = SubsetTable.from_subsets(subsets).subsets
+    assert list(view) == subsets
+    assert view[-1] == subsets[-1]
+    assert view[:1] == subsets[:1]
+    # Subset objects are built once per row
+    assert view[0] is view[0]
+
+
+def test_wide_masks() -> None:
+    names = [f"S{i}" for i in range(70)]
+    table = SubsetTable(["all"], [1], [0.0], [70], [0], [(1 << 70) - 1], names)
+    assert table.mask.dtype == object
+    assert table.membership(0) == set(names)
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: p.name)
+def test_parsed_table_matches_export(path: Path) -> None:
+    data = json.loads(path.read_bytes())
+    model = Parser(path).get_data()
+
+    values = data["processedData"]["values"]
+    table = model.all_subset_table
+    assert np.array_equal(table.size, model.count)
+    expected = [
+        (
+            {
+                Parser.trim_set_name(None, name)  # type: ignore[arg-type]
+                for name, status in item["setMembership"].items()
+                if status == "Yes"
+            },
+            item["size"],
+        )
+        for item in values.values()
+    ]
+    found = [(table.membership(row), int(table.size[row])) for row in range(len(table))]
+    if needs_raw_data(data):
+        # Recomputed from rawData, which may hold subsets the export left out
+        assert all(subset in found for subset in expected)
+    else:
+        assert found == expected
+
+
+def _query_table(masks: "list[int]", set_names: "list[str]") -> SubsetTable:
+    n = len(masks)
+    return SubsetTable([str(m) for m in masks], [1] * n, [0.0] * n, [0] * n, [0] * n, masks, set_names)
+
+
+@pytest.mark.parametrize("wide", [False, True], ids=["uint64", "object"])
+def test_membership_queries(wide: bool) -> None:
+    set_names = ["A", "B-c", "D"] + [f"S{i}" for i in range(70 if wide else 0)]
+    table = _query_table([0b000, 0b001, 0b011, 0b111, 0b110], set_names)
+
+    assert table.contains_set("A").tolist() == [False, True, True, True, False]
+    # Underscores match the hyphens of visible subset set names
+    assert table.contains_set("B_c").tolist() == [False, False, True, True, True]
+    assert table.contains_all(["A", "D"]).tolist() == [False, False, False, True, False]
+    assert table.contains_all([]).all()
+    assert not table.contains_set("missing").any()
+    assert table.popcount().tolist() == [0, 1, 2, 3, 2]
+    assert table.set_counts()[:3].tolist() == [3, 3, 2]
+    assert table.set_counts(table.popcount() > 1)[:3].tolist() == [2, 3, 2]
+    assert table.member_names(4) == ["B-c", "D"]
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: p.name)
+def test_popcount_matches_degree(path: Path) -> None:
+    table = Parser(path).get_data().subset_table
+    assert np.array_equal(table.popcount(), table.degree)
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: p.name)
+def test_sort_index_matches_sorted(path: Path) -> None:
+    model = Parser(path).get_data()
+    index = model.subset_table.sort_index
+    rows = list(range(len(model.subsets)))
+
+    for field in SortIndex.COLUMNS:
+        for descending in (False, True):
+            expected = sorted(rows, key=lambda row: getattr(model.subsets[row], field), reverse=descending)
+            assert index.order(field, descending).tolist() == expected
+            assert index.rank(field, descending)[expected].tolist() == rows
+
+
+def test_sort_index_statistics() -> None:
+    table = SubsetTable(
+        ["b", "a", "d", "c"], [3, 1, 3, 2], [0.5, -2.0, 1.0, 0.0], [1] * 4, [0] * 4, [1, 2, 4, 8], ["A", "B", "C", "D"]
+    )
+    index = table.sort_index
+
+    assert index.order("size", True).tolist() == [0, 2, 3, 1]
+    assert index.top("size", 2).tolist() == [0, 2]
+    assert index.order("name").tolist() == [1, 0, 3, 2]
+    assert index.median("size") == 2.5
+    assert index.percentile("size", 25) == 2
+    assert index.percentile("dev", 0) == -2.0
+    assert index.first("size", table.name == "c") == 2
+    assert index.first("size", table.size > 5) == -1
+    # Orders are computed once
+    assert index.order("size", True) is index.order("size", True)
+    with pytest.raises(ValueError):
+        index.order("classification")
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pytest
+
+from alttxt.enums import Level, SortBy, SortOrder
+from alttxt.pipeline import generate, parse
+from alttxt.synthetic import main, synthetic_export
+
+
+def test_export_is_consistent() -> None:
+    export = synthetic_export(sets=6, visible_sets=5, items=500, intersections=20, seed=3)
+    values = export["processedData"]["values"]
+    assert list(values) == export["processedData"]["order"] == list(export["accessibleProcessedData"]["values"])
+    assert len(values) == 21
+    assert sum(subset["size"] for subset in values.values()) == 500
+    assert [subset["size"] for subset in values.values()] == sorted((s["size"] for s in values.values()), reverse=True)
+
+    raw = export["rawData"]
+    for entry in export["allSets"]:
+        assert entry["size"] == raw["sets"][entry["name"]]["size"]
+    for subset in values.values():
+        assert len(subset["items"]) == subset["size"]
+        members = [name for name, status in subset["setMembership"].items() if status == "Yes"]
+        item = raw["items"][subset["items"][0]]
+        assert [name for name in subset["setMembership"] if item[name[len("Set_"):]]] == members
+        values_1 = [raw["items"][item_id]["Attr1"] for item_id in subset["items"]]
+        assert subset["attributes"]["Attr1"]["median"] == pytest.approx(np.median(values_1))
+        assert subset["attributes"]["Attr1"]["first"] == pytest.approx(np.quantile(values_1, 0.25))
+
+
+def test_seeded() -> None:
+    assert synthetic_export(seed=1) == synthetic_export(seed=1)
+    assert synthetic_export(seed=1) != synthetic_export(seed=2)
+
+
+@pytest.mark.parametrize("sort_by", list(SortBy))
+def test_parses(sort_by: SortBy) -> None:
+    export = synthetic_export(
+        sets=12, items=2000, intersections=100, sort_by=sort_by, sort_order=SortOrder.ASCENDING,
+        bookmarks=3, selection=True, set_query=True,
+    )
+    grammar, data = parse(export)
+    assert grammar.sort_by == sort_by
+    assert len(grammar.bookmarked_intersections) == 3
+    assert grammar.selected_intersection is not None
+    assert grammar.set_query is not None
+    assert len(data.subsets) == len(export["processedData"]["values"])
+    assert data.all_sets_length == 12
+    if sort_by == SortBy.DEGREE:
+        degrees = [subset.degree for subset in data.subsets]
+        assert degrees == sorted(degrees)
+    for level in Level:
+        assert generate(grammar, data, level)
+
+
+def test_filters() -> None:
+    export = synthetic_export(sets=5, items=300, intersections=31, min_degree=2, max_degree=3, hide_no_set=True)
+    degrees = {subset["degree"] for subset in export["accessibleProcessedData"]["values"].values()}
+    assert degrees == {2, 3}
+
+
+def test_out_of_range() -> None:
+    with pytest.raises(ValueError):
+        synthetic_export(sets=4, visible_sets=5)
+    with pytest.raises(ValueError):
+        synthetic_export(sets=70, visible_sets=64)
+
+
+def test_command_line(tmp_path) -> None:
+    path = tmp_path / "export.json"
+    assert main(["--sets", "4", "--items", "50", "--no-raw-data", "-o", str(path)]) == 0
+    export = json.loads(path.read_text())
+    assert "rawData" not in export
+    assert len(export["allSets"]) == 4
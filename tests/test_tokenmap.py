@@ -0,0 +1,155 @@
+from typing import Any
+
+import pytest
+
+from alttxt.dependencies import DATA, DATA_TOKENS, GRAMMAR_TOKENS, HELPER_INPUTS, SUBSETS, TOKEN_INPUTS, dependency_graph
+from alttxt.enums import AggregateBy, Level, SortBy, SortOrder
+from alttxt.generator import AltTxtGen
+from alttxt.models import DataModel, GrammarModel, SetMembershipStatus, SetQueryModel
+from alttxt.parser import Parser
+from alttxt.pipeline import generate, parse, render
+from alttxt.synthetic import synthetic_export
+from alttxt.tokenmap import Lazy, TokenMap
+from alttxt.view import apply_grammar
+from tests.exports import DATA_DIR, DATA_FILES
+
+DATA_FILE = DATA_DIR / "movie.json"
+BOOKMARK_FILE = DATA_FILE.parent / "movies_with_bookmarks_selection.json"
+
+
+@pytest.fixture
+def parser() -> Parser:
+    return Parser(DATA_FILE, streaming=True)
+
+
+def test_construction_computes_nothing(parser: Parser, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: "list[str]" = []
+    for name in ("calculate_change_trend", "categorize_subsets", "dev_info", "max_n_intersections"):
+        original = getattr(TokenMap, name)
+        monkeypatch.setattr(
+            TokenMap, name,
+            lambda self, *args, _name=name, _original=original: calls.append(_name) or _original(self, *args),
+        )
+
+    tokenmap = TokenMap(parser.get_data(), parser.get_grammar())
+    assert calls == []
+
+    AltTxtGen(Level.ONE, False, tokenmap, parser.get_grammar()).text
+    assert "calculate_change_trend" not in calls
+
+
+def test_tokens_are_memoized(parser: Parser, monkeypatch: pytest.MonkeyPatch) -> None:
+    tokenmap = TokenMap(parser.get_data(), parser.get_grammar())
+    first = tokenmap.get_token("intersection_trend_analysis")
+
+    monkeypatch.setattr(TokenMap, "calculate_change_trend", lambda self: pytest.fail("recomputed"))
+    assert tokenmap.get_token("intersection_trend_analysis") == first
+    # dev_info is shared by several tokens and computed once
+    assert tokenmap.get_token("pos_dev_count") == str(tokenmap.dev_info()["pos_count"])
+    assert tokenmap.dev_info() is tokenmap.dev_info()
+
+
+def test_lazy_values_are_formatted(parser: Parser) -> None:
+    tokenmap = TokenMap(parser.get_data(), parser.get_grammar())
+    dev_info = tokenmap.dev_info()
+    assert tokenmap.get_token("avg_pos_dev") == str(round(dev_info["pos_avg"], 2))
+    assert tokenmap.get_token("not_a_token") == "{not_a_token}"
+
+
+def test_token_errors_name_the_token(parser: Parser, monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(self: TokenMap) -> None:
+        raise ValueError("boom")
+
+    monkeypatch.setattr(TokenMap, "get_all_set_position", fail)
+    tokenmap = TokenMap(parser.get_data(), parser.get_grammar())
+    with pytest.raises(Exception, match="all_set_index: boom"):
+        tokenmap.get_token("all_set_index")
+
+
+class Recorder:
+    """Forwards attribute reads to a model and records them as TOKEN_INPUTS names"""
+
+    def __init__(self, model: Any, reads: "set[str]", data: bool) -> None:
+        self._model, self._reads, self._data = model, reads, data
+
+    def __getattr__(self, name: str) -> Any:
+        if not self._data:
+            self._reads.add(name)
+        else:
+            self._reads.add(SUBSETS if name in ("subset_table", "subsets") else DATA)
+        return getattr(self._model, name)
+
+
+def exports() -> "list[tuple[GrammarModel, DataModel]]":
+    parsed = [parse(path) for path in DATA_FILES]
+    export = synthetic_export(sets=8, items=500, intersections=40, bookmarks=3, selection=True, set_query=True)
+    parsed.append(parse(export))
+    export = synthetic_export(sets=8, items=500, intersections=40, seed=5)
+    export.update(firstAggregateBy="Sets", secondAggregateBy="Degree")
+    parsed.append(parse(export))
+    return parsed
+
+
+def test_declared_inputs_cover_reads() -> None:
+    memoized = {name for name, value in vars(TokenMap).items() if hasattr(value, "__wrapped__")}
+    assert memoized == set(HELPER_INPUTS)
+    for grammar, data in exports():
+        # Values given directly in the map are checked by test_updates_render_like_a_rebuild
+        for token in TOKEN_INPUTS:
+            reads: "set[str]" = set()
+            tokenmap = TokenMap(data, grammar, tokens=[token])
+            if not callable(tokenmap.map[token]) and not isinstance(tokenmap.map[token], Lazy):
+                continue
+            tokenmap.grammar, tokenmap.data = Recorder(grammar, reads, False), Recorder(data, reads, True)
+            try:
+                tokenmap.get_token(token)
+            except Exception:
+                pass
+            assert reads <= TOKEN_INPUTS[token], token
+        for helper in HELPER_INPUTS:
+            reads = set()
+            tokenmap = TokenMap(data, grammar, tokens=[])
+            tokenmap.grammar, tokenmap.data = Recorder(grammar, reads, False), Recorder(data, reads, True)
+            getattr(tokenmap, helper)()
+            assert reads <= HELPER_INPUTS[helper], helper
+
+
+def test_bookmark_update_recomputes_only_bookmarks(monkeypatch: pytest.MonkeyPatch) -> None:
+    grammar, data = parse(BOOKMARK_FILE)
+    tokenmap = TokenMap(data, grammar, tokens=dependency_graph(Level.DEFAULT).tokens)
+    render(tokenmap, Level.DEFAULT)
+
+    updated = grammar.model_copy(update={"bookmarked_intersections": grammar.bookmarked_intersections[:1]})
+    expected = generate(updated, data, Level.DEFAULT)
+    assert tokenmap.update(updated) == {"bookmark_list"}
+    for name in ("calculate_change_trend", "categorize_subsets", "dev_info", "max_n_intersections"):
+        monkeypatch.setattr(TokenMap, name, lambda self, *args: pytest.fail("recomputed"))
+    assert render(tokenmap, Level.DEFAULT) == expected
+
+
+def test_updates_render_like_a_rebuild() -> None:
+    grammar, data = parse(BOOKMARK_FILE)
+    tokenmap = TokenMap(data, grammar, tokens=dependency_graph(Level.DEFAULT).tokens)
+    render(tokenmap, Level.DEFAULT)
+    variants = [
+        grammar.model_copy(update={"selected_intersection": None, "selection_type": None}),
+        grammar.model_copy(update={"filters": grammar.filters.model_copy(update={"min_visible": 2})}),
+        grammar.model_copy(update={"sort_by": SortBy.DEGREE, "sort_order": SortOrder.ASCENDING}),
+        grammar.model_copy(update={"set_query": SetQueryModel(name="q", query={"Drama": SetMembershipStatus.YES})}),
+        grammar.model_copy(update={"first_aggregate_by": AggregateBy.DEGREE}),
+        grammar,
+    ]
+    for variant in variants:
+        stale = tokenmap.update(variant)
+        assert stale and stale <= GRAMMAR_TOKENS
+        rebuilt = TokenMap(apply_grammar(variant, data), variant, tokens=tokenmap.tokens)
+        kept = {token: value for token, value in tokenmap.resolved.items() if token not in stale}
+        assert kept == {token: rebuilt.get_token(token) for token in kept}
+        assert render(tokenmap, Level.DEFAULT) == render(rebuilt, Level.DEFAULT)
+
+    # A view that comes out the same keeps the computed tokens
+    same = grammar.model_copy(update={"filters": grammar.filters.model_copy(update={"max_visible": 17})})
+    assert tokenmap.update(same) == {"degree_filters", "hide_settings"}
+
+    _, other = parse(DATA_FILE)
+    assert tokenmap.update(grammar, other) >= DATA_TOKENS & set(tokenmap.map) - {"title"}
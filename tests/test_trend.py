@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from scipy import optimize, stats
+
+from alttxt.enums import IntersectionTrend
+from alttxt.parser import Parser
+from alttxt.trend import MAX_ITERATIONS, classify_trend, fit_trend
+from tests.exports import DATA_FILES
+
+
+def _scipy_trend(sizes: "list[int]") -> IntersectionTrend:
+    """
+    The original curve_fit based classifier, kept as a reference.
+    """
+    x = np.arange(len(sizes))
+    y = np.array(sizes)
+    slope, intercept, *_ = stats.linregress(x, y)
+    linear_residuals = np.sum((y - (slope * x + intercept)) ** 2)
+    quadratic_residuals = np.polyfit(x, y, 2, full=True)[1][0]
+    (a, beta, c), _ = optimize.curve_fit(
+        lambda x, a, beta, c: a * np.exp(-beta * x) + c, x, y,
+        p0=[max(y), 0.1, min(y)], bounds=([0, 0, 0], [np.inf, np.inf, np.inf]), maxfev=5000,
+    )
+    if beta > 0 and a > 0:
+        x_fit = np.linspace(0, len(x) - 1, 100)
+        exponential_residuals = np.sum((y - np.interp(x, x_fit, a * np.exp(-beta * x_fit) + c)) ** 2)
+    else:
+        exponential_residuals = np.inf
+
+    if exponential_residuals < linear_residuals and exponential_residuals < quadratic_residuals:
+        return IntersectionTrend.DRASTIC if beta > 0.8 else IntersectionTrend.RAPID
+    elif quadratic_residuals < linear_residuals and quadratic_residuals < exponential_residuals:
+        return IntersectionTrend.QUICK
+    return IntersectionTrend.STEADY
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: p.name)
+def test_matches_scipy_on_data(path: Path) -> None:
+    sizes = Parser(path).get_data().subset_table.size.tolist()
+    assert classify_trend(sizes) == _scipy_trend(sizes)
+
+
+@pytest.mark.parametrize(
+    "sizes",
+    [
+        [int(1000 * np.exp(-1.5 * i)) + 3 for i in range(15)],
+        [int(1000 * np.exp(-0.3 * i)) + 20 for i in range(30)],
+        [200 - 10 * i for i in range(20)],
+        [(20 - i) ** 2 for i in range(20)],
+    ],
+    ids=["drastic", "rapid", "steady", "quick"],
+)
+def test_matches_scipy_on_shapes(sizes: "list[int]") -> None:
+    assert classify_trend(sizes) == _scipy_trend(sizes)
+
+
+def test_iteration_budget() -> None:
+    sizes = [int(500 * np.exp(-0.5 * i)) for i in range(40)]
+    assert fit_trend(sizes).iterations <= MAX_ITERATIONS
+    small = fit_trend(sizes, max_iterations=10)
+    assert small.iterations == 10
+    assert small.trend == IntersectionTrend.RAPID
+
+
+def test_time_budget() -> None:
+    sizes = [int(500 * np.exp(-0.5 * i)) for i in range(40)]
+    fit = fit_trend(sizes, time_budget=0.0)
+    # The grid is always evaluated, the refinement is skipped
+    assert not fit.complete
+    assert fit.trend == IntersectionTrend.RAPID
+
+
+def test_short_series() -> None:
+    assert classify_trend([5, 1]) == IntersectionTrend.STEADY
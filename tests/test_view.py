@@ -0,0 +1,81 @@
+import copy
+import json
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from alttxt.enums import Level, SortBy, SortOrder
+from alttxt.pipeline import generate, parse, parse_bytes
+from alttxt.view import apply_grammar, plot_view
+from tests.exports import DATA_DIR, DATA_FILES
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: p.name)
+def test_matches_accessible_data(path: Path) -> None:
+    grammar, data = parse(path)
+    assert apply_grammar(grammar, data).subset_table == data.subset_table
+
+
+def test_export_without_accessible_data(tmp_path: Path) -> None:
+    source = DATA_DIR / "movies_with_bookmarks_selection.json"
+    export = json.loads(source.read_text())
+    del export["accessibleProcessedData"]
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(export))
+
+    grammar, data = parse(source)
+    derived_grammar, derived = parse(path)
+    assert derived.subset_table == data.subset_table
+    assert parse_bytes(path.read_bytes())[1].subset_table == data.subset_table
+    assert generate(derived_grammar, derived, Level.TWO) == generate(grammar, data, Level.TWO)
+
+
+def test_grammar_variants() -> None:
+    grammar, data = parse(DATA_DIR / "movies_with_bookmarks_selection.json")
+    table = data.all_subset_table
+
+    variant = grammar.model_copy(update={
+        "sort_by": SortBy.DEGREE,
+        "sort_order": SortOrder.ASCENDING,
+        "filters": grammar.filters.model_copy(update={"min_visible": 2, "max_visible": 3}),
+    })
+    view = plot_view(table, variant)
+    degrees = table.degree[view.rows]
+    assert set(degrees.tolist()) == {2, 3}
+    assert degrees.tolist() == sorted(degrees.tolist())
+    assert len(view) == int(((table.degree >= 2) & (table.degree <= 3) & (table.size > 0)).sum())
+    # Subsets of the same degree keep the order of all subsets
+    for degree in (2, 3):
+        rows = view.rows[degrees == degree]
+        assert rows.tolist() == sorted(rows.tolist())
+
+    assert (view.index[view.rows] == np.arange(len(view))).all()
+    hidden = np.setdiff1d(np.arange(len(table)), view.rows)
+    assert (view.index[hidden] == -1).all()
+
+    variant = grammar.model_copy(update={"sort_by": SortBy.DEVIATION, "sort_order": SortOrder.DESCENDING})
+    devs = apply_grammar(variant, data).subset_table.dev.tolist()
+    assert devs == sorted(devs, reverse=True)
+    assert generate(variant, apply_grammar(variant, data), Level.TWO).count("sorted by deviation in descending order")
+
+
+def test_hide_empty_and_no_set() -> None:
+    grammar, data = parse(DATA_DIR / "movies_with_bookmarks_selection.json", recompute=True)
+    shown = grammar.filters.model_copy(update={"hide_no_set": False})
+    table = apply_grammar(grammar.model_copy(update={"filters": shown}), data).subset_table
+    assert len(table) == len(data.subset_table) + 1
+    assert "the empty intersection" in table.name.tolist()
+    assert "the empty intersection" not in data.subset_table.name.tolist()
+
+
+@pytest.mark.parametrize("recompute", [False, True])
+def test_legacy_export_is_not_changed(recompute: bool) -> None:
+    export = json.loads((DATA_DIR / "movies_with_bookmarks_selection.json").read_text())
+    del export["sortByOrder"], export["filters"]["hideNoSet"]
+    original = copy.deepcopy(export)
+    grammar, _ = parse(export, recompute=recompute)
+    assert grammar.sort_order == SortOrder.DESCENDING
+    assert not grammar.filters.hide_no_set
+    assert export == original